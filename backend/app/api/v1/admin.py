@@ -1,10 +1,35 @@
-from fastapi import APIRouter
+from datetime import date, datetime
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from app.core.security import auth_stats, require_service_token, require_service_token_or_signature
+from app.db.repositories import (
+    ORDER_COLUMNS, AdminRepository, OrderRepository, get_admin_repository, get_order_repository,
+)
+from app.services.cache import TTLCache
+from app.services.exporters import EXPORTERS, MEDIA_TYPES, PARQUET_SUPPORTED
+from app.services.metrics import metrics as metrics_registry
+from app.utils.pagination import parse_columns
 
 router = APIRouter()
 
-@router.get("/admin/metrics")
+# Agregados del dashboard: TTL corto, una sola consulta por rango aunque
+# varias pestañas del dashboard refresquen a la vez.
+dashboard_cache = TTLCache(maxsize=128, ttl=30, name="admin_dashboard")
+
+
+class RollupRebuild(BaseModel):
+    since: datetime | None = None
+
+@router.get("/admin/metrics", dependencies=[Depends(require_service_token)])
 async def metrics():
-    return {"orders": 120, "producers": 12, "bypasses": 2}
+    """
+    Métricas del proceso: latencia por ruta (p50/p95/p99 como cota del
+    bucket), llamadas a Supabase, cachés y colas. Lo mismo que /metrics,
+    en JSON.
+    """
+    return await metrics_registry.snapshot()
 
 @router.get("/admin/bypasses")
 async def bypasses():
@@ -13,6 +38,85 @@ async def bypasses():
         {"order_id": "o2", "description": "Alias MP en chat"}
     ]
 
-@router.get("/admin/export/excel")
-async def export_excel():
-    return {"url": "/download/metrics.xlsx"}
+@router.get("/admin/export/{fmt}", dependencies=[Depends(require_service_token_or_signature)])
+async def export_orders(
+    fmt: Literal["excel", "xlsx", "csv", "parquet"],
+    fields: str | None = Query(None, description="Columnas separadas por coma"),
+    status: str | None = None,
+    producer_id: str | None = None,
+    client_id: str | None = None,
+    page_size: int = Query(1000, ge=1, le=1000),
+    orders: OrderRepository = Depends(get_order_repository),
+):
+    """
+    Exporta pedidos en xlsx (`excel`), CSV o Parquet. Las filas se leen por
+    páginas keyset y se escriben directo en la respuesta (chunked), así que
+    la memoria no crece con la cantidad de pedidos.
+
+    Además del header X-Service-Token acepta un link firmado
+    (`?expires=&sig=`), para que el navegador lo descargue directamente.
+    """
+    fmt = "xlsx" if fmt == "excel" else fmt
+    if fmt == "parquet" and not PARQUET_SUPPORTED:
+        raise HTTPException(status_code=501, detail="La exportación a Parquet requiere pyarrow")
+    try:
+        columns = parse_columns(fields, ORDER_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    pages = orders.iter_pages(
+        page_size=page_size, columns=columns,
+        status=status, producer_id=producer_id, client_id=client_id,
+    )
+    filename = f"pedidos_{date.today().isoformat()}.{fmt}"
+    return StreamingResponse(
+        EXPORTERS[fmt](pages, columns),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/admin/dashboard", dependencies=[Depends(require_service_token)])
+async def dashboard(
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    admin: AdminRepository = Depends(get_admin_repository),
+):
+    """
+    Métricas pre-agregadas para el dashboard de administración: totales,
+    comisión, neto, conteos por productor y serie diaria (montos en centavos).
+    Sin fechas, el rango es todo el historial hasta ahora.
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date debe ser anterior a end_date")
+    key = ("dashboard", start_date, end_date)
+    try:
+        result = await dashboard_cache.get_or_load(
+            key,
+            lambda: admin.dashboard_metrics(start_date, end_date),
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener métricas: {str(e)}")
+    if not result or not result.get("success"):
+        dashboard_cache.invalidate(key)   # no cachear errores
+        raise HTTPException(status_code=500, detail=(result or {}).get("error", "Error al obtener métricas"))
+    return result
+
+
+@router.post("/admin/rollups/rebuild", dependencies=[Depends(require_service_token)])
+async def rebuild_rollups(
+    body: RollupRebuild,
+    admin: AdminRepository = Depends(get_admin_repository),
+):
+    """Backfill de order_rollups_* (días completos desde `since`, o todo)."""
+    try:
+        result = await admin.rebuild_rollups(body.since)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al reconstruir agregados: {str(e)}")
+    dashboard_cache.clear()
+    return result
+
+
+@router.get("/admin/auth/stats", dependencies=[Depends(require_service_token)])
+async def get_auth_stats():
+    """Aciertos de las cachés de tokens verificados, roles y claves JWKS."""
+    return auth_stats()
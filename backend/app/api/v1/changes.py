@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+
+from app.core.security import require_service_token
+from app.core.config import settings
+from app.services.change_feed import change_feed
+
+router = APIRouter(dependencies=[Depends(require_service_token)])
+
+
+def _sse(event_id, kind, data):
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/stream")
+async def stream_changes(
+    since: str | None = Query(None, description="Último id de evento recibido"),
+    last_event_id: str | None = Header(None),
+):
+    """
+    Server-Sent Events con los pedidos modificados (`order`) y las alertas
+    de bypass nuevas (`bypass_alert`); cada evento trae un lote de filas.
+
+    Con `since` (o el header Last-Event-ID que envía EventSource al
+    reconectar) se reenvían primero los eventos perdidos. Sin id, o si ya no
+    están en el buffer, el primer evento es `reset`: el cliente debe volver
+    a leer los datos completos y seguir desde ese id.
+    """
+    watermark = last_event_id or since
+
+    async def events():
+        sub, backlog = change_feed.subscribe(watermark)
+        try:
+            yield "retry: 3000\n\n"
+            if backlog is None:
+                yield _sse(change_feed.watermark, "reset", {"watermark": change_feed.watermark})
+            else:
+                for event in backlog:
+                    yield _sse(event["id"], event["kind"], event["rows"])
+            while True:
+                try:
+                    event = await sub.get(settings.CHANGE_FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event is None:
+                    return
+                yield _sse(event["id"], event["kind"], event["rows"])
+        finally:
+            change_feed.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats")
+async def change_feed_stats():
+    return change_feed.snapshot()
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+
+from app.core.security import require_service_token
+from app.schemas.chat import ChatMessage
+
+router = APIRouter()
+
+
+@router.post("/classify", dependencies=[Depends(require_service_token)])
+async def classify_messages(messages: list[ChatMessage]):
+    """
+    Clasifica un lote de mensajes de chat (teléfonos y emails, también
+    ofuscados). La detección ocurre al validar cada ChatMessage.
+    """
+    return {
+        "messages": messages,
+        "blocked": sum(1 for m in messages if m.is_blocked),
+    }
@@ -1,40 +1,168 @@
-from fastapi import APIRouter, HTTPException
-from app.db.supabase_client import supabase
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.security import require_service_token
+from app.db.repositories import DishRepository, ZoneRepository, get_dish_repository, get_zone_repository
+from app.services.cache import dish_cache, invalidate_dish
+from app.services.dish_search import (
+    dish_prefix_index,
+    ensure_dish_index,
+    normalize_text,
+    request_dish_index_refresh,
+)
+from app.services.popularity import DAYPART_NAMES, popularity_engine
+from app.services.zone_index import ensure_zone_index, zone_index
 
 router = APIRouter()
 
+
+class CacheInvalidation(BaseModel):
+    dish_id: str | None = None
+
+
+async def _dishes_by_id(dishes: DishRepository, dish_ids):
+    """Platos por id desde la caché; los que faltan se piden en una sola consulta."""
+    found = {dish_id: dish_cache.get(("dish", dish_id)) for dish_id in dish_ids}
+    missing = [dish_id for dish_id, dish in found.items() if dish is None]
+    if missing:
+        for row in await dishes.get_many(missing):
+            dish_cache.set(("dish", row["id"]), row)
+            found[row["id"]] = row
+    return found
+
+
 @router.get("/popular")
-def get_popular_dishes(limit: int = 10, city: str | None = None):
+async def get_popular_dishes(
+    limit: int = Query(10, ge=1, le=settings.POPULARITY_TOP_K),
+    city: str | None = None,
+    lat: float | None = Query(None, ge=-90, le=90),
+    lon: float | None = Query(None, ge=-180, le=180),
+    daypart: str | None = None,
+    dishes: DishRepository = Depends(get_dish_repository),
+    zones: ZoneRepository = Depends(get_zone_repository),
+):
     """
-    Devuelve una lista de platos populares desde Supabase.
-    Se puede filtrar por ciudad y limitar la cantidad.
+    Devuelve los platos más pedidos (unidades pagadas con decaimiento),
+    globales o de la zona del punto (lat/lon) y de una franja horaria
+    (`daypart`: trasnoche, desayuno, almuerzo, merienda, cena).
+    El ranking sale del top-K en memoria; los datos de cada plato, de la caché.
+    Sin historial de ventas (o filtrando por ciudad) devuelve el listado
+    de Supabase, cacheado con TTL corto.
+    La zona se resuelve con el índice de zonas en memoria (sin un test de
+    polígono por fila en la base).
     """
+    if daypart is not None and daypart not in DAYPART_NAMES:
+        raise HTTPException(status_code=400, detail=f"daypart debe ser uno de: {', '.join(DAYPART_NAMES)}")
+    zone_id = None
+    if lat is not None and lon is not None:
+        try:
+            await ensure_zone_index(zones)
+        except Exception as e:
+            if not len(zone_index):
+                raise HTTPException(status_code=500, detail=f"Error al cargar zonas: {str(e)}")
+        zone = zone_index.zone_for_point(lat, lon)
+        if zone is None:
+            return []   # fuera de las zonas de entrega
+        zone_id = zone["zone_id"]
+
+    # algunos candidatos extra por si hay platos dados de baja
+    ranked = [] if city else popularity_engine.top(limit=2 * limit, zone_id=zone_id, daypart=daypart)
+    if ranked:
+        try:
+            found = await _dishes_by_id(dishes, [dish_id for dish_id, _ in ranked])
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error al obtener platos: {str(e)}")
+        return [
+            dict(found[dish_id], popularity_score=round(score, 3))
+            for dish_id, score in ranked
+            if found.get(dish_id) and found[dish_id].get("is_available", True)
+        ][:limit]
+
     try:
-        query = supabase.table("dishes").select("*").limit(limit)
-        if city:
-            query = query.eq("city", city)
-        data = query.execute()
-        return data.data or []   # devuelve lista vacía si no hay registros
+        return await dish_cache.get_or_load(
+            ("popular", limit, city, zone_id),
+            lambda: dishes.list_popular(limit=limit, city=city, zone_id=zone_id),
+            ttl=settings.DISH_CACHE_POPULAR_TTL_SECONDS,
+        ) or []   # devuelve lista vacía si no hay registros
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener platos: {str(e)}")
 
 
+@router.get("/popular/stats")
+async def get_popularity_stats():
+    """Estado del ranking de popularidad (eventos aplicados, watermark, snapshots)."""
+    return popularity_engine.snapshot()
+
+
+@router.get("/search")
+async def search_dishes(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    category: str | None = None,
+    dishes: DishRepository = Depends(get_dish_repository),
+):
+    """
+    Búsqueda difusa de platos por nombre, categoría y descripción,
+    tolerante a errores de tipeo y acentos, ordenada por relevancia
+    (search_dishes sobre el índice de trigramas).
+    """
+    key = ("search", " ".join(normalize_text(q).split()), limit, offset, category)
+    try:
+        return await dish_cache.get_or_load(
+            key,
+            lambda: dishes.search(q, limit=limit, offset=offset, category=category),
+            ttl=settings.DISH_SEARCH_TTL_SECONDS,
+        ) or []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al buscar platos: {str(e)}")
+
+
+@router.get("/autocomplete")
+async def autocomplete_dishes(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=50),
+    dishes: DishRepository = Depends(get_dish_repository),
+):
+    """
+    Sugerencias mientras se escribe, desde el índice de prefijos en memoria
+    (se actualiza en forma incremental; no consulta la base por tecla).
+    """
+    try:
+        await ensure_dish_index(dishes)
+    except Exception as e:
+        # con un índice ya cargado se sigue respondiendo aunque falle la actualización
+        if not len(dish_prefix_index):
+            raise HTTPException(status_code=500, detail=f"Error al cargar platos: {str(e)}")
+    return dish_prefix_index.complete(q, limit=limit)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Contadores de aciertos/fallos/desalojos de la caché de platos."""
+    return dish_cache.stats()
+
+
+@router.post("/cache/invalidate", dependencies=[Depends(require_service_token)])
+async def invalidate_cache(body: CacheInvalidation):
+    """
+    Invalida la caché cuando se actualiza un plato (p. ej. desde un
+    webhook de base de datos). Sin dish_id se vacía todo el catálogo.
+    """
+    invalidate_dish(body.dish_id)
+    request_dish_index_refresh()
+    return {"invalidated": body.dish_id or "all"}
+
+
 @router.get("/{dish_id}")
-def get_dish(dish_id: str):
+async def get_dish(dish_id: str, dishes: DishRepository = Depends(get_dish_repository)):
     """
     Devuelve un plato específico por su ID.
     """
     try:
-        data = (
-            supabase.table("dishes")
-            .select("*")
-            .eq("id", dish_id)
-            .single()
-            .execute()
-        )
-        if not data.data:
-            raise HTTPException(status_code=404, detail="Plato no encontrado")
-        return data.data
+        dish = await dish_cache.get_or_load(("dish", dish_id), lambda: dishes.get(dish_id))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener plato: {str(e)}")
-
+    if not dish:
+        raise HTTPException(status_code=404, detail="Plato no encontrado")
+    return dish
@@ -1,18 +1,204 @@
-from fastapi import APIRouter, HTTPException
-from app.db.supabase_client import supabase
+import json
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.core.security import SERVICE_ROLE, require_role, require_service_token
+from app.db.repositories import (
+    ORDER_COLUMNS, DishRepository, OrderRepository, get_dish_repository, get_order_repository,
+)
+from app.schemas.order import BulkOrderCreate
+from app.services.address_reveal import ACTIVE_STATUSES, reveal_scheduler
+from app.services.change_feed import change_feed
+from app.services.pricing import PricingError, dish_ids_for, price_orders, with_order_ids
+from app.utils.pagination import InvalidCursor, decode_cursor, parse_columns
 
 router = APIRouter()
 
+
+def _columns(fields: str | None):
+    try:
+        return parse_columns(fields, ORDER_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Quién puede leer pedidos; clientes y productores sólo ven los propios
+order_reader = require_role(SERVICE_ROLE, "admin", "productor", "cliente")
+
+
+def _scope(caller: dict, producer_id: str | None, client_id: str | None):
+    """Filtros (producer_id, client_id) que corresponden a quien llama."""
+    if caller["role"] == "productor":
+        if producer_id not in (None, caller["sub"]):
+            raise HTTPException(status_code=403, detail="Permiso denegado")
+        return caller["sub"], client_id
+    if caller["role"] == "cliente":
+        if client_id not in (None, caller["sub"]):
+            raise HTTPException(status_code=403, detail="Permiso denegado")
+        return producer_id, caller["sub"]
+    return producer_id, client_id
+
+
 @router.get("/")
-def list_orders():
+async def list_orders(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
+    fields: str | None = Query(None, description="Columnas separadas por coma"),
+    status: str | None = None,
+    producer_id: str | None = None,
+    client_id: str | None = None,
+    orders: OrderRepository = Depends(get_order_repository),
+    caller: dict = Depends(order_reader),
+):
+    """
+    Lista pedidos paginados por cursor en orden (created_at DESC, id).
+    Para la página siguiente, enviar el `next_cursor` recibido. Clientes y
+    productores (con su JWT) sólo ven sus pedidos.
+    """
+    columns = _columns(fields)
+    producer_id, client_id = _scope(caller, producer_id, client_id)
+    try:
+        items, next_cursor = await orders.list_page(
+            columns=columns, limit=limit, cursor=cursor,
+            status=status, producer_id=producer_id, client_id=client_id,
+        )
+        return {"items": items, "next_cursor": next_cursor}
+
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stream")
+async def stream_orders(
+    page_size: int = Query(500, ge=1, le=1000),
+    cursor: str | None = None,
+    fields: str | None = Query(None, description="Columnas separadas por coma"),
+    status: str | None = None,
+    producer_id: str | None = None,
+    client_id: str | None = None,
+    orders: OrderRepository = Depends(get_order_repository),
+    caller: dict = Depends(order_reader),
+):
+    """
+    Exporta pedidos como NDJSON (una fila JSON por línea), trayendo una
+    página por vez desde Supabase sin acumular el resultado completo.
+    """
+    columns = _columns(fields)
+    producer_id, client_id = _scope(caller, producer_id, client_id)
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def rows():
+        async for page in orders.iter_pages(
+            page_size=page_size, cursor=cursor, columns=columns,
+            status=status, producer_id=producer_id, client_id=client_id,
+        ):
+            yield "".join(json.dumps(row, default=str) + "\n" for row in page)
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+# Sólo lo necesario para cotizar; precios siempre frescos (sin dish_cache)
+PRICING_COLUMNS = "id,producer_id,price_cents,is_available"
+
+
+async def _price(body: BulkOrderCreate, dishes: DishRepository):
+    rows = await dishes.get_many(dish_ids_for(body.orders), columns=PRICING_COLUMNS)
     try:
-        # Consultar todos los registros de la tabla "orders"
-        response = supabase.table("orders").select("*").execute()
+        return price_orders(body.orders, rows)
+    except PricingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
-        if response.error:
-            raise HTTPException(status_code=500, detail=response.error.message)
+@router.post("/quote")
+async def quote_orders(body: BulkOrderCreate, dishes: DishRepository = Depends(get_dish_repository)):
+    """
+    Valida y cotiza uno o varios carritos (subtotal, comisión y total en
+    centavos) con una sola consulta a dishes. No crea nada.
+    """
+    return {"orders": await _price(body, dishes)}
 
-        return response.data
 
+@router.post("/bulk", dependencies=[Depends(require_service_token)])
+async def create_orders_bulk(
+    body: BulkOrderCreate,
+    dishes: DishRepository = Depends(get_dish_repository),
+    orders: OrderRepository = Depends(get_order_repository),
+):
+    """
+    Crea uno o varios pedidos con sus ítems en una sola transacción
+    (create_orders_bulk): una consulta IN para cotizar y una llamada RPC
+    para insertar, sin importar la cantidad de pedidos o ítems. El pago
+    sigue por el flujo de Mercado Pago de cada pedido.
+    """
+    priced = with_order_ids(await _price(body, dishes))
+    try:
+        created = await orders.create_bulk(priced)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 400:
+            # La función rechazó el lote (p. ej. cambió un precio entre la cotización y el alta)
+            try:
+                detail = e.response.json().get("message")
+            except ValueError:
+                detail = None
+            raise HTTPException(status_code=409, detail=detail or "No se pudo crear el lote de pedidos")
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    change_feed.wake()
+    by_id = {str(row["id"]): row for row in created}
+    return {"orders": [dict(order, **by_id.get(order["id"], {})) for order in priced]}
+
+
+@router.get("/reveals/stats", dependencies=[Depends(require_service_token)])
+async def get_reveal_stats():
+    return reveal_scheduler.snapshot()
+
+
+def _check_owner(caller: dict, producer_id, client_id):
+    """Clientes y productores sólo consultan sus propios pedidos."""
+    if caller["role"] == "productor" and str(producer_id) != caller["sub"]:
+        raise HTTPException(status_code=403, detail="Permiso denegado")
+    if caller["role"] == "cliente" and str(client_id) != caller["sub"]:
+        raise HTTPException(status_code=403, detail="Permiso denegado")
+
+
+@router.get("/{order_id}/reveal-state")
+async def get_reveal_state(
+    order_id: str,
+    orders: OrderRepository = Depends(get_order_repository),
+    caller: dict = Depends(order_reader),
+):
+    """
+    Estado del revelado de dirección (pending, due, revealed, closed o
+    not_eligible). Los retiros próximos se responden desde memoria; el
+    resto se consulta una vez y, si corresponde, se programa. Clientes y
+    productores sólo ven los de sus pedidos.
+    """
+    state = reveal_scheduler.state(order_id)
+    owners = reveal_scheduler.owners(order_id)
+    if state is not None and owners is not None:
+        _check_owner(caller, *owners)
+        return state
+    try:
+        order = await orders.get(order_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if order is None:
+        raise HTTPException(status_code=404, detail="Pedido no encontrado")
+    _check_owner(caller, order.get("producer_id"), order.get("client_id"))
+    if state is not None:
+        return state
+    if not order.get("paid_at") or order.get("status") not in ACTIVE_STATUSES or not order.get("pickup_time"):
+        return {"order_id": order_id, "state": "not_eligible"}
+    reveal_scheduler.schedule(order_id, order["pickup_time"], order.get("address_revealed_at"),
+                              order.get("producer_id"), order.get("client_id"))
+    reveal_scheduler.wake(reload=False)
+    return reveal_scheduler.state(order_id)
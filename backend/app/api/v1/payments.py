@@ -1,7 +1,37 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from app.core.security import require_service_token
+from app.services import payments_service
 
 router = APIRouter()
 
 @router.get("/")
 def list_payments():
     return [{"id": 1, "status": "Paid"}]
+
+@router.post("/webhook")
+async def mercadopago_webhook(
+    request: Request,
+    x_signature: str | None = Header(None),
+    x_request_id: str | None = Header(None),
+):
+    """
+    Webhook de Mercado Pago. Sólo valida la firma y encola el id del pago
+    (cola local persistente con deduplicación); responde sin esperar a la
+    base de datos ni a la API de Mercado Pago.
+    """
+    try:
+        data = await request.json()
+        return await payments_service.process_webhook(
+            data, x_signature, x_request_id, request.query_params.get("data.id"),
+        )
+    except payments_service.InvalidSignature as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        # 5xx: Mercado Pago reintenta la notificación
+        raise HTTPException(status_code=500, detail=f"Error al encolar webhook: {str(e)}")
+
+@router.get("/webhook/stats", dependencies=[Depends(require_service_token)])
+async def webhook_stats():
+    return payments_service.webhook_worker.snapshot()
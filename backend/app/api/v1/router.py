@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from . import dishes, orders, payments, producers, admin
+from . import dishes, orders, payments, producers, admin, chat, zones, users, changes
 
 api_router = APIRouter(prefix="/api/v1")
 
@@ -8,3 +8,7 @@ api_router.include_router(orders.router, prefix="/orders", tags=["orders"])
 api_router.include_router(payments.router, prefix="/payments", tags=["payments"])
 api_router.include_router(producers.router, prefix="/producers", tags=["producers"])
 api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
+api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
+api_router.include_router(zones.router, prefix="/zones", tags=["zones"])
+api_router.include_router(users.router, prefix="/users", tags=["users"])
+api_router.include_router(changes.router, prefix="/changes", tags=["changes"])
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.core.security import invalidate_user_role, require_service_token
+from app.db.repositories import ProfileRepository, get_profile_repository
+from app.schemas.user import UserStatusChange
+from app.utils.pagination import InvalidCursor
+
+router = APIRouter(dependencies=[Depends(require_service_token)])
+
+
+@router.get("/")
+async def list_users(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
+    search: str | None = Query(None, description="Nombre o email (parcial)"),
+    role: str | None = None,
+    active: bool | None = None,
+    profiles: ProfileRepository = Depends(get_profile_repository),
+):
+    """
+    Lista usuarios paginados por cursor en orden (created_at DESC, id), con
+    búsqueda y filtros resueltos en la base. Para la página siguiente,
+    enviar el `next_cursor` recibido.
+    """
+    try:
+        items, next_cursor = await profiles.list_page(
+            limit=limit, cursor=cursor, search=search, role=role, active=active,
+        )
+        return {"items": items, "next_cursor": next_cursor}
+
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/status")
+async def set_users_status(body: UserStatusChange, profiles: ProfileRepository = Depends(get_profile_repository)):
+    """
+    Bloquea (`active=false`) o activa muchos usuarios en una sola sentencia.
+
+    El rol cacheado se invalida sólo en este proceso: en los demás workers
+    el cambio se aplica cuando vence su entrada de role_cache, a lo sumo
+    AUTH_ROLE_CACHE_TTL_SECONDS (60 s por defecto) después.
+    """
+    user_ids = list(dict.fromkeys(body.user_ids))
+    try:
+        changed = await profiles.set_active(user_ids, body.active)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    # el rol cacheado de un usuario bloqueado ya no debe autorizarlo
+    for user_id in user_ids:
+        invalidate_user_role(user_id)
+    return {"requested": len(user_ids), "changed": [row["id"] for row in changed]}
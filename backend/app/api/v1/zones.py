@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.core.security import require_service_token
+from app.db.repositories import ZoneRepository, get_zone_repository
+from app.services.zone_index import ensure_zone_index, reload_zone_index, zone_index
+
+router = APIRouter()
+
+
+@router.get("/resolve")
+async def resolve_zone(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    zones: ZoneRepository = Depends(get_zone_repository),
+):
+    """
+    Zona de entrega que contiene el punto (equivalente a get_zone_for_point),
+    resuelta en memoria. Devuelve 404 si el punto está fuera de las zonas.
+    """
+    try:
+        await ensure_zone_index(zones)
+    except Exception as e:
+        if not len(zone_index):
+            raise HTTPException(status_code=500, detail=f"Error al cargar zonas: {str(e)}")
+    zone = zone_index.zone_for_point(lat, lon)
+    if zone is None:
+        raise HTTPException(status_code=404, detail="El punto no está en ninguna zona de entrega")
+    return zone
+
+
+@router.get("/stats")
+async def get_zone_stats():
+    """Zonas cargadas y aciertos/fallos de la memoización por coordenada."""
+    return zone_index.stats()
+
+
+@router.post("/reload", dependencies=[Depends(require_service_token)])
+async def reload_zones(zones: ZoneRepository = Depends(get_zone_repository)):
+    """Recarga los polígonos (p. ej. después de editar delivery_zones)."""
+    try:
+        await reload_zone_index(zones)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al cargar zonas: {str(e)}")
+    return zone_index.stats()
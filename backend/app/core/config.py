@@ -9,16 +9,105 @@ class Settings:
     SUPABASE_URL: str = os.getenv("SUPABASE_URL")
     SUPABASE_SERVICE_ROLE_KEY: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY")  # en tu .env es la service role key
 
+    # 🔌 Pool HTTP hacia PostgREST (keep-alive compartido)
+    SUPABASE_TIMEOUT_SECONDS: float = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+    SUPABASE_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("SUPABASE_CONNECT_TIMEOUT_SECONDS", "5"))
+    SUPABASE_POOL_MAX_CONNECTIONS: int = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "50"))
+    SUPABASE_POOL_MAX_KEEPALIVE: int = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "20"))
+    SUPABASE_POOL_KEEPALIVE_SECONDS: float = float(os.getenv("SUPABASE_POOL_KEEPALIVE_SECONDS", "30"))
+
     # 💳 Mercado Pago
     MP_ACCESS_TOKEN: str = os.getenv("MP_ACCESS_TOKEN")
-    MP_WEBHOOK_SECRET: str = os.getenv("MP_WEBHOOK_SECRET")  # opcional
+    MP_WEBHOOK_SECRET: str = os.getenv("MP_WEBHOOK_SECRET")  # firma x-signature de los webhooks
+    MP_API_URL: str = os.getenv("MP_API_URL", "https://api.mercadopago.com")
+    MP_TIMEOUT_SECONDS: float = float(os.getenv("MP_TIMEOUT_SECONDS", "10"))
+
+    # 📥 Cola local de webhooks de Mercado Pago (SQLite)
+    PAYMENT_WEBHOOK_QUEUE_PATH: str = os.getenv("PAYMENT_WEBHOOK_QUEUE_PATH", "data/mp_webhook_queue.sqlite3")
+    PAYMENT_WEBHOOK_WORKERS: int = int(os.getenv("PAYMENT_WEBHOOK_WORKERS", "4"))
+    PAYMENT_WEBHOOK_BATCH_SIZE: int = int(os.getenv("PAYMENT_WEBHOOK_BATCH_SIZE", "50"))
+    # consultas simultáneas a la API de MP por lote
+    PAYMENT_WEBHOOK_FETCH_CONCURRENCY: int = int(os.getenv("PAYMENT_WEBHOOK_FETCH_CONCURRENCY", "10"))
+    PAYMENT_WEBHOOK_POLL_SECONDS: float = float(os.getenv("PAYMENT_WEBHOOK_POLL_SECONDS", "1"))
+    PAYMENT_WEBHOOK_LINGER_SECONDS: float = float(os.getenv("PAYMENT_WEBHOOK_LINGER_SECONDS", "0.05"))
+    # lease de un lote tomado: si el proceso no lo completa en ese plazo, otro lo retoma
+    PAYMENT_WEBHOOK_LEASE_SECONDS: float = float(os.getenv("PAYMENT_WEBHOOK_LEASE_SECONDS", "120"))
+    PAYMENT_WEBHOOK_MAX_ATTEMPTS: int = int(os.getenv("PAYMENT_WEBHOOK_MAX_ATTEMPTS", "8"))
+    PAYMENT_WEBHOOK_RETENTION_HOURS: float = float(os.getenv("PAYMENT_WEBHOOK_RETENTION_HOURS", "168"))
+
+    # 🛒 Pedidos: comisión en puntos básicos (1500 = 15%) y límites del alta masiva
+    ORDER_COMMISSION_BPS: int = int(os.getenv("ORDER_COMMISSION_BPS", "1500"))
+    ORDER_BULK_MAX_ORDERS: int = int(os.getenv("ORDER_BULK_MAX_ORDERS", "200"))
+    ORDER_MAX_ITEMS: int = int(os.getenv("ORDER_MAX_ITEMS", "200"))
 
     # 🔒 Token interno de servicio
     SERVICE_TOKEN: str = os.getenv("SERVICE_TOKEN")
+    # Vigencia máxima de los links firmados con SERVICE_TOKEN (descargas desde el navegador)
+    SIGNED_URL_MAX_SECONDS: int = int(os.getenv("SIGNED_URL_MAX_SECONDS", "3600"))
 
     # 🌐 CORS
     ALLOW_ORIGINS = os.getenv("ALLOW_ORIGINS", "*").split(",")
 
+    # 🍲 Caché del catálogo de platos
+    DISH_CACHE_MAXSIZE: int = int(os.getenv("DISH_CACHE_MAXSIZE", "1024"))
+    DISH_CACHE_TTL_SECONDS: float = float(os.getenv("DISH_CACHE_TTL_SECONDS", "300"))
+    DISH_CACHE_POPULAR_TTL_SECONDS: float = float(os.getenv("DISH_CACHE_POPULAR_TTL_SECONDS", "60"))
+    DISH_SEARCH_TTL_SECONDS: float = float(os.getenv("DISH_SEARCH_TTL_SECONDS", "30"))
+
+    # 🔎 Índice de autocompletado de platos (prefijos en memoria)
+    DISH_INDEX_REFRESH_SECONDS: int = int(os.getenv("DISH_INDEX_REFRESH_SECONDS", "30"))
+    DISH_INDEX_REBUILD_SECONDS: int = int(os.getenv("DISH_INDEX_REBUILD_SECONDS", "3600"))
+    DISH_INDEX_PAGE_SIZE: int = int(os.getenv("DISH_INDEX_PAGE_SIZE", "1000"))
+
+    # 📍 Índice espacial de productores (grilla en memoria)
+    PRODUCER_INDEX_CELL_DEG: float = float(os.getenv("PRODUCER_INDEX_CELL_DEG", "0.05"))
+    PRODUCER_INDEX_REFRESH_SECONDS: int = int(os.getenv("PRODUCER_INDEX_REFRESH_SECONDS", "30"))
+    PRODUCER_INDEX_REBUILD_SECONDS: int = int(os.getenv("PRODUCER_INDEX_REBUILD_SECONDS", "600"))
+
+    # 🗺️ Índice de zonas de entrega (polígonos en memoria)
+    ZONE_INDEX_CELL_DEG: float = float(os.getenv("ZONE_INDEX_CELL_DEG", "0.02"))
+    ZONE_INDEX_QUANTUM_DEG: float = float(os.getenv("ZONE_INDEX_QUANTUM_DEG", "0.0001"))
+    ZONE_INDEX_MEMO_SIZE: int = int(os.getenv("ZONE_INDEX_MEMO_SIZE", "100000"))
+    ZONE_INDEX_RELOAD_SECONDS: int = int(os.getenv("ZONE_INDEX_RELOAD_SECONDS", "900"))
+
+    # 🔥 Ranking de popularidad de platos (contadores con decaimiento)
+    POPULARITY_HALF_LIFE_HOURS: float = float(os.getenv("POPULARITY_HALF_LIFE_HOURS", "168"))
+    POPULARITY_TOP_K: int = int(os.getenv("POPULARITY_TOP_K", "50"))
+    POPULARITY_POLL_SECONDS: float = float(os.getenv("POPULARITY_POLL_SECONDS", "60"))
+    POPULARITY_SNAPSHOT_SECONDS: float = float(os.getenv("POPULARITY_SNAPSHOT_SECONDS", "300"))
+    POPULARITY_PAGE_SIZE: int = int(os.getenv("POPULARITY_PAGE_SIZE", "500"))
+    POPULARITY_SNAPSHOT_PATH: str = os.getenv("POPULARITY_SNAPSHOT_PATH", "data/popularity_snapshot.json")
+
+    # 📍 Revelado de direcciones programado (T-30 min del retiro)
+    ADDRESS_REVEAL_WINDOW_MINUTES: int = int(os.getenv("ADDRESS_REVEAL_WINDOW_MINUTES", "30"))
+    ADDRESS_REVEAL_HORIZON_MINUTES: int = int(os.getenv("ADDRESS_REVEAL_HORIZON_MINUTES", "180"))
+    ADDRESS_REVEAL_RELOAD_SECONDS: float = float(os.getenv("ADDRESS_REVEAL_RELOAD_SECONDS", "60"))
+    ADDRESS_REVEAL_RETRY_SECONDS: float = float(os.getenv("ADDRESS_REVEAL_RETRY_SECONDS", "5"))
+    ADDRESS_REVEAL_BATCH_SIZE: int = int(os.getenv("ADDRESS_REVEAL_BATCH_SIZE", "500"))
+
+    # 📡 Feed de cambios para dashboards (SSE)
+    CHANGE_FEED_POLL_SECONDS: float = float(os.getenv("CHANGE_FEED_POLL_SECONDS", "2"))
+    CHANGE_FEED_PAGE_SIZE: int = int(os.getenv("CHANGE_FEED_PAGE_SIZE", "500"))
+    CHANGE_FEED_OVERLAP_SECONDS: float = float(os.getenv("CHANGE_FEED_OVERLAP_SECONDS", "5"))
+    CHANGE_FEED_BUFFER_SIZE: int = int(os.getenv("CHANGE_FEED_BUFFER_SIZE", "512"))
+    CHANGE_FEED_QUEUE_SIZE: int = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "256"))
+    CHANGE_FEED_HEARTBEAT_SECONDS: float = float(os.getenv("CHANGE_FEED_HEARTBEAT_SECONDS", "15"))
+
+    # 🔑 Autenticación (JWT de Supabase Auth)
+    # HS256 con el JWT secret del proyecto, o RS256/ES256 con claves del JWKS
+    SUPABASE_JWT_SECRET: str = os.getenv("SUPABASE_JWT_SECRET")
+    SECRET_KEY: str = os.getenv("SECRET_KEY") or os.getenv("SUPABASE_JWT_SECRET")
+    ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
+    JWT_AUDIENCE: str = os.getenv("JWT_AUDIENCE", "authenticated")
+    JWT_LEEWAY_SECONDS: int = int(os.getenv("JWT_LEEWAY_SECONDS", "10"))
+    JWKS_URL: str = os.getenv("JWKS_URL") or f"{os.getenv('SUPABASE_URL')}/auth/v1/.well-known/jwks.json"
+    JWKS_REFRESH_SECONDS: float = float(os.getenv("JWKS_REFRESH_SECONDS", "3600"))
+    JWKS_MIN_REFRESH_SECONDS: float = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", "30"))
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+    AUTH_TOKEN_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_TOKEN_CACHE_TTL_SECONDS", "300"))
+    AUTH_ROLE_CACHE_SIZE: int = int(os.getenv("AUTH_ROLE_CACHE_SIZE", "10000"))
+    AUTH_ROLE_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_ROLE_CACHE_TTL_SECONDS", "60"))
+
 settings = Settings()
 
 
@@ -2,6 +2,7 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.api.v1 import router as v1_router
+from app.services.metrics import MetricsMiddleware, prometheus_metrics
 
 # Crear la aplicación FastAPI
 app = FastAPI(
@@ -19,6 +20,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas por ruta (formato Prometheus en /metrics)
+app.add_middleware(MetricsMiddleware)
+app.add_api_route("/metrics", prometheus_metrics, methods=["GET"], include_in_schema=False)
+
 # Endpoint raíz
 @app.get("/")
 def root():
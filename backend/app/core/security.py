@@ -1,21 +1,231 @@
-from fastapi import Depends, HTTPException, status
+import asyncio
+import hashlib
+import hmac
+import time
+
+import httpx
+from fastapi import Depends, Header, HTTPException, Query, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from app.core.config import settings
+from app.db.repositories import ProfileRepository, get_profile_repository
+from app.services.cache import TTLCache
 
 # Esquema de autenticación por token
 security = HTTPBearer()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+# Claims ya verificados, por hash del token (nunca el token en claro).
+# Cada entrada vence con el `exp` del token o con el TTL, lo que ocurra antes.
+token_cache = TTLCache(
+    maxsize=settings.AUTH_TOKEN_CACHE_SIZE,
+    ttl=settings.AUTH_TOKEN_CACHE_TTL_SECONDS,
+    name="auth_tokens",
+)
+
+# Rol de cada usuario (lo que get_user_role() resuelve en SQL), TTL corto
+role_cache = TTLCache(
+    maxsize=settings.AUTH_ROLE_CACHE_SIZE,
+    ttl=settings.AUTH_ROLE_CACHE_TTL_SECONDS,
+    name="auth_roles",
+)
+
+
+class JWKSCache:
+    """
+    Claves públicas del JWKS de Supabase Auth, por `kid`. Se refrescan
+    cada JWKS_REFRESH_SECONDS o al ver un `kid` desconocido (rotación),
+    como mucho una vez cada JWKS_MIN_REFRESH_SECONDS.
+    """
+
+    def __init__(self, url=None, refresh_seconds=None, min_refresh_seconds=None):
+        self.url = url or settings.JWKS_URL
+        self.refresh_seconds = refresh_seconds or settings.JWKS_REFRESH_SECONDS
+        self.min_refresh_seconds = min_refresh_seconds or settings.JWKS_MIN_REFRESH_SECONDS
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self.refreshes = 0
+
+    async def _fetch(self):
+        # Cliente propio: no enviar la service role key a otro host
+        async with httpx.AsyncClient(timeout=settings.SUPABASE_TIMEOUT_SECONDS) as http:
+            r = await http.get(self.url)
+            r.raise_for_status()
+            return r.json().get("keys", [])
+
+    async def refresh(self, force=False):
+        async with self._lock:
+            age = time.monotonic() - self._fetched_at
+            if age < self.min_refresh_seconds or (not force and age < self.refresh_seconds):
+                return
+            keys = await self._fetch()
+            self._keys = {k.get("kid"): k for k in keys}
+            self._fetched_at = time.monotonic()
+            self.refreshes += 1
+
+    async def get(self, kid):
+        if time.monotonic() - self._fetched_at >= self.refresh_seconds:
+            await self.refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            await self.refresh(force=True)
+            key = self._keys.get(kid)
+        return key
+
+
+jwks = JWKSCache()
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def _signing_key(token: str):
+    if settings.ALGORITHM.startswith("HS"):
+        return settings.SECRET_KEY
+    kid = jwt.get_unverified_header(token).get("kid")
+    key = await jwks.get(kid)
+    if key is None:
+        raise JWTError(f"Clave de firma desconocida: {kid}")
+    return key
+
+
+async def verify_token(token: str) -> dict:
+    """
+    Verifica firma, `exp` y audiencia del JWT. Los claims válidos quedan en
+    caché hasta su vencimiento, así que un mismo token se verifica una vez.
+    """
+    key = token_key(token)
+    claims = token_cache.get(key)
+    if claims is not None:
+        if claims.get("exp") is None or claims["exp"] > time.time():
+            token_cache.hits += 1
+            return claims
+        token_cache.invalidate(key)
+
+    token_cache.misses += 1
+    claims = jwt.decode(
+        token,
+        await _signing_key(token),
+        algorithms=[settings.ALGORITHM],
+        audience=settings.JWT_AUDIENCE,
+        options={"leeway": settings.JWT_LEEWAY_SECONDS},
+    )
+    ttl = settings.AUTH_TOKEN_CACHE_TTL_SECONDS
+    if claims.get("exp") is not None:
+        ttl = min(ttl, claims["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(key, claims, ttl)
+    return claims
+
+
+def require_service_token(x_service_token: str | None = Header(default=None)):
+    """Endpoints internos (dashboards, servicios): exige SERVICE_TOKEN."""
+    if not settings.SERVICE_TOKEN or x_service_token != settings.SERVICE_TOKEN:
+        raise HTTPException(status_code=401, detail="Token de servicio inválido")
+
+
+def url_signature(path: str, expires: int) -> str:
+    """Firma de `path` válida hasta `expires` (epoch), con SERVICE_TOKEN como clave."""
+    message = f"{path}:{expires}".encode()
+    return hmac.new(settings.SERVICE_TOKEN.encode(), message, hashlib.sha256).hexdigest()
+
+
+def require_service_token_or_signature(
+    request: Request,
+    x_service_token: str | None = Header(default=None),
+    expires: int | None = Query(None, description="Vencimiento del link firmado (epoch)"),
+    sig: str | None = Query(None, description="Firma del link (url_signature)"),
+):
+    """
+    Como require_service_token, pero acepta también un link firmado: el
+    dashboard arma `?expires=&sig=` para que el navegador descargue directo
+    de la API sin conocer el token.
+    """
+    if settings.SERVICE_TOKEN and x_service_token == settings.SERVICE_TOKEN:
+        return
+    now = time.time()
+    if (
+        not settings.SERVICE_TOKEN or expires is None or not sig
+        or not now <= expires <= now + settings.SIGNED_URL_MAX_SECONDS
+        or not hmac.compare_digest(sig, url_signature(request.url.path, expires))
+    ):
+        raise HTTPException(status_code=401, detail="Token de servicio o firma inválidos")
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        # Decodificar el token JWT
-        payload = jwt.decode(credentials.credentials, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        # Aquí puedes validar el payload y devolver el usuario
-        # Por ejemplo, asumiendo que el payload tiene un campo "sub" (subject) con el ID del usuario
-        return payload
-    except JWTError:
+        # Claims del JWT (con "sub" = id del usuario)
+        return await verify_token(credentials.credentials)
+    except (JWTError, httpx.HTTPError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+
+# Marca en role_cache de "sin rol" (usuario inexistente o bloqueado): TTLCache
+# no guarda None y cada pedido de un usuario bloqueado iría a profiles
+_NO_ROLE = ""
+
+
+async def get_user_role(user_id: str, profiles: ProfileRepository):
+    """Rol del usuario (cliente, productor, admin) o None, cacheado por usuario."""
+    async def load():
+        return await profiles.get_role(user_id) or _NO_ROLE
+
+    return await role_cache.get_or_load(user_id, load) or None
+
+
+def invalidate_user_role(user_id=None):
+    """Olvida el rol cacheado de un usuario (o de todos) tras cambiarlo."""
+    if user_id is None:
+        role_cache.clear()
+    else:
+        role_cache.invalidate(user_id)
+
+
+# Para rutas que aceptan tanto servicios internos como usuarios
+optional_bearer = HTTPBearer(auto_error=False)
+
+# Rol de quien llama con SERVICE_TOKEN (dashboards, servicios internos)
+SERVICE_ROLE = "service"
+
+
+async def get_caller(
+    x_service_token: str | None = Header(default=None),
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_bearer),
+    profiles: ProfileRepository = Depends(get_profile_repository),
+):
+    """
+    Quién llama: un servicio interno (X-Service-Token, rol "service") o un
+    usuario con su JWT. Claims y rol salen de token_cache y role_cache.
+    """
+    if settings.SERVICE_TOKEN and x_service_token == settings.SERVICE_TOKEN:
+        return {"sub": None, "role": SERVICE_ROLE}
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user = await get_current_user(credentials)
+    return dict(user, role=await get_user_role(user["sub"], profiles))
+
+
+def require_role(*roles):
+    """Dependencia que exige uno de `roles` ("service" para SERVICE_TOKEN). Devuelve quien llama."""
+    async def dependency(caller: dict = Depends(get_caller)):
+        if caller["role"] not in roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Permiso denegado")
+        return caller
+    return dependency
+
+
+def auth_stats():
+    return {
+        "tokens": token_cache.stats(),
+        "roles": role_cache.stats(),
+        "jwks": {"keys": len(jwks._keys), "refreshes": jwks.refreshes},
+    }
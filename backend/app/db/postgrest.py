@@ -0,0 +1,89 @@
+import httpx
+from app.core.config import settings
+from app.services.metrics import track_upstream
+
+# Cliente HTTP asíncrono compartido por todo el proceso (pool keep-alive).
+# Todo el tráfico va al mismo host de Supabase, así que los límites del
+# pool son en la práctica límites por host.
+_http_client: httpx.AsyncClient | None = None
+
+
+def _headers():
+    return {
+        "apikey": settings.SUPABASE_SERVICE_ROLE_KEY,
+        "Authorization": f"Bearer {settings.SUPABASE_SERVICE_ROLE_KEY}",
+    }
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Devuelve (creándolo si hace falta) el cliente HTTP con pool compartido."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            base_url=f"{settings.SUPABASE_URL}/rest/v1",
+            headers=_headers(),
+            limits=httpx.Limits(
+                max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=settings.SUPABASE_POOL_KEEPALIVE_SECONDS,
+            ),
+            timeout=httpx.Timeout(
+                settings.SUPABASE_TIMEOUT_SECONDS,
+                connect=settings.SUPABASE_CONNECT_TIMEOUT_SECONDS,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Cierra el pool (llamar al apagar la aplicación)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class PostgrestClient:
+    """
+    Acceso asíncrono a la API REST (PostgREST) de Supabase.
+    Los parámetros siguen la sintaxis de PostgREST, p. ej. {"id": "eq.123"}.
+    Los errores HTTP se propagan como httpx.HTTPStatusError.
+    """
+
+    def __init__(self, http: httpx.AsyncClient):
+        self._http = http
+
+    async def select(self, table, params=None, headers=None):
+        with track_upstream("select", table) as call:
+            r = await self._http.get(f"/{table}", params=params or {}, headers=headers)
+            call["status"] = r.status_code
+        r.raise_for_status()
+        return r.json()
+
+    async def rpc(self, function, payload=None):
+        with track_upstream("rpc", function) as call:
+            r = await self._http.post(f"/rpc/{function}", json=payload or {})
+            call["status"] = r.status_code
+        r.raise_for_status()
+        return r.json() if r.content else None
+
+    async def insert(self, table, rows, returning=False):
+        prefer = "return=representation" if returning else "return=minimal"
+        with track_upstream("insert", table) as call:
+            r = await self._http.post(f"/{table}", json=rows, headers={"Prefer": prefer})
+            call["status"] = r.status_code
+        r.raise_for_status()
+        return r.json() if returning else None
+
+    async def update(self, table, values, params, returning=False):
+        prefer = "return=representation" if returning else "return=minimal"
+        with track_upstream("update", table) as call:
+            r = await self._http.patch(f"/{table}", params=params, json=values, headers={"Prefer": prefer})
+            call["status"] = r.status_code
+        r.raise_for_status()
+        return r.json() if returning else None
+
+
+def get_postgrest() -> PostgrestClient:
+    """Dependencia FastAPI: cliente PostgREST sobre el pool compartido."""
+    return PostgrestClient(get_http_client())
@@ -0,0 +1,256 @@
+from fastapi import Depends
+from app.core.config import settings
+from app.db.postgrest import PostgrestClient, get_postgrest
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_filter
+
+# Columnas de `orders` que se pueden proyectar desde la API
+ORDER_COLUMNS = (
+    "id", "client_id", "producer_id", "status", "delivery_address", "pickup_time",
+    "subtotal_cents", "commission_cents", "total_cents",
+    "created_at", "paid_at", "address_revealed_at", "updated_at",
+)
+
+# Columnas de `dishes` que usa el índice de autocompletado
+DISH_INDEX_COLUMNS = (
+    "id", "producer_id", "name", "category", "price_cents", "image_url", "is_available", "updated_at",
+)
+
+
+class DishRepository:
+    """Consultas asíncronas sobre la tabla `dishes`."""
+
+    def __init__(self, db: PostgrestClient):
+        self.db = db
+
+    async def list_popular(self, limit: int = 10, city: str | None = None, zone_id: int | None = None):
+        params = {"select": "*", "limit": limit}
+        if city:
+            params["city"] = f"eq.{city}"
+        if zone_id is not None:
+            # filtro por igualdad sobre la zona del productor (sin test de polígono por fila)
+            params["select"] = "*,producers!inner(delivery_zone_id)"
+            params["producers.delivery_zone_id"] = f"eq.{zone_id}"
+        return await self.db.select("dishes", params)
+
+    async def get(self, dish_id: str):
+        rows = await self.db.select("dishes", {"select": "*", "id": f"eq.{dish_id}", "limit": 1})
+        return rows[0] if rows else None
+
+    async def get_many(self, dish_ids, columns="*"):
+        """Platos por id (en cualquier orden; faltan los que no existen)."""
+        if not dish_ids:
+            return []
+        return await self.db.select("dishes", {"select": columns, "id": f"in.({','.join(dish_ids)})"})
+
+    async def search(self, query: str, limit: int = 20, offset: int = 0, category: str | None = None):
+        """Búsqueda difusa con ranking (search_dishes, índice de trigramas)."""
+        return await self.db.rpc("search_dishes", {
+            "query_param": query,
+            "limit_param": limit,
+            "offset_param": offset,
+            "category_param": category,
+        })
+
+    async def list_for_index(self, updated_since=None, include_unavailable=False,
+                             page_size=settings.DISH_INDEX_PAGE_SIZE):
+        """
+        Platos para el índice de autocompletado, por páginas en orden
+        (updated_at, id). Con `updated_since` sólo los modificados desde ahí.
+        """
+        params = {
+            "select": ",".join(DISH_INDEX_COLUMNS),
+            "order": "updated_at.asc,id.asc",
+            "limit": page_size,
+        }
+        if updated_since:
+            params["updated_at"] = f"gte.{updated_since}"
+        if not include_unavailable:
+            params["is_available"] = "eq.true"
+        rows = []
+        while True:
+            page = await self.db.select("dishes", dict(params, offset=len(rows)))
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+
+
+class ZoneRepository:
+    """Zonas de entrega (polígonos para el índice en memoria)."""
+
+    def __init__(self, db: PostgrestClient):
+        self.db = db
+
+    async def list_geojson(self):
+        return await self.db.rpc("get_delivery_zones_geojson") or []
+
+
+class OrderRepository:
+    """Consultas asíncronas sobre la tabla `orders` y sus RPC."""
+
+    def __init__(self, db: PostgrestClient):
+        self.db = db
+
+    async def list_page(self, columns=ORDER_COLUMNS, limit=50, cursor=None,
+                        status=None, producer_id=None, client_id=None):
+        """
+        Página de pedidos en orden (created_at DESC, id DESC) usando
+        paginación por cursor (keyset), apoyada en idx_orders_created_at.
+        Devuelve (filas, next_cursor); next_cursor es None en la última página.
+        """
+        params = {
+            "select": ",".join(columns),
+            "order": "created_at.desc,id.desc",
+            "limit": limit + 1,   # una fila extra para saber si hay más
+        }
+        if status:
+            params["status"] = f"eq.{status}"
+        if producer_id:
+            params["producer_id"] = f"eq.{producer_id}"
+        if client_id:
+            params["client_id"] = f"eq.{client_id}"
+        if cursor:
+            params["or"] = keyset_filter(*decode_cursor(cursor))
+
+        rows = await self.db.select("orders", params)
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+
+    async def iter_pages(self, page_size=500, cursor=None, **kwargs):
+        """Recorre todas las páginas de `list_page`, una por vez."""
+        while True:
+            rows, cursor = await self.list_page(limit=page_size, cursor=cursor, **kwargs)
+            if rows:
+                yield rows
+            if cursor is None:
+                return
+
+    async def get(self, order_id: str):
+        rows = await self.db.select("orders", {"select": "*", "id": f"eq.{order_id}"})
+        return rows[0] if rows else None
+
+    async def reveal_contact_info(self, order_id: str):
+        return await self.db.rpc("reveal_contact_info", {"order_id": order_id})
+
+    async def create_bulk(self, orders):
+        """Inserta pedidos ya cotizados con sus ítems, en una transacción."""
+        return await self.db.rpc("create_orders_bulk", {"orders_param": orders}) or []
+
+    async def upcoming_address_reveals(self, horizon_minutes=180):
+        """Pedidos pagados y activos con retiro dentro del horizonte."""
+        return await self.db.rpc("upcoming_address_reveals", {"horizon_minutes_param": horizon_minutes}) or []
+
+    async def reveal_addresses(self, order_ids, window_minutes=30):
+        """Marca address_revealed_at en los pedidos que ya están en la ventana."""
+        return await self.db.rpc("reveal_addresses_batch", {
+            "order_ids_param": list(order_ids),
+            "window_minutes_param": window_minutes,
+        }) or []
+
+    async def popularity_events_since(self, paid_at=None, order_id=None, item_id=None, limit=500):
+        """Ítems de pedidos pagados después del watermark (paid_at, order_id, item_id)."""
+        return await self.db.rpc("popularity_events_since", {
+            "since_paid_at_param": paid_at,
+            "since_order_id_param": order_id,
+            "since_item_id_param": item_id,
+            "limit_param": limit,
+        }) or []
+
+
+class ProfileRepository:
+    """Consultas sobre `profiles` (rol y estado de cada usuario)."""
+
+    def __init__(self, db: PostgrestClient):
+        self.db = db
+
+    async def get_role(self, user_id: str):
+        """Rol del usuario; None si no existe o está bloqueado."""
+        rows = await self.db.select("profiles", {"select": "role,is_active", "id": f"eq.{user_id}"})
+        if not rows or not rows[0].get("is_active", True):
+            return None
+        return rows[0]["role"]
+
+    async def list_page(self, limit=50, cursor=None, search=None, role=None, active=None):
+        """
+        Página de usuarios (perfil + email) en orden (created_at DESC, id DESC),
+        filtrada y buscada en la base. Devuelve (filas, next_cursor).
+        """
+        created_at, user_id = decode_cursor(cursor) if cursor else (None, None)
+        rows = await self.db.rpc("admin_list_users", {
+            "search_param": search,
+            "role_param": role,
+            "active_param": active,
+            "cursor_created_at_param": created_at,
+            "cursor_id_param": user_id,
+            "limit_param": limit + 1,   # una fila extra para saber si hay más
+        }) or []
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+
+    async def set_active(self, user_ids, active: bool):
+        """Bloquea o activa muchos usuarios en un UPDATE. Devuelve los que cambiaron."""
+        return await self.db.rpc("admin_set_users_active", {
+            "user_ids_param": list(user_ids),
+            "active_param": active,
+        }) or []
+
+
+class AdminRepository:
+    """Métricas agregadas del marketplace (RPC en la base, no en Python)."""
+
+    def __init__(self, db: PostgrestClient):
+        self.db = db
+
+    async def dashboard_metrics(self, start_date=None, end_date=None):
+        """
+        Totales, comisión, neto, métricas por productor y serie diaria
+        calculados por get_admin_dashboard_metrics. Montos en centavos.
+        """
+        payload = {
+            "start_date_param": start_date.isoformat() if start_date else None,
+            "end_date_param": end_date.isoformat() if end_date else None,
+        }
+        return await self.db.rpc("get_admin_dashboard_metrics", payload)
+
+    async def rebuild_rollups(self, since=None):
+        """Reconstruye order_rollups_* desde `since` (o todo el historial)."""
+        payload = {"since_param": since.isoformat() if since else None}
+        return await self.db.rpc("rebuild_order_rollups", payload)
+
+    async def dashboard_changes(self, orders_since=(None, None), alerts_since=(None, None), limit=500):
+        """
+        Pedidos modificados y alertas de bypass nuevas después de cada
+        watermark (timestamp, id). Sin watermark sólo devuelve `now`.
+        """
+        return await self.db.rpc("dashboard_changes_since", {
+            "orders_since_param": orders_since[0],
+            "orders_since_id_param": orders_since[1],
+            "alerts_since_param": alerts_since[0],
+            "alerts_since_id_param": alerts_since[1],
+            "limit_param": limit,
+        })
+
+
+# ---------- Dependencias FastAPI ----------
+
+def get_dish_repository(db: PostgrestClient = Depends(get_postgrest)) -> DishRepository:
+    return DishRepository(db)
+
+
+def get_zone_repository(db: PostgrestClient = Depends(get_postgrest)) -> ZoneRepository:
+    return ZoneRepository(db)
+
+
+def get_order_repository(db: PostgrestClient = Depends(get_postgrest)) -> OrderRepository:
+    return OrderRepository(db)
+
+
+def get_profile_repository(db: PostgrestClient = Depends(get_postgrest)) -> ProfileRepository:
+    return ProfileRepository(db)
+
+
+def get_admin_repository(db: PostgrestClient = Depends(get_postgrest)) -> AdminRepository:
+    return AdminRepository(db)
@@ -1,10 +1,19 @@
 ﻿from supabase import create_client
 import requests
+from requests.adapters import HTTPAdapter
 from app.core.config import settings
 
 # Inicializar cliente Supabase
 supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
 
+# Sesión HTTP reutilizable (keep-alive) para las llamadas REST directas
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+))
+_timeout = (settings.SUPABASE_CONNECT_TIMEOUT_SECONDS, settings.SUPABASE_TIMEOUT_SECONDS)
+
 def _headers():
     return {
         "apikey": settings.SUPABASE_SERVICE_ROLE_KEY,
@@ -14,14 +23,14 @@ def _headers():
 def supabase_get_order_safe(order_id: str):
     """Ejemplo de función para obtener un pedido por ID"""
     url = f"{settings.SUPABASE_URL}/rest/v1/orders?id=eq.{order_id}&select=*"
-    r = requests.get(url, headers=_headers(), timeout=10)
+    r = _session.get(url, headers=_headers(), timeout=_timeout)
     r.raise_for_status()
     return r.json()
 
 def supabase_call_reveal_contact_info(order_id: str):
     """Ejemplo de llamada RPC para revelar contacto"""
     url = f"{settings.SUPABASE_URL}/rest/v1/rpc/reveal_contact_info"
-    r = requests.post(url, headers=_headers(), json={"order_id": order_id}, timeout=10)
+    r = _session.post(url, headers=_headers(), json={"order_id": order_id}, timeout=_timeout)
     r.raise_for_status()
     return r.json()
 
@@ -1,6 +1,13 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.router import api_router
+from app.core.security import require_service_token
+from app.db.postgrest import close_http_client
+from app.services.address_reveal import reveal_scheduler
+from app.services.change_feed import change_feed
+from app.services.metrics import MetricsMiddleware, prometheus_metrics
+from app.services.payments_service import close_mp_client, webhook_worker
+from app.services.popularity import popularity_engine
 
 app = FastAPI(
     title="Servicio de Pedidos - Core API",
@@ -21,7 +28,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia por ruta, pedidos en curso y conteo por estado (ver /metrics)
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_router)
+# Prometheus envía el token en el header X-Service-Token (http_headers del scrape)
+app.add_api_route("/metrics", prometheus_metrics, methods=["GET"], include_in_schema=False,
+                  dependencies=[Depends(require_service_token)])
+
+@app.on_event("startup")
+async def startup():
+    # Workers que aplican los webhooks de Mercado Pago encolados
+    webhook_worker.start()
+    # Ranking de popularidad (snapshot local + pedidos pagados desde el watermark)
+    popularity_engine.start()
+    # Revelado de direcciones a T-30 min del retiro
+    reveal_scheduler.start()
+    # Cambios de pedidos y alertas para los dashboards (SSE)
+    change_feed.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await webhook_worker.stop()
+    await popularity_engine.stop()
+    await reveal_scheduler.stop()
+    await change_feed.stop()
+    # Cerrar los pools de conexiones hacia Supabase y Mercado Pago
+    await close_http_client()
+    await close_mp_client()
 
 @app.get("/")
 def read_root():
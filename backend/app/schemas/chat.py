@@ -1,7 +1,21 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
+
+from app.services.contact_detector import detect
 
 class ChatMessage(BaseModel):
     id: str
     order_id: str
     text: str
     created_at: str
+    has_phone_number: bool = False
+    has_email: bool = False
+    is_blocked: bool = False
+
+    @model_validator(mode="after")
+    def detect_contact_info(self):
+        # Misma regla que los triggers de chat_messages, resuelta en el backend
+        found = detect(self.text)
+        self.has_phone_number = self.has_phone_number or found.has_phone_number
+        self.has_email = self.has_email or found.has_email
+        self.is_blocked = self.is_blocked or found.is_blocked
+        return self
@@ -1,6 +1,9 @@
-from pydantic import BaseModel
+from datetime import datetime
+from pydantic import BaseModel, Field
 from typing import Optional
 
+from app.core.config import settings
+
 class Order(BaseModel):
     id: str
     is_paid: bool
@@ -10,3 +13,17 @@ class Order(BaseModel):
     status: Optional[str] = None
     canReveal: Optional[bool] = False
 
+
+class OrderItemIn(BaseModel):
+    dish_id: str
+    quantity: int = Field(gt=0, le=1000)
+
+class OrderCreate(BaseModel):
+    client_id: str
+    producer_id: str
+    items: list[OrderItemIn] = Field(min_length=1, max_length=settings.ORDER_MAX_ITEMS)
+    delivery_address: Optional[str] = None
+    pickup_time: Optional[datetime] = None
+
+class BulkOrderCreate(BaseModel):
+    orders: list[OrderCreate] = Field(min_length=1, max_length=settings.ORDER_BULK_MAX_ORDERS)
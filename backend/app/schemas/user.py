@@ -0,0 +1,5 @@
+from pydantic import BaseModel, Field
+
+class UserStatusChange(BaseModel):
+    user_ids: list[str] = Field(min_length=1, max_length=1000)
+    active: bool
@@ -0,0 +1,233 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime
+
+from app.core.config import settings
+from app.db.postgrest import PostgrestClient, get_http_client
+from app.db.repositories import OrderRepository
+from app.utils.logger import logger
+
+ACTIVE_STATUSES = ("confirmed", "preparing", "ready")
+
+
+def _ts(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value.timestamp()
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).astimezone().isoformat() if ts is not None else None
+
+
+def reveal_state(pickup_ts, revealed_ts, now, window_seconds):
+    """
+    Estado del revelado de dirección de un pedido pagado y activo:
+    pending (falta para T-30), due (ventana abierta pero aún sin marcar),
+    revealed (ventana abierta y marcado) o closed (el retiro ya pasó).
+    """
+    if now > pickup_ts:
+        return "closed"
+    if revealed_ts is not None:
+        return "revealed"
+    if now >= pickup_ts - window_seconds:
+        return "due"
+    return "pending"
+
+
+class AddressRevealScheduler:
+    """
+    Revela direcciones exactamente a T-30 min del retiro.
+
+    Carga los retiros próximos (upcoming_address_reveals) y los ordena en
+    un heap por hora de revelado; un único task duerme hasta el próximo
+    vencimiento y marca todos los pedidos vencidos con una llamada a
+    reveal_addresses_batch. El estado de cada pedido queda en memoria para
+    responder consultas sin recalcular la ventana en la base.
+
+    Pensado para usarse desde el event loop (no es thread-safe).
+    """
+
+    def __init__(self, window_minutes=None, horizon_minutes=None, reload_seconds=None,
+                 retry_seconds=None, batch_size=None):
+        self.window = (window_minutes or settings.ADDRESS_REVEAL_WINDOW_MINUTES) * 60.0
+        self.horizon_minutes = horizon_minutes or settings.ADDRESS_REVEAL_HORIZON_MINUTES
+        self.reload_seconds = reload_seconds or settings.ADDRESS_REVEAL_RELOAD_SECONDS
+        self.retry_seconds = retry_seconds or settings.ADDRESS_REVEAL_RETRY_SECONDS
+        self.batch_size = batch_size or settings.ADDRESS_REVEAL_BATCH_SIZE
+        self._entries = {}   # order_id -> [pickup_ts, revealed_ts, fire_at]
+        self._heap = []      # (fire_at, order_id); las entradas viejas se descartan al salir
+        self._owners = {}    # order_id -> (producer_id, client_id), para validar quién consulta
+        self._loaded_at = 0.0
+        self._reload = False
+        self._task = None
+        self._wake = None
+        self.stats = {"loads": 0, "batches": 0, "revealed": 0, "retries": 0, "loaded_at": None}
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ---------- Estado en memoria ----------
+
+    def schedule(self, order_id, pickup_time, revealed_at=None, producer_id=None, client_id=None):
+        pickup_ts = _ts(pickup_time)
+        revealed_ts = _ts(revealed_at)
+        fire_at = pickup_ts - self.window
+        self._entries[order_id] = [pickup_ts, revealed_ts, fire_at]
+        if producer_id is not None and client_id is not None:
+            self._owners[order_id] = (str(producer_id), str(client_id))
+        if revealed_ts is None:
+            heapq.heappush(self._heap, (fire_at, order_id))
+
+    def load(self, rows, now=None):
+        """Reemplaza los pedidos programados por los de upcoming_address_reveals."""
+        self._entries = {}
+        self._heap = []
+        self._owners = {}
+        for row in rows:
+            if row.get("status", ACTIVE_STATUSES[0]) in ACTIVE_STATUSES and row.get("pickup_time"):
+                self.schedule(str(row["order_id"]), row["pickup_time"], row.get("address_revealed_at"),
+                              row.get("producer_id"), row.get("client_id"))
+        heapq.heapify(self._heap)
+        self._loaded_at = now if now is not None else time.time()
+        self.stats["loads"] += 1
+        self.stats["loaded_at"] = datetime.utcnow().isoformat()
+
+    def state(self, order_id, now=None):
+        """Estado del revelado desde memoria, o None si el pedido no está programado."""
+        entry = self._entries.get(order_id)
+        if entry is None:
+            return None
+        now = now if now is not None else time.time()
+        pickup_ts, revealed_ts, _ = entry
+        return {
+            "order_id": order_id,
+            "state": reveal_state(pickup_ts, revealed_ts, now, self.window),
+            "pickup_time": _iso(pickup_ts),
+            "reveal_at": _iso(pickup_ts - self.window),
+            "address_revealed_at": _iso(revealed_ts),
+            "seconds_until_reveal": max(0.0, pickup_ts - self.window - now),
+        }
+
+    def owners(self, order_id):
+        """(producer_id, client_id) de un pedido programado, o None si no se conocen."""
+        return self._owners.get(order_id)
+
+    def due(self, now):
+        """Saca del heap los pedidos cuya hora de revelado ya llegó."""
+        ids = []
+        while self._heap and self._heap[0][0] <= now and len(ids) < self.batch_size:
+            fire_at, order_id = heapq.heappop(self._heap)
+            entry = self._entries.get(order_id)
+            if entry is None or entry[1] is not None or entry[2] != fire_at:
+                continue   # olvidado, ya revelado o reprogramado
+            if now > entry[0]:
+                del self._entries[order_id]   # el retiro ya pasó
+                self._owners.pop(order_id, None)
+                continue
+            ids.append(order_id)
+        return ids
+
+    def mark_revealed(self, rows, requested, now):
+        revealed = set()
+        for row in rows:
+            order_id = str(row["order_id"])
+            entry = self._entries.get(order_id)
+            if entry is not None:
+                entry[1] = _ts(row["address_revealed_at"])
+            revealed.add(order_id)
+        self.stats["revealed"] += len(revealed)
+        # Los que la base no reveló (reloj adelantado respecto de la base, o
+        # pedido cancelado) se reintentan mientras no pase el retiro
+        for order_id in requested:
+            entry = self._entries.get(order_id)
+            if order_id in revealed or entry is None:
+                continue
+            fire_at = now + self.retry_seconds
+            if fire_at <= entry[0]:
+                entry[2] = fire_at
+                heapq.heappush(self._heap, (fire_at, order_id))
+                self.stats["retries"] += 1
+
+    def next_fire_at(self):
+        return self._heap[0][0] if self._heap else None
+
+    # ---------- Worker ----------
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self, reload=True):
+        """Despertar el worker; con reload, recargar los retiros (p. ej. pedidos recién pagados)."""
+        self._reload = self._reload or reload
+        if self._wake is not None:
+            self._wake.set()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def fire(self, orders: OrderRepository, now=None):
+        """Revela en lotes todos los pedidos vencidos. Devuelve cuántos."""
+        total = 0
+        while True:
+            now_ = now if now is not None else time.time()
+            ids = self.due(now_)
+            if not ids:
+                return total
+            try:
+                rows = await orders.reveal_addresses(ids, round(self.window / 60))
+            except Exception:
+                # se reintentan después de retry_seconds
+                for order_id in ids:
+                    entry = self._entries[order_id]
+                    entry[2] = now_ + self.retry_seconds
+                    heapq.heappush(self._heap, (entry[2], order_id))
+                raise
+            self.stats["batches"] += 1
+            self.mark_revealed(rows, ids, now_)
+            total += len(rows)
+
+    async def _run(self):
+        orders = OrderRepository(PostgrestClient(get_http_client()))
+        while True:
+            self._wake.clear()
+            failed = False
+            try:
+                if self._reload or time.time() - self._loaded_at >= self.reload_seconds:
+                    self._reload = False
+                    self.load(await orders.upcoming_address_reveals(self.horizon_minutes))
+                await self.fire(orders)
+            except Exception as e:
+                logger.error(f'Error revealing scheduled addresses: {e}')
+                failed = True
+            timeout = self._loaded_at + self.reload_seconds - time.time()
+            fire_at = self.next_fire_at()
+            if fire_at is not None:
+                timeout = min(timeout, fire_at - time.time())
+            if failed:
+                # sin carga vigente el timeout queda vencido: esperar antes de reintentar
+                timeout = max(timeout, self.retry_seconds)
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(timeout, 0.05))
+            except asyncio.TimeoutError:
+                pass
+
+    def snapshot(self):
+        fire_at = self.next_fire_at()
+        return dict(
+            self.stats,
+            scheduled=len(self._entries),
+            heap=len(self._heap),
+            next_reveal_at=_iso(fire_at),
+        )
+
+
+reveal_scheduler = AddressRevealScheduler()
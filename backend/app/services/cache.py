@@ -0,0 +1,147 @@
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+
+from app.core.config import settings
+
+_MISSING = object()
+_caches = weakref.WeakSet()   # todas las instancias, para exportar métricas
+
+
+def _consume_exception(task):
+    # marcar como leída si nadie quedó esperando la carga
+    if not task.cancelled():
+        task.exception()
+
+
+class TTLCache:
+    """
+    Caché en memoria con TTL por clave, límite de tamaño LRU y carga
+    "single-flight": N pedidos concurrentes de una misma clave ausente
+    generan una sola llamada al origen y todos reciben el mismo resultado.
+
+    Pensado para usarse desde el event loop (no es thread-safe).
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, name="cache"):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._inflight = {}          # key -> asyncio.Future
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        _caches.add(self)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key, loader, ttl=None):
+        """
+        Devuelve el valor cacheado o lo obtiene con `await loader()`.
+        Los resultados None no se cachean (p. ej. "no encontrado").
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        # La carga corre en un task propio: si el pedido que la inició se
+        # cancela (cliente desconectado), los demás siguen esperándola
+        task = asyncio.ensure_future(self._load(key, loader, ttl, self._generation))
+        task.add_done_callback(_consume_exception)
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader, ttl, generation):
+        try:
+            value = await loader()
+        finally:
+            self._inflight.pop(key, None)
+        # Si hubo una invalidación durante la carga, no guardar datos viejos
+        if value is not None and generation == self._generation:
+            self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, key):
+        self._generation += 1
+        self._data.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Invalida todas las claves para las que `predicate(key)` es verdadero."""
+        self._generation += 1
+        for key in [k for k in self._data if predicate(k)]:
+            del self._data[key]
+
+    def clear(self):
+        self._generation += 1
+        self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def all_caches():
+    return sorted(_caches, key=lambda c: c.name)
+
+
+# ---------- Catálogo de platos ----------
+
+dish_cache = TTLCache(
+    maxsize=settings.DISH_CACHE_MAXSIZE,
+    ttl=settings.DISH_CACHE_TTL_SECONDS,
+    name="dishes",
+)
+
+
+def invalidate_dish(dish_id=None):
+    """
+    Invalida un plato y todos los listados de populares y búsquedas (que
+    pueden contenerlo). Sin `dish_id`, vacía el catálogo completo.
+    """
+    if dish_id is None:
+        dish_cache.clear()
+        return
+    dish_cache.invalidate_where(lambda k: k[0] in ("popular", "search") or k == ("dish", dish_id))
@@ -0,0 +1,240 @@
+import asyncio
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.db.postgrest import PostgrestClient, get_http_client
+from app.db.repositories import AdminRepository
+from app.utils.logger import logger
+
+# tipo de evento -> (clave en dashboard_changes_since, columna del watermark)
+KINDS = {
+    "order": ("orders", "updated_at"),
+    "bypass_alert": ("bypass_alerts", "created_at"),
+}
+
+
+def _parse_ts(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value
+
+
+class Subscription:
+    """Cola de eventos de un cliente conectado; None indica fin del stream."""
+
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class ChangeFeed:
+    """
+    Cambios de pedidos y alertas de bypass para los dashboards.
+
+    Un único task lee dashboard_changes_since desde el watermark de cada
+    tipo y publica cada lote como un evento numerado (`epoch:seq`). Los
+    eventos quedan en un buffer circular: un cliente que se reconecta con su
+    último id recibe sólo lo que se perdió; si ese id ya salió del buffer o
+    es de otro proceso, recibe `reset` y vuelve a leer todo.
+
+    Cada lectura empieza CHANGE_FEED_OVERLAP_SECONDS antes del watermark
+    (updated_at es la hora de inicio de la transacción, que puede confirmar
+    después de otra más nueva); lo ya publicado se descarta.
+
+    `source(orders_since, alerts_since, limit)` es inyectable (por defecto
+    AdminRepository.dashboard_changes), así que se puede probar con una
+    fuente local. Sólo consulta la base mientras haya suscriptores.
+
+    Pensado para usarse desde el event loop (no es thread-safe).
+    """
+
+    def __init__(self, source=None, poll_seconds=None, page_size=None, overlap_seconds=None,
+                 buffer_size=None, queue_size=None):
+        self.source = source
+        self.poll_seconds = poll_seconds or settings.CHANGE_FEED_POLL_SECONDS
+        self.page_size = page_size or settings.CHANGE_FEED_PAGE_SIZE
+        self.overlap = timedelta(seconds=overlap_seconds if overlap_seconds is not None
+                                 else settings.CHANGE_FEED_OVERLAP_SECONDS)
+        self.queue_size = queue_size or settings.CHANGE_FEED_QUEUE_SIZE
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self._events = deque(maxlen=buffer_size or settings.CHANGE_FEED_BUFFER_SIZE)
+        self._subscribers = set()
+        self.watermarks = {kind: None for kind in KINDS}   # tipo -> datetime del último cambio
+        self._seen = {}   # (tipo, id) -> datetime ya publicado, dentro del solapamiento
+        self._task = None
+        self._wake = None
+        self.stats = {"polls": 0, "events": 0, "rows": 0, "dropped_subscribers": 0, "polled_at": None}
+
+    @property
+    def watermark(self):
+        return f"{self.epoch}:{self.seq}"
+
+    # ---------- Eventos ----------
+
+    def publish(self, kind, rows):
+        """Numera un lote de filas y lo entrega a los suscriptores."""
+        self.seq += 1
+        event = {"id": self.watermark, "seq": self.seq, "kind": kind, "rows": rows}
+        self._events.append(event)
+        self.stats["events"] += 1
+        self.stats["rows"] += len(rows)
+        for sub in list(self._subscribers):
+            try:
+                sub.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # cliente lento: se corta el stream; al reconectar con su
+                # último id recupera lo que siga en el buffer
+                self._subscribers.discard(sub)
+                sub.close()
+                self.stats["dropped_subscribers"] += 1
+        return event
+
+    def events_since(self, watermark):
+        """Eventos posteriores a `watermark`, o None si ya no se pueden reconstruir."""
+        try:
+            epoch, seq = watermark.split(":")
+            seq = int(seq)
+        except (AttributeError, ValueError):
+            return None
+        if epoch != self.epoch or seq > self.seq:
+            return None
+        oldest = self._events[0]["seq"] if self._events else self.seq + 1
+        if seq < oldest - 1:
+            return None
+        return [e for e in self._events if e["seq"] > seq]
+
+    def subscribe(self, watermark=None):
+        """
+        Registra un cliente. Devuelve (suscripción, eventos pendientes); los
+        pendientes son None si hay que avisarle `reset`.
+        """
+        sub = Subscription(self.queue_size)
+        backlog = self.events_since(watermark) if watermark else None
+        self._subscribers.add(sub)
+        if self._wake is not None:
+            self._wake.set()
+        return sub, backlog
+
+    def unsubscribe(self, sub):
+        self._subscribers.discard(sub)
+
+    # ---------- Lectura de la base ----------
+
+    def _since(self, kind):
+        ts = self.watermarks[kind]
+        return ((ts - self.overlap).isoformat(), None)
+
+    def _pause(self):
+        # Sin suscriptores no se lee la base: lo que cambie mientras tanto no
+        # queda en el buffer, así que los ids anteriores dejan de ser válidos
+        if self.watermarks["order"] is None:
+            return
+        self.watermarks = {kind: None for kind in KINDS}
+        self._seen = {}
+        self._events.clear()
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+
+    async def poll(self, source):
+        """Lee y publica lo que cambió desde los watermarks. Devuelve cuántas filas."""
+        if self.watermarks["order"] is None:
+            res = await source((None, None), (None, None), 1)
+            now = _parse_ts(res["now"])
+            self.watermarks = {kind: now for kind in KINDS}
+
+        cursors = {kind: self._since(kind) for kind in KINDS}
+        fresh = {kind: [] for kind in KINDS}
+        while cursors:
+            res = await source(
+                cursors.get("order", (None, None)),
+                cursors.get("bypass_alert", (None, None)),
+                self.page_size,
+            ) or {}
+            for kind, (key, ts_column) in KINDS.items():
+                if kind not in cursors:
+                    continue
+                rows = res.get(key) or []
+                for row in rows:
+                    ts = _parse_ts(row[ts_column])
+                    seen_key = (kind, str(row["id"]))
+                    if self._seen.get(seen_key) == ts:
+                        continue
+                    self._seen[seen_key] = ts
+                    fresh[kind].append(row)
+                    if ts > self.watermarks[kind]:
+                        self.watermarks[kind] = ts
+                if len(rows) < self.page_size:
+                    del cursors[kind]
+                else:
+                    last = rows[-1]
+                    cursors[kind] = (last[ts_column], str(last["id"]))
+
+        horizon = min(self.watermarks.values()) - self.overlap
+        self._seen = {k: ts for k, ts in self._seen.items() if ts >= horizon}
+        for kind, rows in fresh.items():
+            if rows:
+                self.publish(kind, rows)
+        self.stats["polls"] += 1
+        self.stats["polled_at"] = datetime.utcnow().isoformat()
+        return sum(len(rows) for rows in fresh.values())
+
+    # ---------- Worker ----------
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        """Leer los cambios ya (p. ej. después de crear o pagar pedidos)."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for sub in list(self._subscribers):
+            sub.close()
+        self._subscribers.clear()
+
+    async def _run(self):
+        source = self.source or AdminRepository(PostgrestClient(get_http_client())).dashboard_changes
+        while True:
+            self._wake.clear()
+            timeout = None
+            if self._subscribers:
+                timeout = self.poll_seconds
+                try:
+                    await self.poll(source)
+                except Exception as e:
+                    logger.error(f'Error polling dashboard changes: {e}')
+            else:
+                self._pause()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def snapshot(self):
+        return dict(
+            self.stats,
+            watermark=self.watermark,
+            subscribers=len(self._subscribers),
+            buffered=len(self._events),
+            since={kind: ts.isoformat() if ts else None for kind, ts in self.watermarks.items()},
+        )
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,107 @@
+import re
+import unicodedata
+from typing import Iterable, NamedTuple
+
+# Patrones históricos de la base (detect_contact_info_in_message,
+# detect_phone_in_chat y send_chat_message). Se conservan para el benchmark
+# y como referencia: el detector marca todo lo que marcan ellos.
+LEGACY_PHONE_PATTERN = r'\+?[0-9]{1,4}[\s\-]?[0-9]{1,4}[\s\-]?[0-9]{4,10}'
+LEGACY_EMAIL_PATTERN = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+
+_NUMBER_WORDS = {
+    "cero": "0", "uno": "1", "una": "1", "dos": "2", "tres": "3", "cuatro": "4",
+    "cinco": "5", "seis": "6", "siete": "7", "ocho": "8", "nueve": "9",
+    "diez": "10", "once": "11", "doce": "12", "trece": "13", "catorce": "14",
+    "quince": "15",
+}
+_SYMBOL_WORDS = {
+    "arroba": "@", "(at)": "@", "[at]": "@", "{at}": "@",
+    "punto": ".", "(dot)": ".", "[dot]": ".", "{dot}": ".",
+}
+_REPLACEMENTS = {**_NUMBER_WORDS, **_SYMBOL_WORDS}
+
+# Una sola pasada para todas las palabras ofuscadas
+_WORDS_RE = re.compile(
+    r'\b(?:' + '|'.join(sorted(_NUMBER_WORDS, key=len, reverse=True)) + r'|arroba|punto)\b'
+    r'|[\(\[\{](?:at|dot)[\)\]\}]'
+)
+# Ambos patrones en una sola expresión (un único recorrido del texto), ya
+# tolerantes a separadores entre dígitos ("11 2345-6789", "1.1.2.3") y a
+# espacios alrededor de @ y . ("juan @ gmail . com")
+_SEP = r'[\s.\-_/()]*'
+_CONTACT_RE = re.compile(
+    r'(?P<email>[a-z0-9._%+-]+ *@ *[a-z0-9.-]+ *\. *[a-z]{2,})'
+    r'|(?P<phone>\+?\d(?:' + _SEP + r'\d){5,})'
+)
+_PHONE_RE = re.compile(r'\+?\d(?:' + _SEP + r'\d){5,}')
+# Una corrida de dígitos es un teléfono si, sin contar precios con separador
+# de miles ("1.500 - 2.000") ni fechas ("2024 11 15", "15/11/2024"), le
+# quedan al menos 6 dígitos, el mínimo del patrón legado: bloquea los
+# números cortos ("123-4567", "155 1234") y "pedido 10 2024 11 15" no.
+_PHONE_MIN_DIGITS = 6
+_NOT_PHONE_RE = re.compile(
+    r'(?<![\d.])\d{1,3}(?:\.\d{3})+(?:,\d+)?(?![\d.])'
+    r'|(?<!\d)\d{1,2}[/.\-]\d{1,2}[/.\-](?:19|20)\d{2}(?!\d)'
+    r'|(?<!\d)(?:19|20)\d{2}[\s/.\-]\d{1,2}[\s/.\-]\d{1,2}(?!\d)'
+)
+# Acentos y mayúsculas se pliegan con una tabla (NFKC sólo si quedan caracteres no ASCII)
+_FOLD = str.maketrans("áéíóúüñÁÉÍÓÚÜÑ", "aeiouunaeiouun")
+
+
+class ContactDetection(NamedTuple):
+    has_phone_number: bool
+    has_email: bool
+
+    @property
+    def is_blocked(self) -> bool:
+        return self.has_phone_number or self.has_email
+
+
+_CLEAN = ContactDetection(False, False)
+
+
+def normalize(text: str) -> str:
+    """
+    Texto canónico para la detección: minúsculas sin acentos y números o
+    símbolos escritos con palabras ("once", "arroba", "(dot)") reemplazados.
+    """
+    if text.isascii():
+        text = text.lower()
+    else:
+        text = unicodedata.normalize("NFKC", text.translate(_FOLD)).lower()
+    return _WORDS_RE.sub(lambda m: _REPLACEMENTS[m[0]], text)
+
+
+def _is_phone(run: str) -> bool:
+    digits = _NOT_PHONE_RE.sub(" ", run)
+    return sum(c.isdigit() for c in digits) >= _PHONE_MIN_DIGITS
+
+
+def _has_phone(text: str) -> bool:
+    return any(_is_phone(m.group(0)) for m in _PHONE_RE.finditer(text))
+
+
+def detect(text: str | None) -> ContactDetection:
+    """Detecta teléfonos y emails (también ofuscados) en un mensaje de chat."""
+    if not text:
+        return _CLEAN
+    text = normalize(text)
+    if "@" not in text:
+        # sin @ no puede haber email: basta con buscar el teléfono
+        return ContactDetection(_has_phone(text), False)
+    has_phone = has_email = False
+    for m in _CONTACT_RE.finditer(text):
+        if m.lastgroup == "email":
+            has_email = True
+            # un teléfono dentro del email ("11234567@...") también cuenta
+            has_phone = has_phone or _has_phone(m.group(0))
+        else:
+            has_phone = has_phone or _is_phone(m.group(0))
+        if has_phone and has_email:
+            break
+    return ContactDetection(has_phone, has_email)
+
+
+def detect_many(texts: Iterable[str | None]) -> list[ContactDetection]:
+    """Clasifica una lista de mensajes (mismo orden que la entrada)."""
+    return [detect(text) for text in texts]
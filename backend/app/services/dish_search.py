@@ -0,0 +1,176 @@
+import asyncio
+import heapq
+import re
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from app.core.config import settings
+
+# Campos de `dishes` que guarda el índice de autocompletado
+DISH_FIELDS = ("id", "producer_id", "name", "category", "price_cents", "image_url")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text):
+    """Minúsculas sin acentos (equivalente a lower(immutable_unaccent(...)))."""
+    if not text:
+        return ""
+    text = text.lower()
+    if text.isascii():
+        return text
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+def _document(row):
+    terms = tuple(dict.fromkeys(tokenize(row.get("name")) + tokenize(row.get("category"))))
+    if not terms:
+        return None
+    name = " ".join(tokenize(row.get("name")))
+    return terms, name, {k: row.get(k) for k in DISH_FIELDS}
+
+
+class DishPrefixIndex:
+    """
+    Índice de prefijos en memoria para el autocompletado de platos.
+
+    Guarda una lista ordenada de (término, dish_id) con los términos del
+    nombre y la categoría de cada plato; un prefijo se resuelve con dos
+    búsquedas binarias en lugar de recorrer el catálogo. Las altas, bajas y
+    cambios son incrementales.
+
+    Pensado para usarse desde el event loop (no es thread-safe).
+    """
+
+    def __init__(self):
+        self._terms = []   # [(término, dish_id)] ordenada
+        self._docs = {}    # dish_id -> (términos, nombre normalizado, fila)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, dish_id):
+        return dish_id in self._docs
+
+    # ---------- Mantenimiento ----------
+
+    def upsert(self, row):
+        dish_id = row.get("id")
+        if dish_id is None:
+            return False
+        doc = _document(row)
+        self.remove(dish_id)
+        if doc is None:
+            return False
+        for term in doc[0]:
+            insort(self._terms, (term, dish_id))
+        self._docs[dish_id] = doc
+        return True
+
+    def remove(self, dish_id):
+        doc = self._docs.pop(dish_id, None)
+        if doc is None:
+            return
+        for term in doc[0]:
+            i = bisect_left(self._terms, (term, dish_id))
+            if i < len(self._terms) and self._terms[i] == (term, dish_id):
+                del self._terms[i]
+
+    def load(self, rows):
+        """Reconstruye el índice completo a partir de una lista de filas."""
+        docs = {}
+        for row in rows:
+            doc = _document(row)
+            if row.get("id") is not None and doc is not None:
+                docs[row["id"]] = doc
+        self._docs = docs
+        self._terms = sorted((term, dish_id) for dish_id, doc in docs.items() for term in doc[0])
+
+    # ---------- Consultas ----------
+
+    def _prefix_ids(self, prefix):
+        lo = bisect_left(self._terms, (prefix,))
+        # "\uffff" ordena después de cualquier continuación del prefijo
+        hi = bisect_left(self._terms, (prefix + "\uffff",), lo)
+        return {dish_id for _, dish_id in self._terms[lo:hi]}
+
+    def complete(self, query, limit=8):
+        """
+        Platos cuyo nombre/categoría contiene todas las palabras de `query`
+        como prefijo ("empa carn" -> "Empanadas de carne"). Primero los que
+        empiezan con el texto buscado, luego los nombres más cortos.
+        """
+        tokens = tokenize(query)
+        if not tokens or limit <= 0:
+            return []
+        # la palabra más larga es la más selectiva: se resuelve primero
+        tokens.sort(key=len, reverse=True)
+        ids = self._prefix_ids(tokens[0])
+        for token in tokens[1:]:
+            if not ids:
+                break
+            ids &= self._prefix_ids(token)
+
+        phrase = " ".join(tokenize(query))
+        best = heapq.nsmallest(limit, (self._docs[dish_id] for dish_id in ids), key=lambda doc: (
+            not doc[1].startswith(phrase), len(doc[1]), doc[1],
+        ))
+        return [doc[2] for doc in best]
+
+
+# Índice compartido por todos los requests del proceso
+dish_prefix_index = DishPrefixIndex()
+
+_sync_lock = asyncio.Lock()
+_sync_state = {"watermark": None, "refreshed_at": 0.0, "rebuilt_at": 0.0}
+
+
+def _advance_watermark(rows):
+    stamps = [r["updated_at"] for r in rows if r.get("updated_at")]
+    if stamps:
+        current = _sync_state["watermark"]
+        _sync_state["watermark"] = max(stamps + ([current] if current else []))
+
+
+async def rebuild_dish_index(dishes):
+    """Recarga todos los platos disponibles (detecta también bajas)."""
+    rows = await dishes.list_for_index()
+    dish_prefix_index.load(rows)
+    _sync_state["watermark"] = None
+    _advance_watermark(rows)
+    _sync_state["rebuilt_at"] = _sync_state["refreshed_at"] = time.monotonic()
+
+
+async def refresh_dish_index(dishes):
+    """
+    Aplica sólo los platos modificados desde el último watermark. Los que
+    dejaron de estar disponibles salen del índice.
+    """
+    rows = await dishes.list_for_index(updated_since=_sync_state["watermark"], include_unavailable=True)
+    for row in rows:
+        if row.get("is_available", True):
+            dish_prefix_index.upsert(row)
+        else:
+            dish_prefix_index.remove(row.get("id"))
+    _advance_watermark(rows)
+    _sync_state["refreshed_at"] = time.monotonic()
+
+
+def request_dish_index_refresh():
+    """Fuerza una actualización incremental en la próxima consulta."""
+    _sync_state["refreshed_at"] = 0.0
+
+
+async def ensure_dish_index(dishes):
+    now = time.monotonic()
+    async with _sync_lock:
+        if (not _sync_state["rebuilt_at"]
+                or now - _sync_state["rebuilt_at"] >= settings.DISH_INDEX_REBUILD_SECONDS):
+            await rebuild_dish_index(dishes)
+        elif now - _sync_state["refreshed_at"] >= settings.DISH_INDEX_REFRESH_SECONDS:
+            await refresh_dish_index(dishes)
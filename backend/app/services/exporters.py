@@ -0,0 +1,208 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_SUPPORTED = True
+except ImportError:
+    PARQUET_SUPPORTED = False
+
+# Filas máximas de una hoja de Excel (sin contar el encabezado)
+XLSX_MAX_ROWS = 1_048_575
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Caracteres de control que XML 1.0 no admite
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class ChunkSink:
+    """
+    Destino de escritura que acumula bytes hasta que se los retira con
+    `drain()`. Los writers (zip, csv, parquet) escriben acá y el generador
+    de la respuesta vacía el buffer después de cada página, así que la
+    memoria depende del tamaño de página y no del total de filas.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# ---------- CSV ----------
+
+async def iter_csv(pages, columns):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    yield ("\ufeff" + buf.getvalue()).encode("utf-8")   # BOM: Excel detecta UTF-8
+    async for page in pages:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows([row.get(c) for c in columns] for row in page)
+        yield buf.getvalue().encode("utf-8")
+
+
+# ---------- XLSX ----------
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def _workbook(sheet_name):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _cell(value, style=""):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"{style}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c{style}><v>{value}</v></c>"
+    text = _XML_ILLEGAL.sub("", str(value))
+    return f'<c t="inlineStr"{style}><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _row(values, style=""):
+    return "<row>" + "".join(_cell(v, style) for v in values) + "</row>"
+
+
+async def iter_xlsx(pages, columns, sheet_name="pedidos"):
+    """
+    Libro xlsx de una hoja escrito en streaming: el zip se arma sin
+    seek (descriptores de datos) y las celdas van como inline strings, sin
+    tabla de strings compartidos que habría que tener completa en memoria.
+    """
+    sink = ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _workbook(sheet_name))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", _STYLES)
+        with zf.open("xl/worksheets/sheet1.xml", mode="w") as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _row(columns, ' s="1"')
+            ).encode("utf-8"))
+            written = 0
+            async for page in pages:
+                page = page[:XLSX_MAX_ROWS - written]
+                sheet.write("".join(_row([row.get(c) for c in columns]) for row in page).encode("utf-8"))
+                written += len(page)
+                yield sink.drain()
+                if written >= XLSX_MAX_ROWS:
+                    break
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+# ---------- Parquet ----------
+
+def _arrow_type(column):
+    if column.endswith("_cents"):
+        return pa.int64()
+    if column.endswith(("_at", "_time")):
+        return pa.timestamp("us", tz="UTC")
+    if column.startswith("is_"):
+        return pa.bool_()
+    return pa.string()
+
+
+def _arrow_value(value, type_):
+    if value is not None and pa.types.is_timestamp(type_) and isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value
+
+
+async def iter_parquet(pages, columns):
+    """Un row group por página; requiere pyarrow (dependencia opcional)."""
+    if not PARQUET_SUPPORTED:
+        raise RuntimeError("La exportación a Parquet requiere pyarrow")
+    schema = pa.schema([(c, _arrow_type(c)) for c in columns])
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        async for page in pages:
+            arrays = [
+                pa.array([_arrow_value(row.get(field.name), field.type) for row in page], type=field.type)
+                for field in schema
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+EXPORTERS = {"csv": iter_csv, "xlsx": iter_xlsx, "parquet": iter_parquet}
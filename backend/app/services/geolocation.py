@@ -1,31 +1,93 @@
-import math
+import threading
+import time
+
+import numpy as np
+
+from app.core.config import settings
 from app.db.supabase_client import supabase
+from app.services.spatial_index import ProducerSpatialIndex
+from app.utils.geo import haversine_km  # noqa: F401 (re-exportado)
 
-def haversine_km(lat1, lon1, lat2, lon2):
-    R = 6371.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
+PRODUCER_FIELDS = ("id", "display_name", "lat", "lon", "rating")
 
-def producers_within_radius(lat, lon, radius_km=10.0):
-    # fetch producers with lat/lon columns populated
-    resp = supabase.table("profiles").select("id,display_name,lat,lon,rating").eq("role","productor").execute()
-    if resp.error:
+# Índice en memoria compartido por todos los requests del proceso
+producer_index = ProducerSpatialIndex(cell_deg=settings.PRODUCER_INDEX_CELL_DEG)
+
+_sync_lock = threading.Lock()
+_sync_state = {"watermark": None, "refreshed_at": 0.0, "rebuilt_at": 0.0}
+
+
+def _fetch(query):
+    resp = query.execute()
+    if getattr(resp, "error", None):
         raise Exception("Supabase error: " + str(resp.error))
-    producers = resp.data or []
-    out = []
-    for p in producers:
-        if p.get("lat") is None or p.get("lon") is None:
-            continue
-        dist = haversine_km(lat, lon, float(p["lat"]), float(p["lon"]))
-        if dist <= radius_km:
-            p_copy = dict(p)
-            p_copy["distance_km"] = round(dist, 2)
-            out.append(p_copy)
-    # sort by distance
-    out.sort(key=lambda x: x["distance_km"])
-    return out
+    return resp.data or []
+
+
+def _index_row(row):
+    return {k: row.get(k) for k in PRODUCER_FIELDS}
+
+
+def _advance_watermark(rows):
+    stamps = [r["updated_at"] for r in rows if r.get("updated_at")]
+    if stamps:
+        current = _sync_state["watermark"]
+        _sync_state["watermark"] = max(stamps + ([current] if current else []))
+
+
+def rebuild_producer_index():
+    """Recarga todos los productores en el índice (detecta también bajas)."""
+    rows = _fetch(
+        supabase.table("profiles")
+        .select(",".join(PRODUCER_FIELDS) + ",updated_at")
+        .eq("role", "productor")
+    )
+    producer_index.load(_index_row(r) for r in rows)
+    _sync_state["watermark"] = None
+    _advance_watermark(rows)
+    _sync_state["rebuilt_at"] = _sync_state["refreshed_at"] = time.monotonic()
+
+
+def refresh_producer_index():
+    """
+    Aplica sólo los perfiles modificados desde el último watermark.
+    Los perfiles que dejaron de ser productores salen del índice.
+    """
+    query = supabase.table("profiles").select(",".join(PRODUCER_FIELDS) + ",role,updated_at")
+    if _sync_state["watermark"]:
+        query = query.gte("updated_at", _sync_state["watermark"])
+    rows = _fetch(query)
+    for row in rows:
+        if row.get("role") == "productor":
+            producer_index.upsert(_index_row(row))
+        else:
+            producer_index.remove(row.get("id"))
+    _advance_watermark(rows)
+    _sync_state["refreshed_at"] = time.monotonic()
+
+
+def _ensure_producer_index():
+    now = time.monotonic()
+    with _sync_lock:
+        if (not _sync_state["rebuilt_at"]
+                or now - _sync_state["rebuilt_at"] >= settings.PRODUCER_INDEX_REBUILD_SECONDS):
+            rebuild_producer_index()
+        elif now - _sync_state["refreshed_at"] >= settings.PRODUCER_INDEX_REFRESH_SECONDS:
+            refresh_producer_index()
+
+
+def _with_distance(rows, dist):
+    # una sola copia por resultado, con las distancias redondeadas en lote
+    return [dict(p, distance_km=d) for p, d in zip(rows, np.round(dist, 2).tolist())]
+
+
+def producers_within_radius(lat, lon, radius_km=10.0):
+    # consulta el índice espacial en lugar de recorrer todos los productores
+    _ensure_producer_index()
+    return _with_distance(*producer_index.query_radius(lat, lon, radius_km))
+
+
+def nearest_producers(lat, lon, k=5):
+    _ensure_producer_index()
+    found = producer_index.nearest(lat, lon, k)
+    return [dict(p, distance_km=round(d, 2)) for d, p in found]
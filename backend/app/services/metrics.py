@@ -0,0 +1,312 @@
+import asyncio
+import bisect
+import inspect
+import time
+from contextlib import contextmanager
+
+from fastapi.responses import PlainTextResponse
+
+# Buckets por defecto de Prometheus (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_, labels=()):
+        self.name = name
+        self.help = help_
+        self.label_names = tuple(labels)
+        self._values = {}   # tupla de valores de etiquetas -> total
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, _labels(self.label_names, labels), value
+
+    def snapshot(self):
+        return [dict(zip(self.label_names, labels), value=value) for labels, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value):
+        self._values[labels] = value
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos (como el de Prometheus)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}   # etiquetas -> [conteos por bucket (+Inf al final), suma]
+
+    def observe(self, *labels, value):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*labels, value=time.perf_counter() - start)
+
+    def samples(self):
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                names = self.label_names + ("le",)
+                yield f"{self.name}_bucket", _labels(names, labels + (_number(bound),)), cumulative
+            yield f"{self.name}_sum", _labels(self.label_names, labels), total
+            yield f"{self.name}_count", _labels(self.label_names, labels), cumulative
+
+    def _quantile(self, counts, q):
+        # cota superior del bucket que contiene el cuantil
+        total = sum(counts)
+        target = q * total
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        out = []
+        for labels, (counts, total) in self._values.items():
+            n = sum(counts)
+            out.append(dict(
+                zip(self.label_names, labels),
+                count=n,
+                avg_ms=round(total / n * 1000, 2) if n else None,
+                p50_le_ms=_ms(self._quantile(counts, 0.50)),
+                p95_le_ms=_ms(self._quantile(counts, 0.95)),
+                p99_le_ms=_ms(self._quantile(counts, 0.99)),
+            ))
+        return out
+
+
+def _ms(seconds):
+    return None if seconds == float("inf") else round(seconds * 1000, 2)
+
+
+class MetricsRegistry:
+    """
+    Métricas del proceso. Contadores e histogramas se actualizan en línea;
+    los valores que ya viven en otros componentes (cachés, colas, índices)
+    se leen al exportar mediante "collectors" registrados.
+
+    Pensado para usarse desde el event loop (no es thread-safe).
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = {}   # nombre -> collector
+
+    def counter(self, name, help_, labels=()):
+        return self._metrics.setdefault(name, Counter(name, help_, labels))
+
+    def gauge(self, name, help_, labels=()):
+        return self._metrics.setdefault(name, Gauge(name, help_, labels))
+
+    def histogram(self, name, help_, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._metrics.setdefault(name, Histogram(name, help_, labels, buckets))
+
+    def register_collector(self, name, collector):
+        """`collector()` (o `await collector()`) -> {métrica: [(dict de etiquetas, valor)]}."""
+        self._collectors[name] = collector
+
+    async def collect(self):
+        out = {}
+        for name, collector in self._collectors.items():
+            try:
+                result = collector()
+                if inspect.isawaitable(result):
+                    result = await result
+            except Exception as e:
+                result = {"metrics_collector_errors": [({"collector": name, "error": type(e).__name__}, 1)]}
+            for metric, samples in result.items():
+                out.setdefault(metric, []).extend(samples)
+        return out
+
+    async def render(self):
+        """Texto en formato de exposición de Prometheus (0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+        for name, samples in (await self.collect()).items():
+            # los collectors exponen contadores acumulados (*_total) y niveles
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    async def snapshot(self):
+        out = {name: metric.snapshot() for name, metric in self._metrics.items()}
+        for name, samples in (await self.collect()).items():
+            out[name] = [dict(labels, value=value) for labels, value in samples]
+        return out
+
+
+metrics = MetricsRegistry()
+
+# ---------- HTTP ----------
+
+http_requests = metrics.counter(
+    "http_requests_total", "Pedidos HTTP atendidos", ("method", "route", "status"))
+http_latency = metrics.histogram(
+    "http_request_duration_seconds", "Latencia de los pedidos HTTP", ("method", "route"))
+http_in_flight = metrics.gauge(
+    "http_requests_in_flight", "Pedidos HTTP en curso", ("method",))
+
+# ---------- Supabase / PostgREST ----------
+
+upstream_requests = metrics.counter(
+    "supabase_requests_total", "Llamadas a PostgREST", ("op", "target", "status"))
+upstream_latency = metrics.histogram(
+    "supabase_request_duration_seconds", "Latencia de las llamadas a PostgREST", ("op", "target"))
+
+
+@contextmanager
+def track_upstream(op, target):
+    """Cuenta y mide una llamada a PostgREST (status "error" si no hubo respuesta)."""
+    start = time.perf_counter()
+    outcome = {"status": "error"}
+    try:
+        yield outcome
+    finally:
+        upstream_latency.observe(op, target, value=time.perf_counter() - start)
+        upstream_requests.inc(op, target, str(outcome["status"]))
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latencia, conteo por estado y pedidos en curso. La ruta
+    se etiqueta con su plantilla (/api/v1/dishes/{dish_id}), no con la URL,
+    para que la cantidad de series no crezca con los ids.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec(method)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_latency.observe(method, path, value=elapsed)
+            http_requests.inc(method, path, str(status["code"]))
+
+
+async def prometheus_metrics():
+    return PlainTextResponse(await metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# ---------- Collectors de componentes existentes ----------
+
+def _cache_samples():
+    from app.services.cache import all_caches
+
+    out = {"cache_entries": [], "cache_hits_total": [], "cache_misses_total": [],
+           "cache_evictions_total": [], "cache_hit_ratio": []}
+    for cache in all_caches():
+        stats = cache.stats()
+        labels = {"cache": stats["name"]}
+        out["cache_entries"].append((labels, stats["size"]))
+        out["cache_hits_total"].append((labels, stats["hits"] + stats["coalesced"]))
+        out["cache_misses_total"].append((labels, stats["misses"]))
+        out["cache_evictions_total"].append((labels, stats["evictions"]))
+        out["cache_hit_ratio"].append((labels, stats["hit_ratio"]))
+    return out
+
+
+async def _queue_samples():
+    from app.services.address_reveal import reveal_scheduler
+    from app.services.change_feed import change_feed
+    from app.services.payments_service import get_webhook_queue, webhook_worker
+
+    # la cola de webhooks es SQLite: se consulta fuera del event loop
+    queue = await asyncio.to_thread(get_webhook_queue().stats)
+    return {
+        "payment_webhook_queue_depth": [({"status": s}, queue[s]) for s in ("pending", "in_flight", "failed")],
+        "payment_webhooks_applied_total": [({}, webhook_worker.stats["applied"])],
+        "address_reveal_scheduled": [({}, len(reveal_scheduler))],
+        "address_reveal_revealed_total": [({}, reveal_scheduler.stats["revealed"])],
+        "change_feed_subscribers": [({}, change_feed.snapshot()["subscribers"])],
+        "change_feed_events_total": [({}, change_feed.stats["events"])],
+    }
+
+
+def _index_samples():
+    from app.services.popularity import popularity_engine
+    from app.services.zone_index import zone_index
+
+    zones = zone_index.stats()
+    return {
+        "zone_index_memo_hits_total": [({}, zones["hits"])],
+        "zone_index_memo_misses_total": [({}, zones["misses"])],
+        "popularity_events_total": [({}, popularity_engine.stats["events"])],
+        "popularity_dishes": [({}, len(popularity_engine.ranking))],
+    }
+
+
+metrics.register_collector("caches", _cache_samples)
+metrics.register_collector("queues", _queue_samples)
+metrics.register_collector("indexes", _index_samples)
@@ -1,5 +1,266 @@
-﻿from app.utils.logger import logger
+﻿import asyncio
+import hashlib
+import hmac
+import random
 
-def process_webhook(data: dict):
-    logger.info(f'Received Mercado Pago webhook: {data}')
-    return {'received': True}
+import httpx
+
+from app.core.config import settings
+from app.db.postgrest import PostgrestClient, get_http_client
+from app.services.address_reveal import reveal_scheduler
+from app.services.change_feed import change_feed
+from app.services.popularity import popularity_engine
+from app.services.webhook_queue import DurableQueue
+from app.utils.logger import logger
+
+_queue: DurableQueue | None = None
+_mp_client: httpx.AsyncClient | None = None
+
+
+def get_webhook_queue() -> DurableQueue:
+    global _queue
+    if _queue is None:
+        _queue = DurableQueue(settings.PAYMENT_WEBHOOK_QUEUE_PATH)
+    return _queue
+
+
+def get_mp_client() -> httpx.AsyncClient:
+    """Cliente HTTP compartido hacia la API de Mercado Pago."""
+    global _mp_client
+    if _mp_client is None or _mp_client.is_closed:
+        _mp_client = httpx.AsyncClient(
+            base_url=settings.MP_API_URL,
+            timeout=settings.MP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.PAYMENT_WEBHOOK_FETCH_CONCURRENCY * settings.PAYMENT_WEBHOOK_WORKERS
+            ),
+        )
+    return _mp_client
+
+
+async def close_mp_client():
+    """Cierra el cliente de Mercado Pago (llamar al apagar la aplicación)."""
+    global _mp_client
+    if _mp_client is not None:
+        await _mp_client.aclose()
+        _mp_client = None
+
+
+class InvalidSignature(Exception):
+    pass
+
+
+def extract_payment_id(data: dict) -> str:
+    """
+    Id del pago notificado (`{"type": "payment", "data": {"id": ...}}`). Del
+    cuerpo no se usa nada más: estado, monto y referencia se consultan
+    siempre a la API de Mercado Pago.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Webhook inválido")
+    inner = data.get("data")
+    if isinstance(inner, dict) and inner.get("id") is not None:
+        return str(inner["id"])
+    raise ValueError("Webhook sin id de pago")
+
+
+def verify_signature(signature: str | None, request_id: str | None, data_id: str):
+    """
+    Valida el header `x-signature` (`ts=...,v1=...`): HMAC-SHA256 con
+    MP_WEBHOOK_SECRET sobre `id:<data.id>;request-id:<x-request-id>;ts:<ts>;`.
+    """
+    if not settings.MP_WEBHOOK_SECRET:
+        raise InvalidSignature("MP_WEBHOOK_SECRET no configurado")
+    parts = dict(
+        part.strip().split("=", 1) for part in (signature or "").split(",") if "=" in part
+    )
+    ts, v1 = parts.get("ts"), parts.get("v1")
+    if not ts or not v1:
+        raise InvalidSignature("Firma ausente")
+    manifest = f"id:{data_id.lower()};"
+    if request_id:
+        manifest += f"request-id:{request_id};"
+    manifest += f"ts:{ts};"
+    expected = hmac.new(settings.MP_WEBHOOK_SECRET.encode(), manifest.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, v1):
+        raise InvalidSignature("Firma inválida")
+
+
+def idempotency_key(payment_id: str) -> str:
+    """
+    Un evento pendiente por pago: el worker lee el estado actual a Mercado
+    Pago, así que las notificaciones que llegan mientras espera (reintentos
+    o cambios de estado) son duplicados.
+    """
+    return payment_id
+
+
+async def process_webhook(data: dict, signature: str | None = None, request_id: str | None = None,
+                          data_id: str | None = None):
+    """
+    Recibe un webhook de Mercado Pago: valida la firma, guarda el id del pago
+    en la cola local y responde enseguida. Los workers consultan el pago a la
+    API de Mercado Pago y lo aplican en la base en micro-lotes.
+    """
+    payment_id = extract_payment_id(data)
+    # la firma se calcula sobre el `data.id` de la URL (o del cuerpo si no vino)
+    verify_signature(signature, request_id, data_id or payment_id)
+    if data_id and str(data_id) != payment_id:
+        raise InvalidSignature("El id firmado no coincide con el del cuerpo")
+    key = idempotency_key(payment_id)
+    accepted = await asyncio.to_thread(
+        get_webhook_queue().enqueue, key, {"id": payment_id}, payment_id
+    )
+    if accepted:
+        webhook_worker.wake()
+        logger.info(f'Mercado Pago webhook queued: {key}')
+    return {'received': True, 'duplicate': not accepted}
+
+
+async def fetch_payment(http: httpx.AsyncClient, payment_id: str):
+    r = await http.get(
+        f"/v1/payments/{payment_id}",
+        headers={"Authorization": f"Bearer {settings.MP_ACCESS_TOKEN}"},
+    )
+    r.raise_for_status()
+    return r.json()
+
+
+class PaymentWebhookWorker:
+    """
+    Pool de workers que aplica los webhooks encolados. Cada worker atiende
+    una partición de la cola (los eventos de un mismo pago caen siempre en la
+    misma) y envía hasta BATCH_SIZE pagos por llamada a
+    process_mercadopago_webhooks. Dentro de un lote sólo se aplica el último
+    estado de cada pago.
+    """
+
+    def __init__(self, workers=None, batch_size=None, poll_seconds=None, linger_seconds=None,
+                 max_attempts=None, lease_seconds=None):
+        self.workers = workers or settings.PAYMENT_WEBHOOK_WORKERS
+        self.batch_size = batch_size or settings.PAYMENT_WEBHOOK_BATCH_SIZE
+        self.poll_seconds = poll_seconds or settings.PAYMENT_WEBHOOK_POLL_SECONDS
+        self.linger_seconds = settings.PAYMENT_WEBHOOK_LINGER_SECONDS if linger_seconds is None else linger_seconds
+        self.max_attempts = max_attempts or settings.PAYMENT_WEBHOOK_MAX_ATTEMPTS
+        self.fetch_concurrency = settings.PAYMENT_WEBHOOK_FETCH_CONCURRENCY
+        self.lease_seconds = lease_seconds or settings.PAYMENT_WEBHOOK_LEASE_SECONDS
+        self._tasks = []
+        self._wake = []
+        self.stats = {"batches": 0, "applied": 0, "retried": 0, "failed": 0}
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wake = [asyncio.Event() for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._run(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._prune()))
+
+    def wake(self):
+        for event in self._wake:
+            event.set()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, partition):
+        queue = get_webhook_queue()
+        wake = self._wake[partition]
+        while True:
+            wake.clear()
+            try:
+                events = await asyncio.to_thread(
+                    queue.claim, partition, self.workers, self.batch_size, self.lease_seconds
+                )
+                if events:
+                    await self._apply(queue, events)
+                    continue
+            except Exception as e:
+                logger.error(f'Error processing Mercado Pago webhooks: {e}')
+            try:
+                await asyncio.wait_for(wake.wait(), self.poll_seconds)
+                # esperar un poco para juntar la ráfaga en un solo lote
+                await asyncio.sleep(self.linger_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def _backoff(self, attempts):
+        return min(300.0, 2.0 ** attempts) * random.uniform(0.5, 1.0)
+
+    async def _retry(self, queue, event, error):
+        seq, _, _, attempts = event
+        give_up = attempts + 1 >= self.max_attempts
+        self.stats["failed" if give_up else "retried"] += 1
+        if give_up:
+            logger.error(f'Mercado Pago webhook {seq} failed after {attempts + 1} attempts: {error}')
+        await asyncio.to_thread(queue.retry, seq, error, self._backoff(attempts), give_up)
+
+    async def _apply(self, queue, events):
+        # Último evento de cada pago (los anteriores quedan superados)
+        latest = {}
+        for event in events:
+            latest[event[1]] = event
+        batch = list(latest.values())
+
+        mp = get_mp_client()
+        slots = asyncio.Semaphore(self.fetch_concurrency)
+
+        async def fetch(event):
+            async with slots:
+                # el pago se lee siempre de Mercado Pago, nunca del webhook
+                return await fetch_payment(mp, event[2]["id"])
+
+        fetched = await asyncio.gather(*(fetch(event) for event in batch), return_exceptions=True)
+        payments = []
+        ready = []
+        for event, payment in zip(batch, fetched):
+            if isinstance(payment, BaseException):
+                await self._retry(queue, event, payment)
+                continue
+            payments.append(payment)
+            ready.append(event)
+        if not payments:
+            return
+
+        self.stats["batches"] += 1
+        db = PostgrestClient(get_http_client())
+        try:
+            results = await db.rpc("process_mercadopago_webhooks", {"payments_data": payments})
+        except Exception as e:
+            for event in ready:
+                await self._retry(queue, event, e)
+            return
+
+        results = results or []
+        done = []
+        for i, event in enumerate(ready):
+            result = results[i] if i < len(results) else None
+            if result and result.get("success"):
+                done.append((event[0], event[1]))
+            else:
+                await self._retry(queue, event, (result or {}).get("error", "sin respuesta"))
+        self.stats["applied"] += len(done)
+        await asyncio.to_thread(queue.complete, done)
+        if done:
+            # pedidos recién pagados: actualizar el ranking de popularidad,
+            # programar el revelado de sus direcciones y avisar a los dashboards
+            popularity_engine.wake()
+            reveal_scheduler.wake()
+            change_feed.wake()
+
+    async def _prune(self):
+        retention = settings.PAYMENT_WEBHOOK_RETENTION_HOURS * 3600
+        while True:
+            try:
+                await asyncio.to_thread(get_webhook_queue().prune, retention)
+            except Exception as e:
+                logger.error(f'Error pruning Mercado Pago webhook queue: {e}')
+            await asyncio.sleep(3600)
+
+    def snapshot(self):
+        return dict(self.stats, queue=get_webhook_queue().stats())
+
+
+webhook_worker = PaymentWebhookWorker()
@@ -0,0 +1,313 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+from app.db.postgrest import PostgrestClient, get_http_client
+from app.db.repositories import OrderRepository
+from app.utils.logger import logger
+
+# Franjas horarias (hora local de inicio, nombre)
+DAYPARTS = (
+    (0, "trasnoche"),
+    (6, "desayuno"),
+    (11, "almuerzo"),
+    (15, "merienda"),
+    (19, "cena"),
+)
+DAYPART_NAMES = tuple(name for _, name in DAYPARTS)
+LOCAL_TZ = ZoneInfo("America/Argentina/Buenos_Aires")
+
+# Con exponentes mayores se reescalan los puntajes (2**1023 es el máximo float)
+_MAX_EXPONENT = 512
+
+
+def daypart_for(dt):
+    hour = dt.astimezone(LOCAL_TZ).hour
+    current = DAYPARTS[0][1]
+    for start, name in DAYPARTS:
+        if hour >= start:
+            current = name
+    return current
+
+
+def _parse_ts(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if isinstance(value, str) else value
+
+
+def scope_key(zone_id=None, daypart=None):
+    if zone_id is not None and daypart:
+        return f"zone:{zone_id}:{daypart}"
+    if zone_id is not None:
+        return f"zone:{zone_id}"
+    if daypart:
+        return f"part:{daypart}"
+    return "all"
+
+
+class PopularityRanking:
+    """
+    Contadores de popularidad con decaimiento exponencial por plato, para
+    varios ámbitos (global, zona, franja horaria y zona+franja), con un
+    top-K precalculado por ámbito.
+
+    Usa "forward decay": cada unidad vendida en el instante t suma
+    2 ** ((t - landmark) / half_life). Los puntajes guardados sólo crecen y
+    su orden es el de los contadores decaídos, así que no hace falta
+    recorrer nada para envejecerlos y el top-K se mantiene en forma exacta
+    con cada evento: un plato sólo puede entrar al top cuando sube su
+    propio puntaje. El valor decaído a la fecha se obtiene dividiendo por
+    2 ** ((now - landmark) / half_life).
+
+    Pensado para usarse desde el event loop (no es thread-safe).
+    """
+
+    def __init__(self, half_life_hours=168.0, top_k=50):
+        self.half_life = half_life_hours * 3600.0
+        self.top_k = top_k
+        self.landmark = None   # se fija con el primer evento
+        self._scores = {}   # ámbito -> {dish_id: puntaje}
+        self._top = {}      # ámbito -> [(puntaje, dish_id)] de mayor a menor
+
+    def __len__(self):
+        return len(self._scores.get("all", ()))
+
+    def _weight(self, ts):
+        if self.landmark is None:
+            self.landmark = ts
+        exponent = (ts - self.landmark) / self.half_life
+        if exponent > _MAX_EXPONENT:
+            self._rescale(ts)
+            exponent = 0.0
+        return 2.0 ** exponent
+
+    def _rescale(self, new_landmark):
+        factor = 2.0 ** (-(new_landmark - self.landmark) / self.half_life)
+        self.landmark = new_landmark
+        for scores in self._scores.values():
+            for dish_id in scores:
+                scores[dish_id] *= factor
+        for scope, top in self._top.items():
+            self._top[scope] = [(score * factor, dish_id) for score, dish_id in top]
+
+    def add(self, dish_id, quantity, paid_at, zone_id=None):
+        """Suma una venta (paid_at: datetime con zona) a todos sus ámbitos."""
+        ts = paid_at.timestamp()
+        weight = quantity * self._weight(ts)
+        part = daypart_for(paid_at)
+        scopes = ["all", scope_key(daypart=part)]
+        if zone_id is not None:
+            scopes += [scope_key(zone_id), scope_key(zone_id, part)]
+        for scope in scopes:
+            scores = self._scores.setdefault(scope, {})
+            score = scores.get(dish_id, 0.0) + weight
+            scores[dish_id] = score
+            self._offer(scope, dish_id, score)
+
+    def _offer(self, scope, dish_id, score):
+        top = self._top.setdefault(scope, [])
+        for i, (_, current) in enumerate(top):
+            if current == dish_id:
+                del top[i]
+                break
+        else:
+            if len(top) >= self.top_k and score <= top[-1][0]:
+                return
+        # inserción ordenada (K es chico)
+        i = len(top)
+        while i > 0 and top[i - 1][0] < score:
+            i -= 1
+        top.insert(i, (score, dish_id))
+        del top[self.top_k:]
+
+    def top(self, limit=10, zone_id=None, daypart=None, now=None):
+        """[(dish_id, puntaje decaído)] del ámbito, en O(limit)."""
+        top = self._top.get(scope_key(zone_id, daypart), ())
+        if not top:
+            return []
+        exponent = ((now or time.time()) - self.landmark) / self.half_life
+        decay = 2.0 ** -min(max(exponent, -_MAX_EXPONENT), 1000)
+        return [(dish_id, score * decay) for score, dish_id in top[:limit]]
+
+    def _rebuild_top(self, scope):
+        scores = self._scores.get(scope, {})
+        best = sorted(((s, d) for d, s in scores.items()), reverse=True)[:self.top_k]
+        self._top[scope] = best
+
+    # ---------- Snapshots ----------
+
+    def dump(self):
+        return {"landmark": self.landmark, "half_life": self.half_life, "scores": self._scores}
+
+    def restore(self, data):
+        self.landmark = data["landmark"]
+        self._scores = data["scores"]
+        self._top = {}
+        for scope in self._scores:
+            self._rebuild_top(scope)
+
+
+class PopularityEngine:
+    """
+    Mantiene `PopularityRanking` al día leyendo los pedidos pagados desde un
+    watermark (popularity_events_since) y guarda snapshots periódicos en
+    disco para no recalcular todo el historial al reiniciar.
+    """
+
+    def __init__(self, ranking=None, snapshot_path=None, poll_seconds=None, snapshot_seconds=None,
+                 page_size=None):
+        self.ranking = ranking or PopularityRanking(
+            half_life_hours=settings.POPULARITY_HALF_LIFE_HOURS,
+            top_k=settings.POPULARITY_TOP_K,
+        )
+        self.snapshot_path = snapshot_path or settings.POPULARITY_SNAPSHOT_PATH
+        self.poll_seconds = poll_seconds or settings.POPULARITY_POLL_SECONDS
+        self.snapshot_seconds = snapshot_seconds or settings.POPULARITY_SNAPSHOT_SECONDS
+        self.page_size = page_size or settings.POPULARITY_PAGE_SIZE
+        self.watermark = (None, None, None)   # (paid_at, order_id, item_id) del último ítem aplicado
+        self._task = None
+        self._wake = None
+        self._dirty = False
+        self.stats = {"events": 0, "orders": 0, "snapshots": 0, "synced_at": None}
+
+    # ---------- Snapshots ----------
+
+    def _write_snapshot(self, data):
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        os.makedirs(directory, exist_ok=True)
+        # un temporal propio por escritura: cada proceso (uvicorn --workers)
+        # guarda su snapshot y os.replace deja el último completo
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".tmp",
+                                         delete=False) as f:
+            try:
+                json.dump(data, f)
+            except Exception:
+                f.close()
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, self.snapshot_path)
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return None
+        with open(self.snapshot_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    async def save_snapshot(self):
+        if not self._dirty:
+            return
+        data = dict(self.ranking.dump(), watermark=list(self.watermark))
+        # json.dump recorre los dicts: se copian antes de salir del event loop
+        data["scores"] = {scope: dict(scores) for scope, scores in data["scores"].items()}
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write_snapshot, data)
+        except Exception:
+            self._dirty = True
+            raise
+        self.stats["snapshots"] += 1
+
+    async def load_snapshot(self):
+        try:
+            data = await asyncio.to_thread(self._read_snapshot)
+        except Exception as e:
+            logger.error(f'Error reading popularity snapshot: {e}')
+            return False
+        if not data:
+            return False
+        if data.get("half_life") != self.ranking.half_life:
+            # los puntajes dependen de la vida media: se recalcula desde cero
+            logger.info('Popularity snapshot ignored: half-life changed')
+            return False
+        self.ranking.restore(data)
+        # los snapshots anteriores guardaban (paid_at, order_id) de pedidos completos
+        watermark = list(data.get("watermark") or ())
+        self.watermark = tuple(watermark + [None] * (3 - len(watermark)))
+        return True
+
+    # ---------- Sincronización ----------
+
+    async def sync(self, orders: OrderRepository):
+        """
+        Aplica los ítems pagados desde el watermark. Las páginas son de ítems
+        (un pedido puede quedar repartido entre dos). Devuelve cuántos
+        pedidos nuevos vio.
+        """
+        applied = 0
+        while True:
+            paid_at, order_id, item_id = self.watermark
+            rows = await orders.popularity_events_since(paid_at, order_id, item_id, self.page_size)
+            if not rows:
+                break
+            seen = set()
+            for row in rows:
+                self.ranking.add(row["dish_id"], row["quantity"], _parse_ts(row["paid_at"]), row.get("zone_id"))
+                seen.add(row["order_id"])
+            # el pedido del watermark ya se contó en la página anterior
+            seen.discard(order_id)
+            last = rows[-1]
+            self.watermark = (last["paid_at"], last["order_id"], last["item_id"])
+            self.stats["events"] += len(rows)
+            self.stats["orders"] += len(seen)
+            applied += len(seen)
+            self._dirty = True
+            if len(rows) < self.page_size:
+                break
+        self.stats["synced_at"] = datetime.utcnow().isoformat()
+        return applied
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        """Pedir una sincronización inmediata (p. ej. después de aplicar pagos)."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.save_snapshot()
+        except Exception as e:
+            logger.error(f'Error saving popularity snapshot: {e}')
+
+    async def _run(self):
+        await self.load_snapshot()
+        orders = OrderRepository(PostgrestClient(get_http_client()))
+        last_snapshot = time.monotonic()
+        while True:
+            self._wake.clear()
+            try:
+                await self.sync(orders)
+                if time.monotonic() - last_snapshot >= self.snapshot_seconds:
+                    await self.save_snapshot()
+                    last_snapshot = time.monotonic()
+            except Exception as e:
+                logger.error(f'Error syncing dish popularity: {e}')
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def top(self, limit=10, zone_id=None, daypart=None):
+        return self.ranking.top(limit=limit, zone_id=zone_id, daypart=daypart)
+
+    def snapshot(self):
+        return dict(
+            self.stats,
+            dishes=len(self.ranking),
+            scopes=len(self.ranking._top),
+            watermark=list(self.watermark),
+        )
+
+
+popularity_engine = PopularityEngine()
@@ -0,0 +1,80 @@
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+
+
+class PricingError(ValueError):
+    """Carrito inválido (plato inexistente, no disponible, de otro productor...)."""
+
+
+def commission_for(subtotal_cents: int) -> int:
+    # Igual que create_order: FLOOR(subtotal * 0.15), en enteros
+    return subtotal_cents * settings.ORDER_COMMISSION_BPS // 10_000
+
+
+def dish_ids_for(orders) -> list[str]:
+    """Ids de plato de todos los carritos, sin repetir (para un único IN)."""
+    return list(dict.fromkeys(item.dish_id for order in orders for item in order.items))
+
+
+def price_order(order, dishes_by_id: dict) -> dict:
+    """
+    Valida y cotiza un carrito: precios vigentes de cada plato, subtotal,
+    comisión y total en centavos. Las líneas repetidas de un mismo plato se
+    suman en una sola.
+    """
+    quantities = Counter()
+    for item in order.items:
+        quantities[item.dish_id] += item.quantity
+
+    items = []
+    subtotal = 0
+    for dish_id, quantity in quantities.items():
+        dish = dishes_by_id.get(dish_id)
+        if dish is None:
+            raise PricingError(f"El plato {dish_id} no existe")
+        if not dish.get("is_available", True):
+            raise PricingError(f"El plato {dish_id} no está disponible")
+        if str(dish.get("producer_id")) != str(order.producer_id):
+            raise PricingError(f"El plato {dish_id} no pertenece al productor {order.producer_id}")
+        price = int(dish["price_cents"])
+        items.append({"dish_id": dish_id, "quantity": quantity, "price_cents": price,
+                      "line_total_cents": price * quantity})
+        subtotal += price * quantity
+
+    pickup_time = order.pickup_time or datetime.now(timezone.utc) + timedelta(hours=2)
+    if pickup_time.tzinfo is None:
+        pickup_time = pickup_time.replace(tzinfo=timezone.utc)
+    if pickup_time <= datetime.now(timezone.utc):
+        raise PricingError("La hora de retiro debe ser en el futuro")
+
+    commission = commission_for(subtotal)
+    return {
+        "client_id": order.client_id,
+        "producer_id": order.producer_id,
+        "delivery_address": order.delivery_address,
+        "pickup_time": pickup_time.isoformat(),
+        "items": items,
+        "subtotal_cents": subtotal,
+        "commission_cents": commission,
+        "total_cents": subtotal + commission,
+    }
+
+
+def price_orders(orders, dishes: list[dict]) -> list[dict]:
+    """Cotiza varios carritos con los platos ya traídos en una sola consulta."""
+    dishes_by_id = {str(d["id"]): d for d in dishes}
+    priced = []
+    for i, order in enumerate(orders):
+        try:
+            priced.append(price_order(order, dishes_by_id))
+        except PricingError as e:
+            raise PricingError(f"Pedido {i}: {e}") from None
+    return priced
+
+
+def with_order_ids(priced: list[dict]) -> list[dict]:
+    """Asigna los ids de pedido (la API los genera para ligar pedido e ítems)."""
+    return [dict(order, id=str(uuid.uuid4())) for order in priced]
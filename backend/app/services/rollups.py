@@ -0,0 +1,36 @@
+"""
+Backfill / reconstrucción de los agregados de pedidos (order_rollups_*).
+
+Los agregados se mantienen por trigger; esto sólo hace falta para la carga
+inicial o para reparar un desvío (p. ej. tras una corrección manual de datos).
+
+Uso (desde backend/):
+    python -m app.services.rollups
+    python -m app.services.rollups --since 2024-06-01
+"""
+
+import argparse
+import asyncio
+from datetime import datetime
+
+from app.db.postgrest import PostgrestClient, close_http_client, get_http_client
+from app.db.repositories import AdminRepository
+
+
+async def rebuild(since=None):
+    try:
+        return await AdminRepository(PostgrestClient(get_http_client())).rebuild_rollups(since)
+    finally:
+        await close_http_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None,
+                        help="fecha ISO desde la que reconstruir (días completos); por defecto todo")
+    args = parser.parse_args()
+    print(asyncio.run(rebuild(args.since)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import math
+import threading
+from itertools import chain
+
+import numpy as np
+
+from app.utils.geo import KM_PER_DEG_LAT, km_per_deg_lon, within_radius_batch
+
+# Media circunferencia terrestre: ningún punto está más lejos que esto
+MAX_DISTANCE_KM = math.pi * 6371.0
+
+
+class ProducerSpatialIndex:
+    """
+    Índice espacial en memoria para productores, basado en una grilla
+    de celdas de `cell_deg` grados de lado sobre lat/lon.
+
+    Las consultas por radio y k-vecinos sólo recorren las celdas que
+    intersectan la zona buscada, en lugar de todos los productores.
+    Las altas, bajas y cambios de posición son incrementales (O(1)); cada
+    celda mantiene además sus coordenadas empaquetadas en arrays NumPy
+    (reconstruidos sólo cuando la celda cambia) para calcular distancias
+    en lote.
+    """
+
+    def __init__(self, cell_deg=0.05):
+        if cell_deg <= 0:
+            raise ValueError("cell_deg debe ser mayor a 0")
+        self.cell_deg = float(cell_deg)
+        self._buckets = {}   # (i, j) -> {producer_id: (lat, lon, row)}
+        self._cells = {}     # producer_id -> (i, j)
+        self._packed = {}    # (i, j) -> (lats, lons, rows) empaquetados
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __contains__(self, producer_id):
+        return producer_id in self._cells
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    # ---------- Mantenimiento ----------
+
+    def upsert(self, row):
+        """
+        Agrega o actualiza un productor. Si no tiene coordenadas válidas
+        se elimina del índice. Devuelve True si quedó indexado.
+        """
+        producer_id = row.get("id")
+        if producer_id is None:
+            return False
+        lat, lon = row.get("lat"), row.get("lon")
+        if lat is None or lon is None:
+            self.remove(producer_id)
+            return False
+        lat, lon = float(lat), float(lon)
+        key = self._cell(lat, lon)
+        with self._lock:
+            old_key = self._cells.get(producer_id)
+            if old_key is not None and old_key != key:
+                self._discard(producer_id, old_key)
+            self._buckets.setdefault(key, {})[producer_id] = (lat, lon, dict(row))
+            self._cells[producer_id] = key
+            self._packed.pop(key, None)
+        return True
+
+    def remove(self, producer_id):
+        """Quita un productor del índice (no falla si no existe)."""
+        with self._lock:
+            key = self._cells.pop(producer_id, None)
+            if key is not None:
+                self._discard(producer_id, key)
+
+    def _discard(self, producer_id, key):
+        self._packed.pop(key, None)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return
+        bucket.pop(producer_id, None)
+        if not bucket:
+            del self._buckets[key]
+
+    def load(self, rows):
+        """Reconstruye el índice completo a partir de una lista de filas."""
+        with self._lock:
+            self._buckets = {}
+            self._cells = {}
+            self._packed = {}
+            for row in rows:
+                self.upsert(row)
+
+    # ---------- Consultas ----------
+
+    def _pack(self, key):
+        packed = self._packed.get(key)
+        if packed is None:
+            entries = list(self._buckets[key].values())
+            packed = (
+                np.fromiter((e[0] for e in entries), dtype=np.float64, count=len(entries)),
+                np.fromiter((e[1] for e in entries), dtype=np.float64, count=len(entries)),
+                [e[2] for e in entries],
+            )
+            self._packed[key] = packed
+        return packed
+
+    def _candidates(self, lat, lon, radius_km):
+        """Celdas empaquetadas que intersectan el rectángulo del radio."""
+        dlat = radius_km / KM_PER_DEG_LAT
+        lat_lo, lat_hi = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        # El grado de longitud más corto del rango está en la latitud más polar
+        dlon = radius_km / km_per_deg_lon(max(abs(lat_lo), abs(lat_hi)))
+
+        with self._lock:
+            if dlon >= 180.0:
+                return [self._pack(key) for key in self._buckets]
+            i_lo, j_lo = self._cell(lat_lo, lon - dlon)
+            i_hi, j_hi = self._cell(lat_hi, lon + dlon)
+            n_cells = (i_hi - i_lo + 1) * (j_hi - j_lo + 1)
+            if n_cells > len(self._buckets):
+                # Radio muy grande: es más barato filtrar las celdas ocupadas
+                return [
+                    self._pack((i, j)) for (i, j) in self._buckets
+                    if i_lo <= i <= i_hi and j_lo <= j <= j_hi
+                ]
+            return [
+                self._pack((i, j))
+                for i in range(i_lo, i_hi + 1)
+                for j in range(j_lo, j_hi + 1)
+                if (i, j) in self._buckets
+            ]
+
+    def query_radius(self, lat, lon, radius_km):
+        """
+        Versión en lote de `within_radius`: devuelve (filas, distancias_km)
+        con las distancias como array NumPy, ordenadas de menor a mayor.
+        """
+        cells = self._candidates(lat, lon, radius_km)
+        if not cells:
+            return [], np.empty(0)
+        if len(cells) == 1:
+            lats, lons, rows = cells[0]
+        else:
+            lats = np.concatenate([c[0] for c in cells])
+            lons = np.concatenate([c[1] for c in cells])
+            rows = list(chain.from_iterable(c[2] for c in cells))
+        idx, dist = within_radius_batch(lat, lon, lats, lons, radius_km)
+        return [rows[i] for i in idx.tolist()], dist
+
+    def within_radius(self, lat, lon, radius_km):
+        """
+        Productores a `radius_km` o menos del punto, ordenados por distancia.
+        Devuelve una lista de tuplas (distancia_km, fila).
+        """
+        rows, dist = self.query_radius(lat, lon, radius_km)
+        return list(zip(dist.tolist(), rows))
+
+    def nearest(self, lat, lon, k=5):
+        """
+        Los `k` productores más cercanos al punto, como (distancia_km, fila).
+        Amplía el radio de búsqueda en forma geométrica hasta juntar `k`
+        resultados, por lo que el resultado es exacto.
+        """
+        if k <= 0 or not self._cells:
+            return []
+        radius_km = self.cell_deg * KM_PER_DEG_LAT
+        while True:
+            rows, dist = self.query_radius(lat, lon, radius_km)
+            if len(rows) >= k or radius_km >= MAX_DISTANCE_KM:
+                return list(zip(dist[:k].tolist(), rows[:k]))
+            radius_km *= 2
@@ -0,0 +1,177 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class DurableQueue:
+    """
+    Cola local persistente (SQLite en modo WAL) para eventos de webhook.
+
+    - `enqueue` guarda el evento y su clave de idempotencia en una misma
+      transacción: si la clave ya tiene un evento sin tomar, el nuevo es un
+      duplicado y no se encola. La clave se libera cuando un worker toma el
+      evento, porque lo que llegue después puede traer un estado posterior a
+      la lectura del worker. El índice vive sólo en el archivo (no en
+      memoria): lo modifican todos los procesos que comparten la cola.
+    - `claim` toma los eventos con un lease (`in_flight` hasta `lease_until`)
+      en una sola transacción, así varios procesos (uvicorn --workers) pueden
+      compartir el archivo sin aplicar dos veces el mismo evento. Si el
+      proceso cae antes de marcarlos `done`, al vencer el lease vuelven a
+      estar disponibles (al menos una vez).
+    - Cada evento tiene una partición (crc32 de la clave de orden) para que
+      los eventos de un mismo pago caigan siempre en el mismo worker de cada
+      proceso, en orden de llegada. Al completar un evento se descartan los
+      pendientes más viejos del mismo pago (quedaron superados por el estado
+      nuevo).
+
+    Thread-safe; las llamadas son bloqueantes (usar desde un thread).
+    """
+
+    def __init__(self, path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    idempotency_key TEXT NOT NULL,
+                    order_key TEXT NOT NULL,
+                    partition INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    received_at REAL NOT NULL,
+                    processed_at REAL,
+                    last_error TEXT,
+                    lease_until REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_events_pending
+                    ON events (status, partition, available_at, seq);
+                CREATE INDEX IF NOT EXISTS idx_events_order_key
+                    ON events (order_key, status);
+                CREATE TABLE IF NOT EXISTS idempotency (
+                    key TEXT PRIMARY KEY,
+                    seen_at REAL NOT NULL
+                );
+            """)
+            # colas creadas antes de los leases
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(events)")}
+            if "lease_until" not in columns:
+                self._db.execute("ALTER TABLE events ADD COLUMN lease_until REAL")
+
+    def enqueue(self, idempotency_key, payload, order_key=None):
+        """Encola el evento. Devuelve False si la clave ya tiene un evento sin tomar."""
+        now = time.time()
+        order_key = order_key or idempotency_key
+        partition = zlib.crc32(order_key.encode())
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._db.execute(
+                    "INSERT OR IGNORE INTO idempotency (key, seen_at) VALUES (?, ?)",
+                    (idempotency_key, now),
+                )
+                if cur.rowcount == 0:
+                    self._db.execute("COMMIT")
+                    return False
+                self._db.execute(
+                    "INSERT INTO events (idempotency_key, order_key, partition, payload, available_at, received_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (idempotency_key, order_key, partition, json.dumps(payload, default=str), now, now),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            return True
+
+    def claim(self, partition, partitions, limit, lease_seconds):
+        """
+        Toma los próximos eventos de una partición, en orden de llegada: los
+        pendientes y los `in_flight` cuyo lease venció (su proceso cayó o se
+        colgó). Quedan `in_flight` por `lease_seconds`; ningún otro proceso
+        los toma mientras tanto. Libera sus claves de idempotencia.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "UPDATE events SET status = 'in_flight', lease_until = ?"
+                    " WHERE seq IN ("
+                    "  SELECT seq FROM events"
+                    "  WHERE partition % ? = ?"
+                    "   AND ((status = 'pending' AND available_at <= ?)"
+                    "    OR (status = 'in_flight' AND lease_until <= ?))"
+                    "  ORDER BY seq LIMIT ?)"
+                    " RETURNING seq, order_key, payload, attempts, idempotency_key",
+                    (now + lease_seconds, partitions, partition, now, now, limit),
+                ).fetchall()
+                self._db.executemany(
+                    "DELETE FROM idempotency WHERE key = ?", [(row[4],) for row in rows]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        # RETURNING no garantiza el orden
+        rows.sort(key=lambda row: row[0])
+        return [(seq, order_key, json.loads(payload), attempts) for seq, order_key, payload, attempts, _ in rows]
+
+    def complete(self, events):
+        """
+        Marca como procesados los eventos [(seq, order_key)], junto con los
+        pendientes anteriores del mismo order_key.
+        """
+        if not events:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "UPDATE events SET status = 'done', processed_at = ?, last_error = NULL, lease_until = NULL"
+                    " WHERE seq = ? OR (order_key = ? AND seq < ? AND status != 'done')",
+                    [(now, seq, order_key, seq) for seq, order_key in events],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def retry(self, seq, error, delay, give_up=False):
+        """Reprograma un evento fallido (o lo marca `failed` si se agotaron los intentos)."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE events SET attempts = attempts + 1, last_error = ?, available_at = ?,"
+                " status = ?, lease_until = NULL WHERE seq = ? AND status = 'in_flight'",
+                (str(error)[:1000], time.time() + delay, "failed" if give_up else "pending", seq),
+            )
+
+    def depth(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM events WHERE status = 'pending'").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM events GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in ("pending", "in_flight", "done", "failed")}
+
+    def prune(self, older_than_seconds):
+        """Borra eventos procesados y claves de idempotencia huérfanas más viejas que el umbral."""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            self._db.execute("DELETE FROM events WHERE status = 'done' AND processed_at < ?", (cutoff,))
+            self._db.execute("DELETE FROM idempotency WHERE seen_at < ?", (cutoff,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.geo import point_in_ring, points_in_ring_batch
+
+_NO_ZONE = object()
+
+
+class Zone:
+    __slots__ = ("id", "name", "polygons", "bbox")
+
+    def __init__(self, zone_id, name, polygons):
+        self.id = zone_id
+        self.name = name
+        # [(exterior, [huecos])], cada anillo como tupla de (lon, lat)
+        self.polygons = polygons
+        lons = [x for exterior, _ in polygons for x, _ in exterior]
+        lats = [y for exterior, _ in polygons for _, y in exterior]
+        self.bbox = (min(lats), min(lons), max(lats), max(lons))
+
+    def contains(self, lat, lon):
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        for exterior, holes in self.polygons:
+            if point_in_ring(lat, lon, exterior) and not any(point_in_ring(lat, lon, h) for h in holes):
+                return True
+        return False
+
+    def contains_batch(self, lats, lons):
+        mask = np.zeros(len(lats), dtype=bool)
+        for exterior, holes in self.polygons:
+            inside = points_in_ring_batch(lats, lons, exterior)
+            for hole in holes:
+                inside &= ~points_in_ring_batch(lats, lons, hole)
+            mask |= inside
+        return mask
+
+    def as_dict(self):
+        return {"zone_id": self.id, "zone_name": self.name}
+
+
+def _polygons(geometry):
+    """Polígonos de un GeoJSON Polygon/MultiPolygon como [(exterior, [huecos])]."""
+    if isinstance(geometry, str):
+        geometry = json.loads(geometry)
+    if geometry["type"] == "Polygon":
+        parts = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        parts = geometry["coordinates"]
+    else:
+        raise ValueError(f"Geometría no soportada: {geometry['type']}")
+    return [
+        (tuple(map(tuple, rings[0])), [tuple(map(tuple, hole)) for hole in rings[1:]])
+        for rings in parts
+    ]
+
+
+class DeliveryZoneIndex:
+    """
+    Resolución punto -> zona de entrega en memoria.
+
+    Los polígonos se cargan una vez con su rectángulo envolvente y se
+    reparten en una grilla de `cell_deg` grados: un punto sólo se prueba
+    contra las zonas cuyo rectángulo toca su celda (ray casting en Python).
+    Los resultados se memorizan por coordenada cuantizada a `quantum_deg`
+    (0.0001° ~ 11 m); el punto se resuelve ya cuantizado, así que todos los
+    puntos de una misma celda de cuantización reciben la misma respuesta.
+
+    Pensado para usarse desde el event loop (no es thread-safe).
+    """
+
+    def __init__(self, cell_deg=0.02, quantum_deg=0.0001, memo_size=100_000):
+        if cell_deg <= 0 or quantum_deg <= 0:
+            raise ValueError("cell_deg y quantum_deg deben ser mayores a 0")
+        self.cell_deg = float(cell_deg)
+        self.quantum_deg = float(quantum_deg)
+        self.memo_size = memo_size
+        self._zones = {}     # zone_id -> Zone
+        self._by_name = {}   # nombre -> Zone
+        self._grid = {}      # (i, j) -> [Zone]
+        self._memo = OrderedDict()   # (qi, qj) -> Zone | _NO_ZONE
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._zones)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def load(self, rows):
+        """
+        Reconstruye el índice a partir de filas {id, name, polygon} con el
+        polígono en GeoJSON (get_delivery_zones_geojson).
+        """
+        zones = [Zone(r["id"], r["name"], _polygons(r["polygon"])) for r in rows]
+        grid = {}
+        for zone in sorted(zones, key=lambda z: z.id):
+            min_lat, min_lon, max_lat, max_lon = zone.bbox
+            i_lo, j_lo = self._cell(min_lat, min_lon)
+            i_hi, j_hi = self._cell(max_lat, max_lon)
+            for i in range(i_lo, i_hi + 1):
+                for j in range(j_lo, j_hi + 1):
+                    grid.setdefault((i, j), []).append(zone)
+        self._zones = {z.id: z for z in zones}
+        self._by_name = {z.name: z for z in zones}
+        self._grid = grid
+        self._memo.clear()
+
+    # ---------- Consultas ----------
+
+    def _resolve(self, lat, lon):
+        # Como get_zone_for_point: la de menor id si hay solapamientos
+        for zone in self._grid.get(self._cell(lat, lon), ()):
+            if zone.contains(lat, lon):
+                return zone
+        return None
+
+    def zone_for_point(self, lat, lon):
+        """Zona ({zone_id, zone_name}) que contiene el punto, o None."""
+        zone = self._zone(lat, lon)
+        return zone.as_dict() if zone is not None else None
+
+    def _zone(self, lat, lon):
+        key = (round(lat / self.quantum_deg), round(lon / self.quantum_deg))
+        zone = self._memo.get(key)
+        if zone is not None:
+            self.hits += 1
+            self._memo.move_to_end(key)
+            return None if zone is _NO_ZONE else zone
+        self.misses += 1
+        zone = self._resolve(key[0] * self.quantum_deg, key[1] * self.quantum_deg)
+        self._memo[key] = _NO_ZONE if zone is None else zone
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return zone
+
+    def is_point_in_zone(self, lat, lon, zone_name):
+        """Como is_point_in_zone en la base: prueba sólo el polígono de esa zona."""
+        zone = self._by_name.get(zone_name)
+        return zone is not None and zone.contains(lat, lon)
+
+    def zones_for_points(self, lats, lons):
+        """
+        Versión en lote (sin memo): ids de zona (o -1) para N puntos, con el
+        ray casting vectorizado por zona sobre los puntos de su rectángulo.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        out = np.full(len(lats), -1, dtype=np.int64)
+        for zone in sorted(self._zones.values(), key=lambda z: z.id, reverse=True):
+            min_lat, min_lon, max_lat, max_lon = zone.bbox
+            idx = np.flatnonzero((lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon))
+            if len(idx):
+                inside = zone.contains_batch(lats[idx], lons[idx])
+                out[idx[inside]] = zone.id
+        return out
+
+    def stats(self):
+        return {
+            "zones": len(self._zones),
+            "cells": len(self._grid),
+            "memo_size": len(self._memo),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Índice compartido por todos los requests del proceso
+zone_index = DeliveryZoneIndex(
+    cell_deg=settings.ZONE_INDEX_CELL_DEG,
+    quantum_deg=settings.ZONE_INDEX_QUANTUM_DEG,
+    memo_size=settings.ZONE_INDEX_MEMO_SIZE,
+)
+
+_sync_lock = asyncio.Lock()
+_sync_state = {"loaded_at": 0.0}
+
+
+async def reload_zone_index(zones):
+    """Recarga los polígonos de las zonas activas."""
+    zone_index.load(await zones.list_geojson())
+    _sync_state["loaded_at"] = time.monotonic()
+
+
+async def ensure_zone_index(zones):
+    async with _sync_lock:
+        if (not _sync_state["loaded_at"]
+                or time.monotonic() - _sync_state["loaded_at"] >= settings.ZONE_INDEX_RELOAD_SECONDS):
+            await reload_zone_index(zones)
@@ -0,0 +1,104 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+# Kilómetros por grado de latitud (constante sobre la esfera)
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distancia en km sobre la esfera entre dos puntos (lat/lon en grados)."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return EARTH_RADIUS_KM * c
+
+
+def km_per_deg_lon(lat):
+    """Kilómetros por grado de longitud a la latitud dada."""
+    return KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6)
+
+
+# ---------- Versiones vectorizadas (NumPy) ----------
+
+def haversine_km_batch(lat, lon, lats, lons):
+    """
+    Distancias en km desde uno o varios puntos de consulta a un array
+    empaquetado de coordenadas, en una sola pasada.
+
+    - `lat`/`lon` escalares -> devuelve un array (N,)
+    - `lat`/`lon` arrays (Q,) -> devuelve una matriz (Q, N)
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if lat.ndim:
+        lat, lon = lat[:, None], lon[:, None]
+    phi1 = np.radians(lat)
+    phi2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lons, dtype=np.float64) - lon)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bbox_mask(lat, lon, lats, lons, radius_km):
+    """
+    Prefiltro barato: True para los puntos dentro del rectángulo lat/lon
+    que contiene el círculo de `radius_km` alrededor del punto.
+    """
+    dlat = radius_km / KM_PER_DEG_LAT
+    polar = min(abs(lat) + dlat, 90.0)
+    dlon = radius_km / km_per_deg_lon(polar)
+    mask = np.abs(lats - lat) <= dlat
+    if dlon < 180.0:
+        mask &= np.abs((lons - lon + 180.0) % 360.0 - 180.0) <= dlon
+    return mask
+
+
+def within_radius_batch(lat, lon, lats, lons, radius_km):
+    """
+    Índices y distancias (ordenados por distancia) de los puntos a
+    `radius_km` o menos. Aplica el prefiltro por rectángulo antes de la
+    trigonometría exacta.
+    """
+    candidates = np.flatnonzero(bbox_mask(lat, lon, lats, lons, radius_km))
+    dist = haversine_km_batch(lat, lon, lats[candidates], lons[candidates])
+    keep = dist <= radius_km
+    idx, dist = candidates[keep], dist[keep]
+    order = np.argsort(dist, kind="stable")
+    return idx[order], dist[order]
+
+
+# ---------- Polígonos (anillos de coordenadas [lon, lat], como GeoJSON) ----------
+
+def point_in_ring(lat, lon, ring):
+    """
+    True si el punto está dentro del anillo (ray casting; los puntos sobre
+    el borde pueden caer de cualquier lado). `ring` es una secuencia de
+    (lon, lat), cerrada o no.
+    """
+    inside = False
+    n = len(ring)
+    x0, y0 = ring[n - 1]
+    for i in range(n):
+        x1, y1 = ring[i]
+        if (y1 > lat) != (y0 > lat) and lon < (x0 - x1) * (lat - y1) / (y0 - y1) + x1:
+            inside = not inside
+        x0, y0 = x1, y1
+    return inside
+
+
+def points_in_ring_batch(lats, lons, ring):
+    """Versión en lote de `point_in_ring`: máscara booleana (N,) para N puntos."""
+    lats = np.asarray(lats, dtype=np.float64)[:, None]
+    lons = np.asarray(lons, dtype=np.float64)[:, None]
+    ring = np.asarray(ring, dtype=np.float64)
+    x1, y1 = ring[:, 0], ring[:, 1]
+    x0, y0 = np.roll(x1, 1), np.roll(y1, 1)
+    crosses = (y1 > lats) != (y0 > lats)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_at = (x0 - x1) * (lats - y1) / (y0 - y1) + x1
+    return (np.count_nonzero(crosses & (lons < x_at), axis=1) % 2).astype(bool)
@@ -0,0 +1,64 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row, keys=("created_at", "id")):
+    """Cursor opaco (base64 url-safe) con los valores de orden de la última fila."""
+    payload = json.dumps([row.get(k) for k in keys], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    (timestamp ISO, uuid) de un cursor de `encode_cursor`. Los valores se
+    validan porque van tal cual al filtro de PostgREST: un cursor alterado
+    es un InvalidCursor (400), no un error de la base.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise InvalidCursor("Cursor inválido")
+    if not isinstance(values, list) or len(values) != 2:
+        raise InvalidCursor("Cursor inválido")
+    sort_value, row_id = values
+    try:
+        datetime.fromisoformat(sort_value.replace("Z", "+00:00"))
+        uuid.UUID(row_id)
+    except (AttributeError, TypeError, ValueError):
+        raise InvalidCursor("Cursor inválido")
+    return values
+
+
+def keyset_filter(sort_value, row_id, sort_column="created_at"):
+    """
+    Filtro PostgREST (`or=`) para la página siguiente en orden
+    (sort_column DESC, id DESC): filas estrictamente anteriores al cursor.
+    """
+    return (
+        f'({sort_column}.lt."{sort_value}",'
+        f'and({sort_column}.eq."{sort_value}",id.lt."{row_id}"))'
+    )
+
+
+def parse_columns(fields, allowed, required=("id", "created_at")):
+    """
+    Proyección de columnas pedida por el cliente (separadas por coma),
+    validada contra `allowed`. Siempre incluye las columnas del cursor.
+    """
+    if not fields:
+        return list(allowed)
+    columns = [c.strip() for c in fields.split(",") if c.strip()]
+    unknown = [c for c in columns if c not in allowed]
+    if unknown:
+        raise ValueError(f"Columnas desconocidas: {', '.join(unknown)}")
+    for col in reversed(required):
+        if col not in columns:
+            columns.insert(0, col)
+    return columns
@@ -0,0 +1,116 @@
+"""
+Benchmark: detección de datos de contacto en mensajes de chat.
+
+Compara el set de regex actual de la base (teléfono + email, evaluado por
+send_chat_message y otra vez por el trigger de chat_messages) contra el
+detector precompilado de `app.services.contact_detector`, en mensajes/seg,
+sobre un corpus sintético con mensajes normales, contactos explícitos y
+contactos ofuscados ("once 2345 6789", "juan arroba gmail punto com").
+
+Uso (desde backend/):
+    python -m benchmarks.bench_contact_detector
+    python -m benchmarks.bench_contact_detector --messages 200000 --contact-ratio 0.05
+"""
+
+import argparse
+import random
+import re
+import time
+
+from app.services.contact_detector import (
+    LEGACY_EMAIL_PATTERN,
+    LEGACY_PHONE_PATTERN,
+    detect_many,
+)
+
+PLAIN = [
+    "Hola! a qué hora puedo pasar a retirar?",
+    "Perfecto, te espero a las 20:30",
+    "Me quedaron 2 porciones de lasagna y 1 tarta",
+    "Gracias, estaba riquísimo",
+    "El repartidor ya salió, llega en 15 minutos",
+    "¿Tenés opción sin TACC?",
+    "Pedido de 3 empanadas de carne y 2 de verdura",
+]
+CONTACT = [
+    "Mi número es 11-2345-6789",
+    "llamame al +54 9 11 1234 5678",
+    "escribime a juan.perez@gmail.com",
+    "mi cel 1234567",
+    "llamame 123-4567",
+    "contactame 1122334",
+    "pasame al 123 4567 dale",
+    "cel: 155 1234",
+]
+OBFUSCATED = [
+    "mi cel once dos tres cuatro cinco seis siete ocho",
+    "1 1 2 3 4 5 6 7 8 9",
+    "juan arroba gmail punto com",
+    "maria (at) hotmail [dot] com",
+]
+
+
+def make_corpus(n, contact_ratio, rng):
+    out = []
+    for _ in range(n):
+        r = rng.random()
+        if r < contact_ratio / 2:
+            out.append(rng.choice(CONTACT))
+        elif r < contact_ratio:
+            out.append(rng.choice(OBFUSCATED))
+        else:
+            out.append(rng.choice(PLAIN) + f" #{rng.randint(1, 99)}")
+    return out
+
+
+def legacy_detect_many(texts, scans):
+    # Cada scan equivale a una evaluación de los patrones en la base
+    phone = re.compile(LEGACY_PHONE_PATTERN, re.IGNORECASE)
+    email = re.compile(LEGACY_EMAIL_PATTERN, re.IGNORECASE)
+    out = []
+    for text in texts:
+        for _ in range(scans):
+            result = (phone.search(text) is not None, email.search(text) is not None)
+        out.append(result)
+    return out
+
+
+def throughput(fn, texts):
+    t0 = time.perf_counter()
+    result = fn(texts)
+    elapsed = time.perf_counter() - t0
+    return result, len(texts) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--contact-ratio", type=float, default=0.02,
+                        help="fracción de mensajes con datos de contacto")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    texts = make_corpus(args.messages, args.contact_ratio, rng)
+
+    legacy_1, legacy_1_rate = throughput(lambda t: legacy_detect_many(t, 1), texts)
+    _, legacy_2_rate = throughput(lambda t: legacy_detect_many(t, 2), texts)
+    detected, detector_rate = throughput(detect_many, texts)
+
+    # Verificación: todo lo que marca el set actual lo marca el detector
+    for text, (phone, email), d in zip(texts, legacy_1, detected):
+        assert not phone or d.has_phone_number, f"teléfono no detectado: {text!r}"
+        assert not email or d.has_email, f"email no detectado: {text!r}"
+
+    legacy_blocked = sum(1 for phone, email in legacy_1 if phone or email)
+    blocked = sum(1 for d in detected if d.is_blocked)
+    print(f"mensajes={args.messages}, con contacto={args.contact_ratio:.0%}")
+    print(f"{'camino':>28} | {'msg/s':>12} | bloqueados")
+    print(f"{'regex actual (1 scan)':>28} | {legacy_1_rate:>12,.0f} | {legacy_blocked}")
+    print(f"{'regex actual (RPC+trigger)':>28} | {legacy_2_rate:>12,.0f} | {legacy_blocked}")
+    print(f"{'detector precompilado':>28} | {detector_rate:>12,.0f} | {blocked}"
+          f" (+{blocked - legacy_blocked} ofuscados)")
+
+
+if __name__ == "__main__":
+    main()
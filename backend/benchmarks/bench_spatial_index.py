@@ -0,0 +1,133 @@
+"""
+Benchmark: búsqueda de productores por radio.
+
+Compara el recorrido lineal original de `producers_within_radius`
+(haversine escalar sobre todos los productores) contra el cálculo en lote
+con NumPy sobre el array completo y contra el índice de grilla
+`ProducerSpatialIndex`, con productores sintéticos distribuidos sobre AMBA.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_spatial_index
+    python -m benchmarks.bench_spatial_index --sizes 1000 10000 --radius 3
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from app.services.spatial_index import ProducerSpatialIndex
+from app.utils.geo import haversine_km, haversine_km_batch, within_radius_batch
+
+# Rectángulo aproximado de AMBA
+LAT_RANGE = (-34.90, -34.40)
+LON_RANGE = (-58.80, -58.20)
+
+
+def make_producers(n, rng):
+    return [
+        {
+            "id": f"p{i}",
+            "display_name": f"Productor {i}",
+            "lat": rng.uniform(*LAT_RANGE),
+            "lon": rng.uniform(*LON_RANGE),
+            "rating": round(rng.uniform(3, 5), 2),
+        }
+        for i in range(n)
+    ]
+
+
+def linear_within_radius(producers, lat, lon, radius_km):
+    # Réplica del loop original (sin el round-trip a Supabase)
+    out = []
+    for p in producers:
+        if p.get("lat") is None or p.get("lon") is None:
+            continue
+        dist = haversine_km(lat, lon, float(p["lat"]), float(p["lon"]))
+        if dist <= radius_km:
+            p_copy = dict(p)
+            p_copy["distance_km"] = round(dist, 2)
+            out.append(p_copy)
+    out.sort(key=lambda x: x["distance_km"])
+    return out
+
+
+def batch_within_radius(packed, lat, lon, radius_km):
+    lats, lons, rows = packed
+    idx, dist = within_radius_batch(lat, lon, lats, lons, radius_km)
+    return [dict(rows[i], distance_km=d) for i, d in zip(idx.tolist(), np.round(dist, 2).tolist())]
+
+
+def indexed_within_radius(index, lat, lon, radius_km):
+    rows, dist = index.query_radius(lat, lon, radius_km)
+    return [dict(p, distance_km=d) for p, d in zip(rows, np.round(dist, 2).tolist())]
+
+
+def percentiles(samples_ms):
+    samples_ms = sorted(samples_ms)
+    p50 = statistics.median(samples_ms)
+    p99 = samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.99))]
+    return p50, p99
+
+
+def run(fn, queries):
+    samples = []
+    for lat, lon in queries:
+        t0 = time.perf_counter()
+        fn(lat, lon)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--radius", type=float, default=5.0, help="radio de búsqueda en km")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--cell-deg", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"radio={args.radius} km, consultas={args.queries}, celda={args.cell_deg}°")
+    print(f"{'productores':>12} | {'loop p50':>9} {'loop p99':>9} | {'lote p50':>9} {'lote p99':>9}"
+          f" | {'índice p50':>10} {'índice p99':>10} | build")
+    for n in args.sizes:
+        producers = make_producers(n, rng)
+        queries = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(args.queries)]
+
+        packed = (
+            np.array([p["lat"] for p in producers]),
+            np.array([p["lon"] for p in producers]),
+            producers,
+        )
+
+        # Precisión: el cálculo en lote coincide con el escalar (< 1 m)
+        lat, lon = queries[0]
+        scalar = np.array([haversine_km(lat, lon, p["lat"], p["lon"]) for p in producers])
+        max_err_m = float(np.max(np.abs(haversine_km_batch(lat, lon, packed[0], packed[1]) - scalar))) * 1000
+        assert max_err_m < 1.0, f"error máximo {max_err_m:.6f} m"
+
+        t0 = time.perf_counter()
+        index = ProducerSpatialIndex(cell_deg=args.cell_deg)
+        index.load(producers)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        # Verificación: todos los caminos devuelven los mismos productores
+        expected = {p["id"] for p in linear_within_radius(producers, lat, lon, args.radius)}
+        got = {p["id"] for p in indexed_within_radius(index, lat, lon, args.radius)}
+        assert expected == got, "el índice no coincide con el recorrido lineal"
+        got = {p["id"] for p in batch_within_radius(packed, lat, lon, args.radius)}
+        assert expected == got, "el cálculo en lote no coincide con el recorrido lineal"
+
+        loop = run(lambda la, lo: linear_within_radius(producers, la, lo, args.radius), queries)
+        batch = run(lambda la, lo: batch_within_radius(packed, la, lo, args.radius), queries)
+        idx = run(lambda la, lo: indexed_within_radius(index, la, lo, args.radius), queries)
+        print(f"{n:>12} | {loop[0]:>7.2f}ms {loop[1]:>7.2f}ms | {batch[0]:>7.3f}ms {batch[1]:>7.3f}ms"
+              f" | {idx[0]:>8.3f}ms {idx[1]:>8.3f}ms | {build_ms:.0f}ms (err máx {max_err_m:.2e} m)")
+
+
+if __name__ == "__main__":
+    main()
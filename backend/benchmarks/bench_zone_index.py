@@ -0,0 +1,101 @@
+"""
+Benchmark: resolución punto -> zona de entrega.
+
+Compara probar el punto contra todos los polígonos (lo que hace
+get_zone_for_point, sin el round-trip a la base) contra
+`DeliveryZoneIndex` sin memo (grilla + rectángulos) y con memo por
+coordenada cuantizada, con zonas sintéticas sobre AMBA.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_zone_index
+    python -m benchmarks.bench_zone_index --zones 48 --vertices 200 --queries 50000
+"""
+
+import argparse
+import math
+import random
+import time
+
+from app.services.zone_index import DeliveryZoneIndex, Zone, _polygons
+from app.utils.geo import point_in_ring
+
+# Rectángulo aproximado de AMBA
+LAT_RANGE = (-34.90, -34.40)
+LON_RANGE = (-58.80, -58.20)
+
+
+def make_zones(n, vertices, rng):
+    cols = math.ceil(math.sqrt(n))
+    rows_ = math.ceil(n / cols)
+    dlat = (LAT_RANGE[1] - LAT_RANGE[0]) / rows_
+    dlon = (LON_RANGE[1] - LON_RANGE[0]) / cols
+    out = []
+    for k in range(n):
+        i, j = divmod(k, cols)
+        clat = LAT_RANGE[0] + (i + 0.5) * dlat
+        clon = LON_RANGE[0] + (j + 0.5) * dlon
+        ring = []
+        for v in range(vertices):
+            a = 2 * math.pi * v / vertices
+            r = rng.uniform(0.8, 1.05)
+            ring.append([clon + dlon / 2 * r * math.cos(a), clat + dlat / 2 * r * math.sin(a)])
+        ring.append(ring[0])
+        out.append({"id": k + 1, "name": f"Zona {k + 1}", "polygon": {"type": "Polygon", "coordinates": [ring]}})
+    return out
+
+
+def linear_zone_for_point(zones, lat, lon):
+    # Réplica de get_zone_for_point: prueba todos los polígonos en orden
+    for zone in zones:
+        exterior, _ = zone.polygons[0]
+        if point_in_ring(lat, lon, exterior):
+            return zone.id
+    return None
+
+
+def per_query_us(fn, queries):
+    t0 = time.perf_counter()
+    for lat, lon in queries:
+        fn(lat, lon)
+    return (time.perf_counter() - t0) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--zones", type=int, default=48)
+    parser.add_argument("--vertices", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = make_zones(args.zones, args.vertices, rng)
+    zones = [Zone(r["id"], r["name"], _polygons(r["polygon"])) for r in rows]
+    index = DeliveryZoneIndex()
+    index.load(rows)
+
+    q = index.quantum_deg
+    queries = [
+        (round(rng.uniform(*LAT_RANGE) / q) * q, round(rng.uniform(*LON_RANGE) / q) * q)
+        for _ in range(args.queries)
+    ]
+
+    # Verificación: el índice coincide con el recorrido de todos los polígonos
+    for lat, lon in queries[:2000]:
+        zone = index.zone_for_point(lat, lon)
+        assert (zone["zone_id"] if zone else None) == linear_zone_for_point(zones, lat, lon)
+
+    linear = per_query_us(lambda la, lo: linear_zone_for_point(zones, la, lo), queries)
+    grid = per_query_us(index._resolve, queries)
+    index.load(rows)
+    cold = per_query_us(index.zone_for_point, queries)
+    warm = per_query_us(index.zone_for_point, queries)
+    print(f"zonas={args.zones}, vértices={args.vertices}, consultas={args.queries}")
+    print(f"{'todos los polígonos':>22} | {linear:>8.2f} µs/consulta")
+    print(f"{'grilla + rectángulos':>22} | {grid:>8.2f} µs/consulta")
+    print(f"{'índice (memo vacío)':>22} | {cold:>8.2f} µs/consulta")
+    print(f"{'índice (memo lleno)':>22} | {warm:>8.2f} µs/consulta  {index.stats()}")
+
+
+if __name__ == "__main__":
+    main()
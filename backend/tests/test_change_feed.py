@@ -0,0 +1,202 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+from app.api.v1 import changes
+from app.services.change_feed import ChangeFeed
+
+T0 = datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeSource:
+    """Stand-in de dashboard_changes_since sobre listas en memoria."""
+
+    def __init__(self):
+        self.now = T0
+        self.orders = {}
+        self.alerts = []
+        self.calls = 0
+
+    def touch_order(self, order_id, status, seconds):
+        self.now = T0 + timedelta(seconds=seconds)
+        self.orders[order_id] = {"id": order_id, "status": status, "updated_at": self.now.isoformat()}
+
+    def add_alert(self, alert_id, seconds):
+        self.now = T0 + timedelta(seconds=seconds)
+        self.alerts.append({"id": alert_id, "created_at": self.now.isoformat()})
+
+    @staticmethod
+    def _after(rows, column, since, limit):
+        ts, last_id = since
+        if ts is None:
+            return []
+        cursor = (datetime.fromisoformat(ts), last_id or "")
+        rows = sorted(rows, key=lambda r: (r[column], r["id"]))
+        return [r for r in rows if (datetime.fromisoformat(r[column]), r["id"]) > cursor][:limit]
+
+    async def __call__(self, orders_since, alerts_since, limit):
+        self.calls += 1
+        return {
+            "orders": self._after(self.orders.values(), "updated_at", orders_since, limit),
+            "bypass_alerts": self._after(self.alerts, "created_at", alerts_since, limit),
+            "now": self.now.isoformat(),
+        }
+
+
+def make_feed(source):
+    return ChangeFeed(source=source, poll_seconds=60, page_size=2, overlap_seconds=5,
+                      buffer_size=4, queue_size=8)
+
+
+def parse_sse(chunk):
+    """Un bloque SSE -> dict con id/event/data (o {"comment": ...} / {"retry": ...})."""
+    if chunk.startswith(":"):
+        return {"comment": chunk[1:].strip()}
+    fields = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+    if "data" in fields:
+        fields["data"] = json.loads(fields["data"])
+    return fields
+
+
+async def open_stream(monkeypatch, feed, last_event_id=None):
+    monkeypatch.setattr(changes, "change_feed", feed)
+    response = await changes.stream_changes(since=None, last_event_id=last_event_id)
+    assert response.media_type == "text/event-stream"
+    return response.body_iterator
+
+
+async def next_event(stream):
+    return parse_sse(await asyncio.wait_for(stream.__anext__(), 1))
+
+
+def test_poll_publishes_deltas_once_per_change():
+    async def main():
+        source = FakeSource()
+        feed = make_feed(source)
+        assert await feed.poll(source) == 0   # sólo fija el watermark en `now`
+
+        source.touch_order("o1", "pending", 1)
+        source.touch_order("o2", "pending", 2)
+        source.touch_order("o3", "paid", 3)   # 3 filas con page_size=2: dos páginas
+        source.add_alert("a1", 3)
+        assert await feed.poll(source) == 4
+        order_event, alert_event = list(feed._events)
+        assert order_event["kind"] == "order"
+        assert [r["id"] for r in order_event["rows"]] == ["o1", "o2", "o3"]
+        assert alert_event["kind"] == "bypass_alert"
+        assert [r["id"] for r in alert_event["rows"]] == ["a1"]
+
+        # lo que vuelve a leer la ventana de solapamiento no se republica
+        assert await feed.poll(source) == 0
+        source.touch_order("o2", "paid", 4)
+        assert await feed.poll(source) == 1
+        assert feed._events[-1]["rows"] == [source.orders["o2"]]
+
+    asyncio.run(main())
+
+
+def test_stream_sends_reset_then_live_deltas(monkeypatch):
+    async def main():
+        source = FakeSource()
+        feed = make_feed(source)
+        await feed.poll(source)
+        stream = await open_stream(monkeypatch, feed)
+
+        assert await next_event(stream) == {"retry": "3000"}
+        reset = await next_event(stream)
+        assert reset["event"] == "reset"
+        assert reset["data"] == {"watermark": feed.watermark}
+
+        source.touch_order("o1", "paid", 1)
+        await feed.poll(source)
+        event = await next_event(stream)
+        assert event["event"] == "order"
+        assert event["id"] == feed.watermark
+        assert event["data"] == [source.orders["o1"]]
+
+        await stream.aclose()
+        assert feed.snapshot()["subscribers"] == 0
+
+    asyncio.run(main())
+
+
+def test_reconnect_resumes_from_last_event_id(monkeypatch):
+    async def main():
+        source = FakeSource()
+        feed = make_feed(source)
+        await feed.poll(source)
+        source.touch_order("o1", "pending", 1)
+        await feed.poll(source)
+        last_id = feed.watermark
+
+        # cliente desconectado mientras llegan más cambios
+        source.touch_order("o1", "paid", 2)
+        await feed.poll(source)
+        source.add_alert("a1", 3)
+        await feed.poll(source)
+
+        stream = await open_stream(monkeypatch, feed, last_event_id=last_id)
+        assert (await next_event(stream))["retry"] == "3000"
+        missed = [await next_event(stream), await next_event(stream)]
+        assert [e["event"] for e in missed] == ["order", "bypass_alert"]
+        assert missed[0]["data"][0]["status"] == "paid"
+        assert missed[1]["id"] == feed.watermark
+        await stream.aclose()
+
+        # ya al día: sin backlog, sigue con los eventos nuevos
+        stream = await open_stream(monkeypatch, feed, last_event_id=feed.watermark)
+        await next_event(stream)
+        source.touch_order("o2", "pending", 4)
+        await feed.poll(source)
+        assert (await next_event(stream))["data"][0]["id"] == "o2"
+        await stream.aclose()
+
+    asyncio.run(main())
+
+
+def test_reconnect_after_buffer_or_epoch_loss_gets_reset(monkeypatch):
+    async def main():
+        source = FakeSource()
+        feed = make_feed(source)
+        await feed.poll(source)
+        source.touch_order("o0", "pending", 1)
+        await feed.poll(source)
+        first_id = feed.watermark
+        for i in range(1, 6):   # más eventos que buffer_size=4
+            source.touch_order(f"o{i}", "pending", 10 * i)
+            await feed.poll(source)
+
+        for stale in (first_id, "otroepoch:1", "basura"):
+            stream = await open_stream(monkeypatch, feed, last_event_id=stale)
+            await next_event(stream)
+            assert (await next_event(stream))["event"] == "reset"
+            await stream.aclose()
+
+        # sin suscriptores el feed se pausa: los ids viejos dejan de valer
+        last_id = feed.watermark
+        feed._pause()
+        assert feed.events_since(last_id) is None
+
+    asyncio.run(main())
+
+
+def test_heartbeat_and_stop_close_the_stream(monkeypatch):
+    async def main():
+        source = FakeSource()
+        feed = make_feed(source)
+        await feed.poll(source)
+        monkeypatch.setattr(changes.settings, "CHANGE_FEED_HEARTBEAT_SECONDS", 0.05)
+        stream = await open_stream(monkeypatch, feed)
+        await next_event(stream)
+        await next_event(stream)
+        assert await next_event(stream) == {"comment": "ping"}
+
+        await feed.stop()
+        try:
+            await asyncio.wait_for(stream.__anext__(), 1)
+        except StopAsyncIteration:
+            pass
+        else:
+            raise AssertionError("el stream debería cerrarse con stop()")
+
+    asyncio.run(main())
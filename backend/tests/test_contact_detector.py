@@ -0,0 +1,53 @@
+import pytest
+
+from app.services.contact_detector import detect, detect_many
+
+
+@pytest.mark.parametrize("text", [
+    "Mi número es 11-2345-6789",
+    "llamame al +54 9 11 1234 5678",
+    "fijo 4567-8901",
+    "11.2345.6789",
+    "1 1 2 3 4 5 6 7 8 9",
+    "mi cel once dos tres cuatro cinco seis siete ocho",
+    "precio 1.500 y mi cel 11 2345 6789",
+    "pedido 2024-11-15, llamame al 1123456789",
+    # números cortos (7 dígitos) que ya bloqueaba el patrón legado
+    "mi cel 1234567",
+    "llamame 123-4567",
+    "contactame 1122334",
+    "pasame al 123 4567 dale",
+    "cel: 155 1234",
+])
+def test_detects_phones(text):
+    assert detect(text).has_phone_number
+
+
+@pytest.mark.parametrize("text", [
+    # precios con separador de miles
+    "precio 1.500 - 2.000 pesos",
+    "sale 12.500,50 el kilo y 1.200 la porción",
+    "total 1.500.000",
+    # fechas y rangos de fechas
+    "retiro el 15/11/2024 a las 20",
+    "del 01/11/2024 al 15/11/2024",
+    "entrega 2024-11-15 / 2024-11-20",
+    # números de pedido
+    "pedido nro 10 2024 11 15",
+    "pedido #45 de 3 empanadas",
+    "te espero a las 20:30, mesa 12",
+])
+def test_ignores_prices_dates_and_order_numbers(text):
+    assert not detect(text).has_phone_number
+
+
+def test_detects_emails_and_phones_inside_them():
+    assert detect("juan arroba gmail punto com") == (False, True)
+    assert detect("maria (at) hotmail [dot] com").has_email
+    assert detect("1123456789@gmail.com") == (True, True)
+    assert detect("pedido 2024 11 15 en pedidos@olla.com") == (False, True)
+
+
+def test_detect_many_keeps_order():
+    texts = [None, "", "hola", "11 2345 6789", "precio 1.500 - 2.000"]
+    assert [d.is_blocked for d in detect_many(texts)] == [False, False, False, True, False]
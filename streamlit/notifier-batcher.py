@@ -0,0 +1,136 @@
+# notifier/batcher.py
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+BATCHER_MAX_BATCH = int(os.getenv("BATCHER_MAX_BATCH", "500"))
+BATCHER_FLUSH_SECONDS = float(os.getenv("BATCHER_FLUSH_SECONDS", "0.5"))
+BATCHER_MAX_PENDING = int(os.getenv("BATCHER_MAX_PENDING", "10000"))
+BATCHER_MAX_ATTEMPTS = int(os.getenv("BATCHER_MAX_ATTEMPTS", "5"))
+BATCHER_DEAD_LETTER_PATH = os.getenv("BATCHER_DEAD_LETTER_PATH", "batcher_dead_letter.jsonl")
+
+
+def supabase_insert(supabase_client, table):
+    """Blocking multi-row insert into `table` (one HTTP call per batch)."""
+    def insert(rows):
+        supabase_client.table(table).insert(rows).execute()
+    return insert
+
+
+class WriteBehindBatcher:
+    """
+    Buffers rows in memory and writes them with multi-row inserts, flushing when
+    `max_batch` rows are waiting or every `flush_seconds`, whichever comes first.
+
+    - Backpressure: add() waits while `max_pending` rows are buffered.
+    - The blocking insert runs in a thread; failed batches are retried with backoff and, after
+      `max_attempts`, appended to a JSONL dead-letter file.
+    - stop() flushes everything still buffered before returning.
+    """
+
+    def __init__(self, insert, name="batcher", max_batch=BATCHER_MAX_BATCH,
+                 flush_seconds=BATCHER_FLUSH_SECONDS, max_pending=BATCHER_MAX_PENDING,
+                 max_attempts=BATCHER_MAX_ATTEMPTS, dead_letter_path=BATCHER_DEAD_LETTER_PATH):
+        self.insert = insert
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.dead_letter_path = dead_letter_path
+        self._rows = deque()
+        self._wake = None
+        self._space = None
+        self._task = None
+        self._stopping = False
+        self._flush_ms = deque(maxlen=200)
+        self.stats = {"added": 0, "flushed_rows": 0, "batches": 0, "failures": 0, "dead_rows": 0,
+                      "backpressure_waits": 0}
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._space = asyncio.Condition()
+            self._task = asyncio.create_task(self._run())
+
+    async def add(self, row):
+        self.start()
+        if len(self._rows) >= self.max_pending:
+            self.stats["backpressure_waits"] += 1
+            async with self._space:
+                await self._space.wait_for(lambda: len(self._rows) < self.max_pending)
+        self._rows.append(row)
+        self.stats["added"] += 1
+        if len(self._rows) >= self.max_batch:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            while self._rows:
+                await self._flush_batch()
+                if len(self._rows) < self.max_batch and not self._stopping:
+                    break
+            if self._stopping:
+                return
+
+    async def _flush_batch(self):
+        batch = [self._rows.popleft() for _ in range(min(self.max_batch, len(self._rows)))]
+        async with self._space:
+            self._space.notify_all()
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.insert, batch)
+            except Exception as e:
+                self.stats["failures"] += 1
+                print(f"Error flushing {self.name} ({len(batch)} rows, attempt {attempt}):", e)
+                if attempt < self.max_attempts:
+                    await asyncio.sleep(min(30.0, 0.5 * 2 ** (attempt - 1)))
+                    continue
+                self._dead(batch, repr(e))
+                return
+            self._flush_ms.append((time.perf_counter() - started) * 1000)
+            self.stats["batches"] += 1
+            self.stats["flushed_rows"] += len(batch)
+            return
+
+    def _dead(self, rows, error):
+        self.stats["dead_rows"] += len(rows)
+        if not self.dead_letter_path:
+            return
+        dead_at = datetime.utcnow().isoformat()
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({"batcher": self.name, "row": row, "error": error, "dead_at": dead_at},
+                                       default=str) + "\n")
+        except Exception as e:
+            print(f"Error writing {self.name} dead letters:", e)
+
+    async def stop(self):
+        """Flush every buffered row (the in-flight batch included), then stop."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        self._stopping = False
+
+    def metrics(self):
+        flush_ms = sorted(self._flush_ms)
+        return dict(
+            self.stats,
+            name=self.name,
+            queue_depth=len(self._rows),
+            flush_ms_p50=round(flush_ms[len(flush_ms) // 2], 2) if flush_ms else None,
+            flush_ms_max=round(flush_ms[-1], 2) if flush_ms else None,
+        )
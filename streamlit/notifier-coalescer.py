@@ -0,0 +1,180 @@
+# notifier/coalescer.py
+import asyncio
+import os
+import time
+from collections import Counter
+
+NOTIFIER_DIGEST_WINDOW_SECONDS = float(os.getenv("NOTIFIER_DIGEST_WINDOW_SECONDS", "60"))
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `capacity` (burst)."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def try_acquire(self, n=1):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+
+class RateLimiter:
+    """One token bucket per channel; channels without a bucket are unlimited."""
+
+    def __init__(self, buckets=None):
+        self.buckets = dict(buckets or {})
+        self.limited = Counter()
+
+    def allow(self, channel):
+        bucket = self.buckets.get(channel)
+        if bucket is None or bucket.try_acquire():
+            return True
+        self.limited[channel] += 1
+        return False
+
+
+class AlertGroup:
+    __slots__ = ("key", "count", "max_score", "reasons", "first_at", "last_at", "channels")
+
+    def __init__(self, key):
+        self.key = key
+        self.count = 0
+        self.max_score = 0.0
+        self.reasons = Counter()
+        self.first_at = None
+        self.last_at = None
+        self.channels = set()   # channels whose digest still has to carry this group
+
+    @property
+    def producer_id(self):
+        return self.key[0]
+
+    @property
+    def order_id(self):
+        return self.key[1]
+
+    @property
+    def severity(self):
+        return self.key[2]
+
+    def add(self, alert, channels=()):
+        created = alert.get("created_at")
+        self.channels.update(channels)
+        self.count += 1
+        self.max_score = max(self.max_score, alert.get("score", 0.0))
+        self.reasons[alert.get("reason", "unknown")] += 1
+        self.first_at = self.first_at or created
+        self.last_at = created or self.last_at
+
+    def merge(self, other, channels=None):
+        self.channels.update(other.channels if channels is None else channels)
+        self.count += other.count
+        self.max_score = max(self.max_score, other.max_score)
+        self.reasons.update(other.reasons)
+        self.first_at = min(filter(None, (self.first_at, other.first_at)), default=None)
+        self.last_at = max(filter(None, (self.last_at, other.last_at)), default=None)
+
+
+class AlertCoalescer:
+    """
+    Groups alerts by (producer_id, order_id, severity) over a fixed window.
+
+    The first high-severity alert of a group goes out immediately: `emit_immediate(alert)`
+    returns the channels it was sent on, and any channel left out (e.g. its rate limit was hit)
+    gets the alert in the digest. Everything else in the window is counted into its group and
+    emitted once per window and channel (`emit_digest(channel, groups)`, which returns the groups
+    it could not send; those are kept for the next window on that channel only). A group stays
+    "seen" for one window after an immediate alert actually went out, so a burst on the same
+    order only pages once, while a page that was fully rate-limited is retried on the next alert.
+    """
+
+    def __init__(self, emit_immediate, emit_digest, window=NOTIFIER_DIGEST_WINDOW_SECONDS,
+                 immediate_severities=("high",), channels=("email", "sms")):
+        self.emit_immediate = emit_immediate
+        self.emit_digest = emit_digest
+        self.window = window
+        self.immediate_severities = set(immediate_severities)
+        self.channels = tuple(channels)
+        self._pending = {}    # key -> AlertGroup
+        self._seen = {}       # key -> monotonic time of the last immediate alert
+        self._task = None
+        self.stats = {"received": 0, "immediate": 0, "coalesced": 0, "digests": 0, "requeued": 0}
+
+    @staticmethod
+    def key_for(alert, severity):
+        return (alert.get("producer_id"), alert.get("order_id"), severity)
+
+    def add(self, alert, severity):
+        """Returns True if the alert was emitted immediately, False if it waits for the digest."""
+        self.stats["received"] += 1
+        key = self.key_for(alert, severity)
+        now = time.monotonic()
+        seen = self._seen.get(key)
+        pending = set(self.channels)
+        if severity in self.immediate_severities and (seen is None or now - seen >= self.window):
+            sent = pending.intersection(self.emit_immediate(alert) or ())
+            if sent:
+                self._seen[key] = now
+                self.stats["immediate"] += 1
+                pending -= sent
+                if not pending:
+                    return True
+        self.stats["coalesced"] += 1
+        self._group(key).add(alert, pending)
+        return len(pending) < len(self.channels)
+
+    def requeue(self, groups, channels=None):
+        """Put groups back for the next window, on `channels` only (default: the ones they had)."""
+        for group in groups:
+            self._group(group.key).merge(group, channels)
+            self.stats["requeued"] += 1
+
+    def _group(self, key):
+        group = self._pending.get(key)
+        if group is None:
+            group = self._pending[key] = AlertGroup(key)
+        return group
+
+    def flush(self):
+        now = time.monotonic()
+        self._seen = {k: t for k, t in self._seen.items() if now - t < self.window}
+        if not self._pending:
+            return
+        groups, self._pending = list(self._pending.values()), {}
+        self.stats["digests"] += 1
+        unsent = {}   # key -> (group, channels it still owes)
+        for channel in self.channels:
+            selected = [g for g in groups if channel in g.channels]
+            if not selected:
+                continue
+            for group in self.emit_digest(channel, selected) or ():
+                unsent.setdefault(group.key, (group, set()))[1].add(channel)
+        for group, channels in unsent.values():
+            self.requeue([group], channels)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.window)
+            try:
+                self.flush()
+            except Exception as e:
+                print("Error flushing bypass digest:", e)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.flush()
@@ -0,0 +1,226 @@
+# notifier/dispatcher.py
+import asyncio
+import json
+import os
+import random
+import smtplib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+NOTIFIER_WORKERS = int(os.getenv("NOTIFIER_WORKERS", "4"))
+NOTIFIER_QUEUE_SIZE = int(os.getenv("NOTIFIER_QUEUE_SIZE", "1000"))
+NOTIFIER_MAX_ATTEMPTS = int(os.getenv("NOTIFIER_MAX_ATTEMPTS", "5"))
+NOTIFIER_BACKOFF_SECONDS = float(os.getenv("NOTIFIER_BACKOFF_SECONDS", "2"))
+NOTIFIER_MAX_BACKOFF_SECONDS = float(os.getenv("NOTIFIER_MAX_BACKOFF_SECONDS", "300"))
+NOTIFIER_DEAD_LETTER_PATH = os.getenv("NOTIFIER_DEAD_LETTER_PATH", "notifier_dead_letter.jsonl")
+
+
+class Job:
+    __slots__ = ("channel", "args", "kwargs", "attempts", "created_at", "last_error")
+
+    def __init__(self, channel, args, kwargs):
+        self.channel = channel
+        self.args = args
+        self.kwargs = kwargs
+        self.attempts = 0
+        self.created_at = datetime.utcnow().isoformat()
+        self.last_error = None
+
+    def to_dict(self):
+        return {
+            "channel": self.channel,
+            "args": self.args,
+            "kwargs": self.kwargs,
+            "attempts": self.attempts,
+            "created_at": self.created_at,
+            "last_error": self.last_error,
+        }
+
+
+class DeadLetterStore:
+    """Append-only JSONL of jobs that could not be delivered (plus the last few in memory)."""
+
+    def __init__(self, path=NOTIFIER_DEAD_LETTER_PATH, keep=100):
+        self.path = path
+        self.recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def put(self, job, reason):
+        entry = dict(job.to_dict(), reason=reason, dead_at=datetime.utcnow().isoformat())
+        self.recent.append(entry)
+        if not self.path:
+            return
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class NotificationDispatcher:
+    """
+    Sends notifications off the event loop.
+
+    submit() puts a job on a bounded asyncio queue and returns immediately. N worker tasks take
+    jobs and run the (blocking) channel handler in a thread pool. Failed jobs are retried with
+    exponential backoff + jitter (re-enqueued later, so a failing channel does not hold a worker);
+    after max_attempts, or if the queue is full, the job goes to the dead-letter store.
+    """
+
+    def __init__(self, workers=NOTIFIER_WORKERS, maxsize=NOTIFIER_QUEUE_SIZE,
+                 max_attempts=NOTIFIER_MAX_ATTEMPTS, backoff=NOTIFIER_BACKOFF_SECONDS,
+                 max_backoff=NOTIFIER_MAX_BACKOFF_SECONDS, dead_letters=None):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.dead_letters = dead_letters or DeadLetterStore()
+        self._handlers = {}
+        self._queue = None
+        self._tasks = []
+        self._retries = set()
+        self._executor = None
+        self.stats = {"submitted": 0, "sent": 0, "retried": 0, "dead": 0}
+
+    def register(self, channel, handler):
+        self._handlers[channel] = handler
+
+    @property
+    def running(self):
+        return bool(self._tasks)
+
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="notifier")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, channel, *args, **kwargs):
+        """Queue a notification. Never blocks; returns False if it went to the dead-letter store."""
+        if channel not in self._handlers:
+            raise ValueError(f"Unknown notification channel: {channel}")
+        self.start()
+        job = Job(channel, args, kwargs)
+        self.stats["submitted"] += 1
+        return self._enqueue(job)
+
+    def _enqueue(self, job):
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            self._dead(job, "queue_full")
+            return False
+
+    def _dead(self, job, reason):
+        self.stats["dead"] += 1
+        try:
+            self.dead_letters.put(job, reason)
+        except Exception as e:
+            print("Error writing notification dead letter:", e)
+
+    def _delay(self, attempts):
+        delay = min(self.max_backoff, self.backoff * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _retry_later(self, job, delay):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self._dead(job, "shutdown")
+            raise
+        self._enqueue(job)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                job.attempts += 1
+                handler = self._handlers[job.channel]
+                await loop.run_in_executor(self._executor, lambda: handler(*job.args, **job.kwargs))
+                self.stats["sent"] += 1
+            except Exception as e:
+                job.last_error = repr(e)
+                if job.attempts >= self.max_attempts:
+                    self._dead(job, "max_attempts")
+                else:
+                    self.stats["retried"] += 1
+                    task = asyncio.create_task(self._retry_later(job, self._delay(job.attempts)))
+                    self._retries.add(task)
+                    task.add_done_callback(self._retries.discard)
+            finally:
+                self._queue.task_done()
+
+    def depth(self):
+        return self._queue.qsize() if self._queue else 0
+
+    async def stop(self, timeout=10.0):
+        """Drain queued jobs (up to `timeout` seconds), then stop workers; pending retries go to dead letters."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._tasks + list(self._retries):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retries, return_exceptions=True)
+        while not self._queue.empty():
+            self._dead(self._queue.get_nowait(), "shutdown")
+        self._tasks = []
+        self._retries.clear()
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+
+class PersistentSMTP:
+    """
+    One SMTP session reused across sends (connect + STARTTLS + login only once).
+    Reconnects transparently if the server dropped the idle connection. Thread-safe.
+    """
+
+    def __init__(self, host, port, user=None, password=None, starttls=True, timeout=30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            conn.starttls()
+        if self.user and self.password:
+            conn.login(self.user, self.password)
+        return conn
+
+    def send_message(self, msg):
+        with self._lock:
+            for attempt in (1, 2):
+                if self._conn is None:
+                    self._conn = self._connect()
+                try:
+                    return self._conn.send_message(msg)
+                except (smtplib.SMTPServerDisconnected, ConnectionError, OSError):
+                    self._close()
+                    if attempt == 2:
+                        raise
+
+    def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.quit()
+            except Exception:
+                conn.close()
+
+    def close(self):
+        with self._lock:
+            self._close()
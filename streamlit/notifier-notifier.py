@@ -1,9 +1,13 @@
 # notifier/notifier.py
+import asyncio
 import os
-import smtplib
+import threading
 from email.message import EmailMessage
 from twilio.rest import Client as TwilioClient
 from datetime import datetime
+from notifier.batcher import WriteBehindBatcher, supabase_insert
+from notifier.coalescer import AlertCoalescer, RateLimiter, TokenBucket
+from notifier.dispatcher import NotificationDispatcher, PersistentSMTP
 
 SMTP_HOST = os.getenv("SMTP_HOST")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
@@ -14,6 +18,23 @@ TWILIO_TOKEN = os.getenv("TWILIO_TOKEN")
 TWILIO_FROM = os.getenv("TWILIO_FROM")
 ALERT_EMAIL_TO = os.getenv("ALERT_EMAIL_TO")  # comma-separated
 ALERT_SMS_TO = os.getenv("ALERT_SMS_TO")      # comma-separated E.164
+# Outbound rate limits (token buckets): messages per minute and burst size
+NOTIFIER_EMAIL_PER_MINUTE = float(os.getenv("NOTIFIER_EMAIL_PER_MINUTE", "10"))
+NOTIFIER_EMAIL_BURST = int(os.getenv("NOTIFIER_EMAIL_BURST", "5"))
+NOTIFIER_SMS_PER_MINUTE = float(os.getenv("NOTIFIER_SMS_PER_MINUTE", "2"))
+NOTIFIER_SMS_BURST = int(os.getenv("NOTIFIER_SMS_BURST", "3"))
+
+# Long-lived clients shared by the dispatcher workers
+smtp = PersistentSMTP(SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS)
+_sms_client = None
+_sms_lock = threading.Lock()
+
+def get_sms_client():
+    global _sms_client
+    with _sms_lock:
+        if _sms_client is None:
+            _sms_client = TwilioClient(TWILIO_SID, TWILIO_TOKEN)
+        return _sms_client
 
 def send_email(subject, body, to_list):
     msg = EmailMessage()
@@ -21,50 +42,140 @@ def send_email(subject, body, to_list):
     msg["From"] = SMTP_USER
     msg["To"] = to_list
     msg.set_content(body)
-    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as s:
-        s.starttls()
-        s.login(SMTP_USER, SMTP_PASS)
-        s.send_message(msg)
+    smtp.send_message(msg)
 
 def send_sms(body, to_number):
-    client = TwilioClient(TWILIO_SID, TWILIO_TOKEN)
-    client.messages.create(to=to_number, from_=TWILIO_FROM, body=body)
+    get_sms_client().messages.create(to=to_number, from_=TWILIO_FROM, body=body)
+
+# Email/SMS go through the dispatcher: bounded queue, worker pool, retries, dead letters
+dispatcher = NotificationDispatcher()
+dispatcher.register("email", send_email)
+dispatcher.register("sms", send_sms)
+
+limiter = RateLimiter({
+    "email": TokenBucket(NOTIFIER_EMAIL_PER_MINUTE / 60, NOTIFIER_EMAIL_BURST),
+    "sms": TokenBucket(NOTIFIER_SMS_PER_MINUTE / 60, NOTIFIER_SMS_BURST),
+})
+
+def severity_for(score):
+    # Decide severity: score >= 0.8 high, >= 0.5 medium
+    if score >= 0.8:
+        return "high"
+    if score >= 0.5:
+        return "medium"
+    return "low"
+
+def email_enabled():
+    return bool(SMTP_HOST and SMTP_USER)
+
+def sms_enabled():
+    return bool(TWILIO_SID and TWILIO_TOKEN and ALERT_SMS_TO)
+
+def send_sms_all(body):
+    for n in ALERT_SMS_TO.split(","):
+        dispatcher.submit("sms", body, n.strip())
+
+def emit_immediate(alert):
+    # First high-severity alert of a group: email + SMS right away, each if its own bucket allows
+    # it. Returns the channels that went out; the coalescer leaves the rest to the digest.
+    reason = alert.get("reason", "unknown")
+    subject = f"[ALERTA BYPASS] {reason} - order #{alert.get('order_id')}"
+    body = (f"Alerta bypass detectada:\n\norder: {alert.get('order_id')}\nproducer: {alert.get('producer_id')}\n"
+            f"reason: {reason}\nscore: {alert.get('score', 0.0)}\ncreated: {alert.get('created_at')}\n\nPayload: {alert}")
+    sent = set()
+    if not email_enabled():
+        sent.add("email")   # nothing to send: don't keep it for the digest either
+    elif limiter.allow("email"):
+        dispatcher.submit("email", subject, body, ALERT_EMAIL_TO)
+        sent.add("email")
+    if not sms_enabled():
+        sent.add("sms")
+    elif limiter.allow("sms"):
+        send_sms_all(subject + "\n" + reason)
+        sent.add("sms")
+    return sent
+
+def emit_digest(channel, groups):
+    # One email per window for all the groups; one SMS only if there are high-severity groups.
+    # Returns the groups that were not sent because the channel's bucket was empty.
+    if channel == "email":
+        if not email_enabled():
+            return []
+        if not limiter.allow("email"):
+            return groups
+        groups = sorted(groups, key=lambda g: (g.severity != "high", -g.count))
+        total = sum(g.count for g in groups)
+        high = any(g.severity == "high" for g in groups)
+        subject = f"[{'ALERTA' if high else 'WARNING'} BYPASS] Resumen: {total} alertas en {len(groups)} pedidos"
+        lines = [
+            f"- [{g.severity}] producer {g.producer_id} / order #{g.order_id}: {g.count} alertas, "
+            f"score máx {g.max_score}, motivos {dict(g.reasons)} ({g.first_at} .. {g.last_at})"
+            for g in groups
+        ]
+        dispatcher.submit("email", subject, "Alertas bypass agrupadas:\n\n" + "\n".join(lines), ALERT_EMAIL_TO)
+        return []
+    high = [g for g in groups if g.severity == "high"]
+    if not high or not sms_enabled():
+        return []
+    if not limiter.allow("sms"):
+        return high
+    send_sms_all(f"[ALERTA BYPASS] {sum(g.count for g in high)} alertas altas en {len(high)} pedidos (ver email)")
+    return []
+
+coalescer = AlertCoalescer(emit_immediate, emit_digest)
+
+# Audit rows for `bypass_alerts_log` are written in multi-row batches (see configure_audit_log)
+audit_batcher = None
+
+def configure_audit_log(supabase_client):
+    global audit_batcher
+    if audit_batcher is None:
+        audit_batcher = WriteBehindBatcher(supabase_insert(supabase_client, "bypass_alerts_log"),
+                                           name="bypass_alerts_log")
+    return audit_batcher
+
+def start_notifier():
+    dispatcher.start()
+    coalescer.start()
+    if audit_batcher is not None:
+        audit_batcher.start()
+
+async def close_notifier():
+    await coalescer.stop()      # last digest goes into the dispatcher queue
+    await dispatcher.stop()
+    smtp.close()
+    if audit_batcher is not None:
+        await audit_batcher.stop()   # flush buffered audit rows
 
 async def notify_bypass_if_needed(payload: dict, supabase_client=None):
-    # Decide severity: score > 0.8 high
     score = payload.get("score", 0.0)
     reason = payload.get("reason", "unknown")
     order = payload.get("order_id")
     prod = payload.get("producer_id")
     created = payload.get("created_at", datetime.utcnow().isoformat())
 
-    subject = f"[ALERTA BYPASS] {reason} - order #{order}"
-    body = f"Alerta bypass detectada:\n\norder: {order}\nproducer: {prod}\nreason: {reason}\nscore: {score}\ncreated: {created}\n\nPayload: {payload}"
-
     # Always log to supabase table `bypass_alerts_log` for audit (optional)
     try:
         if supabase_client:
-            supabase_client.table("bypass_alerts_log").insert({
+            row = {
                 "order_id": order,
                 "producer_id": prod,
                 "reason": reason,
                 "score": score,
                 "payload": payload,
                 "created_at": created
-            }).execute()
+            }
+            # buffered and flushed as a multi-row insert (waits only under backpressure)
+            await configure_audit_log(supabase_client).add(row)
     except Exception as e:
         # log to stdout; don't raise
         print("Error logging bypass to supabase:", e)
 
-    # Escalation: high score => email + SMS; medium score => email
-    if score >= 0.8:
-        if SMTP_HOST and SMTP_USER:
-            send_email(subject, body, os.getenv("ALERT_EMAIL_TO"))
-        if TWILIO_SID and TWILIO_TOKEN and os.getenv("ALERT_SMS_TO"):
-            for n in os.getenv("ALERT_SMS_TO").split(","):
-                send_sms(subject + "\n" + reason, n.strip())
-    elif score >= 0.5:
-        if SMTP_HOST and SMTP_USER:
-            send_email("[WARNING] " + subject, body, os.getenv("ALERT_EMAIL_TO"))
-    else:
+    # Escalation: high score => email + SMS (first one immediately, then digest);
+    # medium score => email digest
+    severity = severity_for(score)
+    if severity == "low":
         print("Bypass low score; logged only.")
+        return
+    coalescer.start()
+    coalescer.add(dict(payload, created_at=created), severity)
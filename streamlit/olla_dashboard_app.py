@@ -8,8 +8,9 @@ Features implemented:
   export Excel financial reports, system health monitor
 - MODO ABUELA: large-font, high-contrast UI for non-technical users; large buttons for Today/Week/Month;
   big day sales, menu morning (push to Notion placeholder), projected earnings chart
-- Technical: supabase-py connection, auto-refresh every 2 minutes (JS reload), mobile-first layout,
-  offline basic mode (cached data), export PDF daily reports (ReportLab fallback to plain text)
+- Technical: supabase-py connection, live updates from the Core API change feed (SSE deltas; JS reload
+  every 2 minutes when no feed is configured), mobile-first layout,
+  offline mode from a local SQLite snapshot synced by watermark, export PDF daily reports (ReportLab fallback to plain text)
 - Data shown: orders of the day (count, status), incomes (total, commission, net), per-producer metrics,
   bypass alerts
 - NOTE: Replace environment variables SUPABASE_URL, SUPABASE_KEY, NOTION_TOKEN, NOTION_DB_ID for full integration.
@@ -21,8 +22,17 @@ import pandas as pd
 import time
 import os
 import json
-from datetime import datetime, timedelta
+import logging
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 import traceback
+import urllib.parse
+import urllib.request
+import hashlib
+import hmac
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 # --- Optional libs ---
 try:
@@ -44,8 +54,35 @@ SUPABASE_URL = os.environ.get("SUPABASE_URL", "")  # e.g. https://xyz.supabase.c
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY", "")
 NOTION_TOKEN = os.environ.get("NOTION_TOKEN", "")
 NOTION_DB_ID = os.environ.get("NOTION_DB_ID", "")
+# Core API: full-history exports are streamed from there instead of built here
+BACKEND_URL = os.environ.get("BACKEND_URL", "").rstrip("/")
+SERVICE_TOKEN = os.environ.get("SERVICE_TOKEN", "")
+# Browser-facing API address for export links (defaults to BACKEND_URL) and how long a link stays valid
+BACKEND_PUBLIC_URL = os.environ.get("BACKEND_PUBLIC_URL", BACKEND_URL).rstrip("/")
+EXPORT_LINK_SECONDS = int(os.environ.get("EXPORT_LINK_SECONDS", "600"))
 
-AUTO_REFRESH_SECONDS = 120  # 2 minutes
+# PDF report jobs: rendered by a worker pool and cached on disk by content key
+REPORT_CACHE_DIR = os.environ.get("REPORT_CACHE_DIR", "data/reports")
+REPORT_CACHE_MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "2"))
+REPORT_WAIT_SECONDS = float(os.environ.get("REPORT_WAIT_SECONDS", "3"))
+
+# Live updates: order/bypass deltas from the Core API change feed (SSE). Point CHANGE_FEED_URL at
+# any local text/event-stream source to test without the backend.
+CHANGE_FEED_URL = os.environ.get("CHANGE_FEED_URL", f"{BACKEND_URL}/api/v1/changes/stream" if BACKEND_URL else "")
+LIVE_CHECK_SECONDS = float(os.environ.get("LIVE_CHECK_SECONDS", "2"))
+
+# Local snapshot of orders/users/bypass alerts: survives restarts (offline mode) and online
+# refreshes only pull rows changed since each table's watermark
+SNAPSHOT_DB_PATH = os.environ.get("SNAPSHOT_DB_PATH", "data/dashboard_snapshot.sqlite3")
+SNAPSHOT_SYNC_SECONDS = float(os.environ.get("SNAPSHOT_SYNC_SECONDS", "60"))
+SNAPSHOT_PAGE_SIZE = int(os.environ.get("SNAPSHOT_PAGE_SIZE", "1000"))
+SNAPSHOT_OVERLAP_SECONDS = 5  # re-read a few seconds before the watermark (late commits)
+
+AUTO_REFRESH_SECONDS = 120  # 2 minutes, only without a change feed
+LOCAL_TZ = ZoneInfo("America/Argentina/Buenos_Aires")  # same as order_rollup_timezone() in the DB
+
+log = logging.getLogger("olla_dashboard")
 
 # ---------- Helpers & Mock Data ----------
 def now_str():
@@ -75,27 +112,344 @@ def mock_data():
     bypass_alerts = [{"id": "b1", "order_id": 99, "producer_id": "p2", "reason": "suspicious_fee", "created_at": now_str()}]
     return orders, users, bypass_alerts
 
+RECENT_ORDERS_LIMIT = 200  # el historial completo no se descarga: los totales vienen agregados
+ORDER_COLUMNS = "id,producer_id,status,total_cents,commission_cents,created_at,updated_at"
+
+def normalize_orders(orders):
+    """Adapt schema rows (amounts in cents) to the amount/commission fields used by the UI."""
+    for o in orders:
+        if "amount" not in o and "total_cents" in o:
+            o["amount"] = (o.get("total_cents") or 0) / 100
+            o["commission"] = (o.get("commission_cents") or 0) / 100
+    return orders
+
+# table -> (columns, watermark column, most recent rows kept)
+SNAPSHOT_TABLES = {
+    "orders": (ORDER_COLUMNS, "updated_at", RECENT_ORDERS_LIMIT),
+    "users": ("*", "updated_at", None),
+    "bypass_alerts": ("*", "created_at", None),
+}
+
+def _rows(res):
+    return res.data if hasattr(res, 'data') else res
+
+_UTC_GLOB = "????-??-??T??:??:??.??????+00:00"
+
+def _utc(value):
+    """ISO timestamp as fixed-width UTC text (so it compares correctly as text); None if unparseable."""
+    if value is None:
+        return None
+    try:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+class SnapshotStore:
+    """
+    Orders, users and bypass alerts persisted in SQLite, shared by every session of the process.
+    Each table keeps a watermark (newest changed_at, id): after the initial snapshot, a sync pulls
+    only rows changed since then. Rows are read from disk lazily, on the first load after startup.
+    Timestamps are stored as UTC (`_utc`), whatever offset the source used. The lock only guards
+    SQLite and the in-memory rows; reads from Supabase run outside it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self._conn = None
+        self._rows = {}  # table -> rows read from disk (parsed once)
+        self._synced = {}  # table -> time.monotonic() of the last sync
+        self._syncing = {}  # table -> threading.Event of the sync in progress
+        self.stats = {"syncs": 0, "rows_pulled": 0, "full_loads": 0}
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.create_function("utc_ts", 1, _utc, deterministic=True)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, changed_at TEXT, last_id TEXT, synced_at TEXT)")
+            with conn:
+                # snapshots written before timestamps were normalized to UTC
+                conn.execute("UPDATE sync_state SET changed_at = utc_ts(changed_at) WHERE changed_at NOT GLOB ?", (_UTC_GLOB,))
+                for name in SNAPSHOT_TABLES:
+                    conn.execute(f"CREATE TABLE IF NOT EXISTS {name} (id TEXT PRIMARY KEY, changed_at TEXT, created_at TEXT, row TEXT NOT NULL)")
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_created_at ON {name} (created_at)")
+                    conn.execute(
+                        f"UPDATE {name} SET changed_at = utc_ts(changed_at), created_at = utc_ts(created_at) "
+                        f"WHERE changed_at NOT GLOB ?1 OR created_at NOT GLOB ?1", (_UTC_GLOB,))
+            self._conn = conn
+        return self._conn
+
+    def watermark(self, name):
+        with self.lock:
+            row = self._db().execute("SELECT changed_at, last_id FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return tuple(row) if row else (None, None)
+
+    def last_synced_at(self):
+        with self.lock:
+            row = self._db().execute("SELECT MAX(synced_at) FROM sync_state").fetchone()
+        return row[0]
+
+    def upsert(self, name, rows, replace=False, advance=True):
+        """Write rows (newer changed_at wins); `replace` drops the table first (full snapshot)."""
+        _, changed_col, keep = SNAPSHOT_TABLES[name]
+        values = [
+            (str(r.get("id")), _utc(r.get(changed_col)), _utc(r.get("created_at")), json.dumps(r, default=str))
+            for r in rows if r.get("id") is not None
+        ]
+        with self.lock:
+            db = self._db()
+            with db:
+                if replace:
+                    db.execute(f"DELETE FROM {name}")
+                    db.execute("DELETE FROM sync_state WHERE name = ?", (name,))
+                # both sides are fixed-width UTC text, so text order is time order
+                db.executemany(
+                    f"INSERT INTO {name} (id, changed_at, created_at, row) VALUES (?, ?, ?, ?) "
+                    f"ON CONFLICT(id) DO UPDATE SET changed_at = excluded.changed_at, "
+                    f"created_at = excluded.created_at, row = excluded.row "
+                    f"WHERE {name}.changed_at IS NULL OR excluded.changed_at >= {name}.changed_at",
+                    values,
+                )
+                if keep:
+                    db.execute(
+                        f"DELETE FROM {name} WHERE id NOT IN "
+                        f"(SELECT id FROM {name} ORDER BY created_at DESC LIMIT ?)", (keep,))
+                newest = max(((v[1], v[0]) for v in values if v[1]), default=None)
+                if advance and (newest or replace):
+                    current = self.watermark(name)
+                    if newest and (current[0] is None or newest > current):
+                        current = newest
+                    db.execute(
+                        "INSERT INTO sync_state (name, changed_at, last_id, synced_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET changed_at = excluded.changed_at, "
+                        "last_id = excluded.last_id, synced_at = excluded.synced_at",
+                        (name, current[0], current[1], now_str()),
+                    )
+                elif advance:
+                    db.execute("UPDATE sync_state SET synced_at = ? WHERE name = ?", (now_str(), name))
+            self._rows.pop(name, None)
+
+    def load(self, name):
+        """Rows of `name`, newest first (copies; read from disk once, then from memory)."""
+        with self.lock:
+            rows = self._rows.get(name)
+            if rows is None:
+                cur = self._db().execute(f"SELECT row FROM {name} ORDER BY created_at DESC")
+                rows = self._rows[name] = [json.loads(r[0]) for r in cur]
+            return [dict(r) for r in rows]
+
+    def sync(self, supabase, name):
+        """Pull the initial snapshot, or only the rows changed since the watermark. Returns the row count."""
+        columns, changed_col, keep = SNAPSHOT_TABLES[name]
+        changed_at, last_id = self.watermark(name)
+        if changed_at is None:
+            # first sync (or a table without the watermark column): full read
+            query = supabase.table(name).select(columns)
+            if keep:
+                query = query.order("created_at", desc=True).limit(keep)
+            rows = _rows(query.execute())
+            self.upsert(name, rows, replace=True)
+            with self.lock:
+                self.stats["full_loads"] += 1
+            return len(rows)
+        since = (datetime.fromisoformat(changed_at.replace("Z", "+00:00")) - timedelta(seconds=SNAPSHOT_OVERLAP_SECONDS)).isoformat()
+        cursor, total = None, 0
+        while True:
+            query = supabase.table(name).select(columns).order(changed_col).order("id").limit(SNAPSHOT_PAGE_SIZE)
+            if cursor is None:
+                query = query.gte(changed_col, since)
+            else:
+                query = query.or_(f'{changed_col}.gt."{cursor[0]}",and({changed_col}.eq."{cursor[0]}",id.gt."{cursor[1]}")')
+            rows = _rows(query.execute())
+            self.upsert(name, rows)
+            total += len(rows)
+            if len(rows) < SNAPSHOT_PAGE_SIZE:
+                return total
+            cursor = (rows[-1][changed_col], rows[-1]["id"])
+
+    def sync_due(self, supabase, names, force=False):
+        """
+        Sync the tables whose last sync is older than SNAPSHOT_SYNC_SECONDS (all with `force`).
+        A caller that finds a sync of the same table already running waits for it instead of
+        pulling the same rows again; loads and live deltas are not blocked meanwhile.
+        """
+        for name in names:
+            with self.lock:
+                running = self._syncing.get(name)
+                if running is None:
+                    if not force and time.monotonic() - self._synced.get(name, float("-inf")) < SNAPSHOT_SYNC_SECONDS:
+                        continue
+                    done = self._syncing[name] = threading.Event()
+            if running is not None:
+                running.wait()
+                continue
+            try:
+                pulled = self.sync(supabase, name)
+                with self.lock:
+                    self.stats["rows_pulled"] += pulled
+                    self.stats["syncs"] += 1
+                    self._synced[name] = time.monotonic()
+            finally:
+                with self.lock:
+                    self._syncing.pop(name, None)
+                done.set()
+
+    def expire(self):
+        """Next fetch syncs every table regardless of SNAPSHOT_SYNC_SECONDS."""
+        with self.lock:
+            self._synced = {}
+
+@st.cache_resource
+def get_snapshot_store():
+    # one SQLite snapshot per server process, shared by every session
+    return SnapshotStore(SNAPSHOT_DB_PATH)
+
+def snapshot_tables():
+    # with the Core API configured, users are paged server-side (see fetch_users_page)
+    return [t for t in SNAPSHOT_TABLES if t != "users" or not (BACKEND_URL and SERVICE_TOKEN)]
+
+def fetch_data_from_supabase(supabase, force=False):
+    """
+    Recent orders, users and bypass alerts from the local snapshot store, after pulling what
+    changed since its watermarks. Offline or on error the last snapshot is used (it survives
+    restarts); mock data only if there is none yet.
+    """
+    store = get_snapshot_store()
+    if supabase is not None:
+        try:
+            store.sync_due(supabase, snapshot_tables(), force=force)
+        except Exception as e:
+            st.warning("Supabase sync failed: using local snapshot. (" + str(e) + ")")
+    orders = store.load("orders")
+    users = store.load("users") if "users" in snapshot_tables() else []
+    bypass_alerts = store.load("bypass_alerts")
+    if not (orders or users or bypass_alerts) and store.last_synced_at() is None:
+        st.warning("No local snapshot yet: using mock data.")
+        return mock_data()
+    return normalize_orders(orders), users, bypass_alerts
+
+@st.cache_data(ttl=300)
+def fetch_dashboard_metrics(_supabase, start_date=None, end_date=None, live_version=0):
+    """
+    Pre-aggregated metrics from the get_admin_dashboard_metrics RPC (totals, commission, net,
+    per-producer and daily series). Returns None if unavailable so callers can fall back to
+    compute_financials on the local orders. `live_version` only keys the cache: one refetch per
+    change-feed update, shared by every session.
+    """
+    if _supabase is None:
+        return None
+    try:
+        res = _supabase.rpc("get_admin_dashboard_metrics", {
+            "start_date_param": start_date.isoformat() if start_date else None,
+            "end_date_param": end_date.isoformat() if end_date else None,
+        }).execute()
+        data = res.data if hasattr(res, 'data') else res
+        if not data or not data.get("success"):
+            raise RuntimeError((data or {}).get("error", "empty response"))
+    except Exception as e:
+        st.warning("No aggregated metrics: computing from recent orders. (" + str(e) + ")")
+        return None
+
+    totals = data["totals"]
+    metrics = {
+        "total": totals["total_cents"] / 100,
+        "commission": totals["commission_cents"] / 100,
+        "net": totals["net_cents"] / 100,
+    }
+    per_producer = pd.DataFrame(data["per_producer"])
+    if not per_producer.empty:
+        per_producer["amount"] = per_producer.pop("total_cents") / 100
+        per_producer["commission"] = per_producer.pop("commission_cents") / 100
+    daily = pd.DataFrame(data["daily"])
+    if not daily.empty:
+        daily = pd.Series(daily["total_cents"].values / 100, index=pd.to_datetime(daily["day"]), name="amount")
+    else:
+        daily = pd.Series(dtype=float, name="amount")
+    return {
+        "metrics": metrics,
+        "per_producer": per_producer,
+        "daily": daily,
+        "active_orders_count": totals["active_orders_count"],
+        "bypass_alerts_count": totals["bypass_alerts_count"],
+    }
+
+# ---------- Range-aware time series (Hoy / Semana / Mes) ----------
+def local_today():
+    return datetime.now(LOCAL_TZ).date()
+
+def range_start(rango, today):
+    """First local day of the Hoy/Semana/Mes window."""
+    if rango == "week":
+        return today - timedelta(days=today.weekday())
+    if rango == "month":
+        return today.replace(day=1)
+    return today
+
+def series_window_start(today):
+    """
+    One window covers every range plus the 30-day chart, so switching ranges only slices the
+    cached series (the cache key changes once a day).
+    """
+    return min(range_start("week", today), range_start("month", today), today - timedelta(days=29))
+
+def empty_daily_frame():
+    return pd.DataFrame({"orders": pd.Series(dtype=int), "amount": pd.Series(dtype=float),
+                         "commission": pd.Series(dtype=float)}, index=pd.DatetimeIndex([], name="day"))
+
+def daily_from_orders(orders, start_day, producer_id=None):
+    """Local fallback (mock/offline): same daily frame built from the cached orders."""
+    df = pd.DataFrame(orders)
+    if df.empty or "created_at" not in df.columns:
+        return empty_daily_frame()
+    if producer_id:
+        df = df[df["producer_id"] == producer_id]
+    created = pd.to_datetime(df["created_at"], errors="coerce", utc=True).dt.tz_convert(LOCAL_TZ)
+    df = df.assign(day=pd.to_datetime(created.dt.date), active=(df["status"] != "cancelled"))
+    df = df[df["day"] >= pd.Timestamp(start_day)]
+    df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0).where(df["active"], 0)
+    df["commission"] = pd.to_numeric(df["commission"], errors="coerce").fillna(0).where(df["active"], 0)
+    return df.groupby("day").agg(orders=("active", "sum"), amount=("amount", "sum"), commission=("commission", "sum"))
+
 @st.cache_data(ttl=300)
-def fetch_data_from_supabase(supabase):
-    """Fetch orders, users, bypass alerts and compute metrics from Supabase. Fallbacks to mock data if anything fails."""
+def fetch_daily_series(_supabase, producer_id, start_day, live_version=0):
+    """
+    Daily orders/amount/commission from `start_day` on, read from order_rollups_daily (one row per
+    producer and day) with the date window pushed down to the database. Cached per
+    (producer_id, start_day, live_version): with the change feed, a new order or status change
+    refetches once instead of waiting for the TTL. Returns None if the rollups are unavailable.
+    """
+    if _supabase is None:
+        return None
     try:
-        if supabase is None:
-            raise RuntimeError("Supabase client not available")
-        # Example table names: orders, users, bypass_alerts
-        res_orders = supabase.table("orders").select("*").execute()
-        res_users = supabase.table("users").select("*").execute()
-        res_bypass = supabase.table("bypass_alerts").select("*").execute()
-
-        orders = res_orders.data if hasattr(res_orders, 'data') else res_orders
-        users = res_users.data if hasattr(res_users, 'data') else res_users
-        bypass_alerts = res_bypass.data if hasattr(res_bypass, 'data') else res_bypass
-
-        # Convert datetimes if necessary
-        return orders, users, bypass_alerts
+        query = (
+            _supabase.table("order_rollups_daily")
+            .select("day,orders_count,cancelled_count,total_cents,commission_cents")
+            .gte("day", start_day.isoformat())
+        )
+        if producer_id:
+            query = query.eq("producer_id", producer_id)
+        res = query.execute()
+        rows = res.data if hasattr(res, 'data') else res
     except Exception as e:
-        # On any error, log and return mock data
-        st.warning("No Supabase data: using mock data. (" + str(e) + ")")
-        return mock_data()
+        st.warning("No daily rollups: using cached orders. (" + str(e) + ")")
+        return None
+    if not rows:
+        return empty_daily_frame()
+    df = pd.DataFrame(rows)
+    df["day"] = pd.to_datetime(df["day"])
+    df["orders"] = df["orders_count"] - df["cancelled_count"]
+    df["amount"] = df["total_cents"] / 100
+    df["commission"] = df["commission_cents"] / 100
+    return df.groupby("day")[["orders", "amount", "commission"]].sum()
+
+def range_totals(daily, start_day, end_day):
+    window = daily.loc[pd.Timestamp(start_day):pd.Timestamp(end_day)]
+    return int(window["orders"].sum()), float(window["amount"].sum())
 
 def compute_financials(orders):
     df = pd.DataFrame(orders)
@@ -129,10 +483,24 @@ def generate_excel_report(orders, metrics):
     with pd.ExcelWriter(bio, engine="xlsxwriter") as writer:
         df.to_excel(writer, index=False, sheet_name="orders")
         pd.DataFrame([metrics]).to_excel(writer, index=False, sheet_name="summary")
-        writer.save()
     bio.seek(0)
     return bio
 
+EXPORT_MIME = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def backend_export_url(fmt):
+    # Signed, short-lived link (same scheme as the API's url_signature): the browser downloads the
+    # stream straight from the API, so nothing passes through this process. The expiry is rounded
+    # up so the link stays the same across reruns; it is valid between 1x and 2x EXPORT_LINK_SECONDS.
+    path = f"/api/v1/admin/admin/export/{fmt}"
+    expires = (int(time.time()) // EXPORT_LINK_SECONDS + 2) * EXPORT_LINK_SECONDS
+    sig = hmac.new(SERVICE_TOKEN.encode(), f"{path}:{expires}".encode(), hashlib.sha256).hexdigest()
+    return f"{BACKEND_PUBLIC_URL}{path}?" + urllib.parse.urlencode({"expires": expires, "sig": sig})
+
 def generate_pdf_report(orders, metrics, filename="reporte_diario.pdf"):
     if PDF_SUPPORTED:
         bio = BytesIO()
@@ -167,22 +535,412 @@ def generate_pdf_report(orders, metrics, filename="reporte_diario.pdf"):
         bio.seek(0)
         return bio
 
+# ---------- Report jobs ----------
+def data_watermark(orders, metrics):
+    """Changes whenever the data behind a report changes: newest order, row count and totals."""
+    newest = max((str(o.get("updated_at") or o.get("created_at") or "") for o in orders), default="")
+    return [newest, len(orders), round(metrics.get("total", 0), 2), round(metrics.get("commission", 0), 2)]
+
+def report_key(start_day, end_day, producer_id, watermark):
+    raw = json.dumps([str(start_day), str(end_day), producer_id, watermark], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class ReportJobs:
+    """
+    Renders reports in a thread pool, off the script run, and keeps the artifacts on disk
+    named by their content key: identical requests (same range, producer and data watermark)
+    are served from the file. Hits refresh the file mtime; when the directory grows past
+    max_bytes the least recently used artifacts are deleted.
+    """
+
+    def __init__(self, cache_dir=REPORT_CACHE_DIR, max_bytes=REPORT_CACHE_MAX_BYTES, workers=REPORT_WORKERS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+        self._jobs = {}  # key -> Future of the running render
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "renders": 0, "failures": 0, "evicted": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, f"{key}.{ext}")
+
+    def get(self, key, ext="pdf"):
+        path = self._path(key, ext)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # LRU by mtime
+        except FileNotFoundError:
+            return None
+        self.stats["hits"] += 1
+        return data
+
+    def submit(self, key, render, *args, ext="pdf"):
+        """Start rendering unless the artifact exists or a job for the same key is running."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.done():
+                return job
+            job = self._executor.submit(self._run, key, ext, render, args)
+            self._jobs[key] = job
+            return job
+
+    def _run(self, key, ext, render, args):
+        path = self._path(key, ext)
+        if not os.path.exists(path):
+            try:
+                data = render(*args).getvalue()
+            except Exception:
+                self.stats["failures"] += 1
+                raise
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            self.stats["renders"] += 1
+            self._evict()
+        with self._lock:
+            self._jobs.pop(key, None)
+        return path
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                continue
+            try:
+                st_ = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st_.st_mtime, st_.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.stats["evicted"] += 1
+
+@st.cache_resource
+def get_report_jobs():
+    # one pool and cache per server process, shared by every session
+    return ReportJobs()
+
+def orders_in_range(orders, start_day, end_day, producer_id=None):
+    """Orders created between start_day and end_day (local days, inclusive), optionally of one producer."""
+    selected = []
+    for o in orders:
+        if producer_id and str(o.get("producer_id")) != str(producer_id):
+            continue
+        created = _ts(o.get("created_at"))
+        if created is None:
+            continue
+        day = (created.astimezone(LOCAL_TZ) if created.tzinfo else created).date()
+        if start_day <= day <= end_day:
+            selected.append(o)
+    return selected
+
+def report_metrics(report_orders, daily, start_day, end_day):
+    """Totals for the report window: from the daily rollups when available (complete), else from the orders."""
+    if daily is not None and not daily.empty:
+        window = daily.loc[pd.Timestamp(start_day):pd.Timestamp(end_day)]
+        total, commission = float(window["amount"].sum()), float(window["commission"].sum())
+        return {"total": total, "commission": commission, "net": total - commission}
+    return compute_financials(report_orders)[0]
+
+def pdf_report_download(orders, start_day, end_day, producer_id=None, daily=None, key_prefix="pdf"):
+    """
+    Download button for the PDF of start_day..end_day (one producer or all); renders in the
+    background only when asked. Orders and totals are narrowed to that window first, so the
+    content matches its cache key. `daily` is the rollup series for the same producer.
+    """
+    report_orders = orders_in_range(orders, start_day, end_day, producer_id)
+    metrics = report_metrics(report_orders, daily, start_day, end_day)
+    jobs = get_report_jobs()
+    key = report_key(start_day, end_day, producer_id, data_watermark(report_orders, metrics))
+    file_name = f"reporte_diario_{end_day}.pdf"
+    data = jobs.get(key)
+    if data is None and st.button("Generar PDF (reporte diario)", key=f"{key_prefix}_build"):
+        job = jobs.submit(key, generate_pdf_report, report_orders, metrics, file_name)
+        try:
+            job.result(timeout=REPORT_WAIT_SECONDS)
+            data = jobs.get(key)
+        except FutureTimeout:
+            st.info("El PDF se está generando; va a estar listo en la próxima actualización.")
+        except Exception as e:
+            st.error(f"Error generando PDF: {e}")
+    if data is not None:
+        st.download_button("Descargar PDF (reporte diario)", data=data, file_name=file_name, mime="application/pdf", key=f"{key_prefix}_download")
+
+# ---------- Live updates (change feed) ----------
+def sse_events(lines):
+    """Parse a text/event-stream into (id, event, data) tuples; the id carries over like in EventSource."""
+    event_id, kind, data = None, "message", []
+    for raw in lines:
+        line = (raw.decode("utf-8") if isinstance(raw, bytes) else raw).rstrip("\r\n")
+        if not line:
+            if data:
+                yield event_id, kind, "\n".join(data)
+            kind, data = "message", []
+            continue
+        if line.startswith(":"):
+            continue  # heartbeat / comment
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "id":
+            event_id = value
+        elif field == "event":
+            kind = value
+        elif field == "data":
+            data.append(value)
+
+def _ts(value):
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+class LiveDashboardState:
+    """
+    Recent orders and bypass alerts kept current by the change feed, shared by every session of
+    this server process. A background thread reads the SSE stream and upserts each delta as it
+    arrives; sessions only rerun when `version` moves. A `reset` event (first connect, or the
+    backend could not replay what was missed) makes the next session reload the full data once.
+    Users are not in the feed: a second thread reloads them with `users_loader` every
+    `users_refresh_seconds` (or right away after `refresh_users()`).
+    """
+
+    def __init__(self, url, token, store=None, users_loader=None, users_refresh_seconds=SNAPSHOT_SYNC_SECONDS):
+        self.url = url
+        self.token = token
+        self.store = store  # deltas are also written to the local snapshot
+        self.users_loader = users_loader
+        self.users_refresh_seconds = users_refresh_seconds
+        self._users_due = threading.Event()
+        self.lock = threading.Lock()
+        self.orders = {}  # id -> row
+        self.users = []
+        self.bypass = {}
+        self.loaded = False
+        self.loading = False
+        self.pending = []  # deltas received while a full load is running
+        self.version = 0
+        self.last_event_id = None
+        self.connected = False
+        self.stats = {"events": 0, "rows": 0, "resets": 0, "reconnects": 0, "errors": 0, "users_refreshes": 0}
+        threading.Thread(target=self._run, name="change-feed", daemon=True).start()
+        if users_loader is not None:
+            threading.Thread(target=self._refresh_users_loop, name="change-feed-users", daemon=True).start()
+
+    def _run(self):
+        backoff = 1
+        while True:
+            headers = {"Accept": "text/event-stream", "X-Service-Token": self.token}
+            if self.last_event_id:
+                headers["Last-Event-ID"] = self.last_event_id
+            try:
+                req = urllib.request.Request(self.url, headers=headers)
+                with urllib.request.urlopen(req, timeout=60) as resp:
+                    self.connected = True
+                    backoff = 1
+                    for event_id, kind, data in sse_events(resp):
+                        self._on_event(event_id, kind, json.loads(data))
+                log.info("Change feed closed by the server; reconnecting in %ss", backoff)
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.warning("Change feed error (%s); reconnecting in %ss", e, backoff, exc_info=not isinstance(e, OSError))
+            self.connected = False
+            self.stats["reconnects"] += 1
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def refresh_users(self):
+        """Reload users now (e.g. after blocking some) instead of waiting for the next round."""
+        self._users_due.set()
+
+    def _refresh_users_loop(self):
+        while True:
+            self._users_due.wait(self.users_refresh_seconds)
+            self._users_due.clear()
+            if not self.loaded:
+                continue  # the next full load brings them
+            try:
+                users = self.users_loader()
+            except Exception as e:
+                log.warning("Users refresh failed (%s); retrying in %ss", e, self.users_refresh_seconds)
+                continue
+            with self.lock:
+                self.stats["users_refreshes"] += 1
+                if users != self.users:
+                    self.users = users
+                    self.version += 1
+
+    def _on_event(self, event_id, kind, data):
+        with self.lock:
+            self.last_event_id = event_id
+            if kind == "reset":
+                self.loaded = False
+                self.stats["resets"] += 1
+            elif kind in ("order", "bypass_alert"):
+                self.stats["events"] += 1
+                self.stats["rows"] += len(data)
+                if self.loading:
+                    self.pending.append((kind, data))
+                elif self.loaded:
+                    self._apply(kind, data)
+                else:
+                    return  # the next full load already includes it
+            else:
+                return
+            self.version += 1
+
+    def _apply(self, kind, rows):
+        if self.store is not None:
+            try:
+                # the watermark is left to the delta sync, which re-reads these rows idempotently
+                self.store.upsert("orders" if kind == "order" else "bypass_alerts", rows, advance=False)
+            except Exception:
+                pass
+        if kind == "bypass_alert":
+            for row in rows:
+                self.bypass[str(row.get("id"))] = row
+            return
+        for row in normalize_orders(rows):
+            key = str(row["id"])
+            current = self.orders.get(key)
+            if current is not None:
+                new_ts, old_ts = _ts(row.get("updated_at")), _ts(current.get("updated_at"))
+                if new_ts and old_ts and new_ts < old_ts:
+                    continue  # older than what a full load already brought
+                row = {**current, **row}
+            self.orders[key] = row
+        if len(self.orders) > RECENT_ORDERS_LIMIT:
+            newest = sorted(self.orders.values(), key=lambda o: str(o.get("created_at") or ""), reverse=True)
+            self.orders = {str(o["id"]): o for o in newest[:RECENT_ORDERS_LIMIT]}
+
+    def view(self, loader):
+        """(orders, users, bypass_alerts, version); runs `loader` first if a full load is due."""
+        with self.lock:
+            must_load = not self.loaded and not self.loading
+            if must_load:
+                self.loading = True
+                self.pending = []
+        if must_load:
+            try:
+                orders, users, bypass_alerts = loader()
+            except Exception:
+                with self.lock:
+                    self.loading = False
+                raise
+            with self.lock:
+                self.orders = {str(o["id"]): o for o in orders}
+                self.users = users
+                self.bypass = {str(b.get("id")): b for b in bypass_alerts}
+                for kind, rows in self.pending:
+                    self._apply(kind, rows)
+                self.pending = []
+                self.loading = False
+                self.loaded = True
+                self.version += 1
+        with self.lock:
+            orders = sorted((dict(o) for o in self.orders.values()), key=lambda o: str(o.get("created_at") or ""), reverse=True)
+            return orders, list(self.users), list(self.bypass.values()), self.version
+
+@st.cache_resource
+def get_live_state():
+    # one SSE connection per server process, shared by every session
+    if not CHANGE_FEED_URL:
+        return None
+    return LiveDashboardState(CHANGE_FEED_URL, SERVICE_TOKEN, get_snapshot_store(), users_loader=load_snapshot_users)
+
+def load_snapshot_users():
+    # users are not part of the change feed: pull their delta into the snapshot (background thread)
+    if "users" not in snapshot_tables():
+        return []
+    store = get_snapshot_store()
+    supabase = create_supabase_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_AVAILABLE and SUPABASE_URL and SUPABASE_KEY else None
+    if supabase is not None:
+        store.sync_due(supabase, ["users"], force=True)
+    return store.load("users")
+
+def watch_live_state(live):
+    """Rerun this session only when the change feed moved (replaces the full-page reload)."""
+    if hasattr(st, "fragment"):
+        @st.fragment(run_every=LIVE_CHECK_SECONDS)
+        def watch():
+            if live.version != st.session_state.get("live_version"):
+                st.rerun()
+        watch()
+    elif st.sidebar.button("Actualizar datos"):
+        # older Streamlit without timed fragments: deltas are applied on the next run
+        st.rerun()
+
 # ---------- Actions: User block/unblock ----------
-def toggle_user_active(supabase, user_id, current_state):
-    # prefer Supabase call; if not present, update session_state cache
+USERS_PAGE_SIZE = 50
+
+def backend_request(path, params=None, body=None):
+    url = f"{BACKEND_URL}{path}"
+    if params:
+        url += "?" + urllib.parse.urlencode(params)
+    req = urllib.request.Request(
+        url,
+        data=json.dumps(body).encode("utf-8") if body is not None else None,
+        headers={"X-Service-Token": SERVICE_TOKEN, "Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read())
+
+@st.cache_data(ttl=60)
+def fetch_users_page_backend(search, cursor):
+    params = {"limit": USERS_PAGE_SIZE}
+    if search:
+        params["search"] = search
+    if cursor:
+        params["cursor"] = cursor
+    res = backend_request("/api/v1/users/", params)
+    users = [
+        {"id": u["id"], "name": u.get("full_name"), "email": u.get("email"), "role": u.get("role"), "active": u.get("is_active")}
+        for u in res["items"]
+    ]
+    return users, res["next_cursor"]
+
+def fetch_users_page(search, cursor):
+    """One page of users: filtered and keyset-paginated by the Core API, or sliced locally (mock/offline)."""
+    if BACKEND_URL and SERVICE_TOKEN:
+        return fetch_users_page_backend(search, cursor)
+    users = st.session_state.get("cached_users", [])
+    if search:
+        needle = search.lower()
+        users = [u for u in users if needle in str(u.get("name", "")).lower() or needle in str(u.get("email", "")).lower()]
+    start = int(cursor or 0)
+    end = start + USERS_PAGE_SIZE
+    return users[start:end], (str(end) if end < len(users) else None)
+
+def set_users_active(supabase, user_ids, active):
+    """Block (active=False) or unblock many users with a single statement."""
     try:
+        if BACKEND_URL and SERVICE_TOKEN:
+            res = backend_request("/api/v1/users/status", body={"user_ids": list(user_ids), "active": active})
+            fetch_users_page_backend.clear()
+            return True, res
         if supabase:
-            data = {"active": (not current_state)}
-            res = supabase.table("users").update(data).eq("id", user_id).execute()
+            res = supabase.table("users").update({"active": active}).in_("id", list(user_ids)).execute()
+            live_state = get_live_state()
+            if live_state is not None:
+                live_state.refresh_users()  # the shared live state would keep the old flags until then
             return True, res
-        else:
-            # update cached users
-            users = st.session_state.get("cached_users", [])
-            for u in users:
-                if u.get("id") == user_id:
-                    u["active"] = not current_state
-            st.session_state["cached_users"] = users
-            return True, "mocked"
+        # update cached users
+        ids = set(user_ids)
+        users = st.session_state.get("cached_users", [])
+        for u in users:
+            if u.get("id") in ids:
+                u["active"] = active
+        st.session_state["cached_users"] = users
+        return True, "mocked"
     except Exception as e:
         return False, str(e)
 
@@ -198,14 +956,22 @@ def push_menu_to_notion(menu_text):
 # ---------- Main App ----------
 st.set_page_config(page_title="Olla App Dashboards", layout="centered", initial_sidebar_state="expanded")
 
-# Auto-refresh via JS every AUTO_REFRESH_SECONDS
-st.markdown(f"<script>setTimeout(()=>location.reload(), {AUTO_REFRESH_SECONDS*1000})</script>", unsafe_allow_html=True)
-
 with st.sidebar:
     st.header("Olla App - Control")
     view = st.radio("Seleccionar dashboard:", ["Admin", "Modo Abuela"])
     offline_mode = st.checkbox("Modo offline (usar cache)", value=False)
-    st.write("Auto-refresh cada 2 minutos (JS).")
+    st.caption(f"Snapshot local: {get_snapshot_store().last_synced_at() or 'sin datos'}")
+
+live = None if offline_mode else get_live_state()
+if live is None:
+    # Auto-refresh via JS every AUTO_REFRESH_SECONDS
+    st.markdown(f"<script>setTimeout(()=>location.reload(), {AUTO_REFRESH_SECONDS*1000})</script>", unsafe_allow_html=True)
+
+with st.sidebar:
+    if live is not None:
+        st.write("Actualización en vivo: " + ("conectado" if live.connected else "reconectando..."))
+    else:
+        st.write("Auto-refresh cada 2 minutos (JS).")
     st.markdown("---")
     st.write("Conexión Supabase:")
     st.write("Configured" if SUPABASE_URL and SUPABASE_KEY else "Not configured")
@@ -214,33 +980,50 @@ with st.sidebar:
 # Establish supabase client (if configured and not offline)
 supabase_client = None if offline_mode else get_supabase_client()
 
-# Load data (cached)
-if "cached_orders" not in st.session_state or st.session_state.get("cache_ts", None) is None:
+def load_live_snapshot():
+    # full load after a feed reset: sync now so no delta falls in between
+    return fetch_data_from_supabase(supabase_client, force=True)
+
+# Load data: shared live state kept current by the change feed, else cached fetch
+live_data = None
+if live is not None:
+    try:
+        live_data = live.view(load_live_snapshot)
+    except Exception as e:
+        st.warning("Live data unavailable: using cache. (" + str(e) + ")")
+        live = None
+if live_data is not None:
+    orders, users, bypass_alerts, live_version = live_data
+    st.session_state["cached_orders"] = orders
+    st.session_state["cached_users"] = users
+    st.session_state["cached_bypass"] = bypass_alerts
     st.session_state["cache_ts"] = datetime.now().isoformat()
+    st.session_state["live_version"] = live_version
+    watch_live_state(live)
+else:
+    # local snapshot: delta sync when online, last persisted copy when offline
     orders, users, bypass_alerts = fetch_data_from_supabase(supabase_client)
     st.session_state["cached_orders"] = orders
     st.session_state["cached_users"] = users
     st.session_state["cached_bypass"] = bypass_alerts
-else:
-    # use cached by default unless offline_mode False and supabase available -> refresh from supabase
-    if not offline_mode and supabase_client:
-        try:
-            orders, users, bypass_alerts = fetch_data_from_supabase(supabase_client)
-            st.session_state["cached_orders"] = orders
-            st.session_state["cached_users"] = users
-            st.session_state["cached_bypass"] = bypass_alerts
-            st.session_state["cache_ts"] = datetime.now().isoformat()
-        except Exception as e:
-            orders = st.session_state["cached_orders"]
-            users = st.session_state["cached_users"]
-            bypass_alerts = st.session_state["cached_bypass"]
-    else:
-        orders = st.session_state["cached_orders"]
-        users = st.session_state["cached_users"]
-        bypass_alerts = st.session_state["cached_bypass"]
+    st.session_state["cache_ts"] = datetime.now().isoformat()
 
-# Compute metrics
-metrics, per_producer = compute_financials(orders)
+# Change-feed version: keys the cached aggregates and daily series, so they refetch once per update
+data_version = st.session_state.get("live_version", 0) if live else 0
+
+# Compute metrics: pre-aggregated in the database when available (kilobytes instead of the
+# whole orders history); offline or on error, fall back to the cached orders.
+aggregates = None if offline_mode else fetch_dashboard_metrics(supabase_client, live_version=data_version)
+if aggregates is not None:
+    st.session_state["cached_aggregates"] = aggregates
+else:
+    aggregates = st.session_state.get("cached_aggregates")
+if aggregates is not None:
+    metrics, per_producer = aggregates["metrics"], aggregates["per_producer"]
+    active_orders_count = aggregates["active_orders_count"]
+else:
+    metrics, per_producer = compute_financials(orders)
+    active_orders_count = len([o for o in orders if o.get("status")!="cancelled"])
 
 # Top-level alert area
 if bypass_alerts and len(bypass_alerts) > 0:
@@ -253,7 +1036,7 @@ if view == "Admin":
     # Metrics cards
     c1, c2, c3, c4 = st.columns([1,1,1,1])
     with c1:
-        st.metric("Ventas (hoy)", value=len([o for o in orders if o.get("status")!="cancelled"]), delta=None)
+        st.metric("Ventas (hoy)", value=active_orders_count, delta=None)
     with c2:
         st.metric("Ingresos totales", value=f"${metrics['total']:.2f}")
     with c3:
@@ -262,31 +1045,58 @@ if view == "Admin":
         st.metric("Bypass detectados", value=len(bypass_alerts))
 
     st.markdown("### Tabla de usuarios")
-    # Users table with action buttons
-    users_df = pd.DataFrame(users)
-    if users_df.empty:
+    # Only the current page is fetched and rendered (keyset cursors kept in the session)
+    users_search = st.text_input("Buscar usuario (nombre o email)", key="users_search")
+    if st.session_state.get("users_search_applied") != users_search:
+        st.session_state["users_search_applied"] = users_search
+        st.session_state["users_cursors"] = [None]
+    cursors = st.session_state.setdefault("users_cursors", [None])
+    try:
+        users_page, next_cursor = fetch_users_page(users_search, cursors[-1])
+    except Exception as e:
+        st.error(f"Error cargando usuarios: {e}")
+        users_page, next_cursor = [], None
+    if not users_page:
         st.info("No hay usuarios para mostrar.")
     else:
-        # show table and actions per row
-        for i, row in users_df.iterrows():
-            cols = st.columns([3,2,2,1])
-            cols[0].markdown(f"**{row.get('name','-')}**  \n{row.get('email','-')}  \nRol: {row.get('role','-')}")
-            cols[1].write("Activo" if row.get("active") else "Bloqueado")
-            if cols[2].button("Bloquear" if row.get("active") else "Activar", key=f"toggle_{row.get('id')}"):
-                ok, res = toggle_user_active(supabase_client, row.get("id"), row.get("active"))
+        users_df = pd.DataFrame(users_page).reindex(columns=["id", "name", "email", "role", "active"])
+        users_df.insert(0, "selected", False)
+        edited = st.data_editor(
+            users_df,
+            key=f"users_grid_{len(cursors)}_{users_search}",
+            hide_index=True,
+            disabled=[c for c in users_df.columns if c != "selected"],
+            column_config={"selected": st.column_config.CheckboxColumn("Sel.")},
+        )
+        selected_ids = edited.loc[edited["selected"], "id"].tolist()
+        b1, b2, b3, b4 = st.columns([2,2,1,1])
+        for col, label, active in ((b1, "Bloquear seleccionados", False), (b2, "Activar seleccionados", True)):
+            if col.button(label, disabled=not selected_ids, key=f"users_set_{active}"):
+                ok, res = set_users_active(supabase_client, selected_ids, active)
                 if ok:
-                    st.success(f"Usuario {row.get('email')} actualizado.")
+                    st.success(f"{len(selected_ids)} usuario(s) actualizados.")
                 else:
                     st.error(f"Error: {res}")
+        if b3.button("◀", disabled=len(cursors) == 1, key="users_prev"):
+            cursors.pop()
+            st.rerun()
+        if b4.button("▶", disabled=next_cursor is None, key="users_next"):
+            cursors.append(next_cursor)
+            st.rerun()
+        st.caption(f"Página {len(cursors)} · {len(users_page)} usuarios")
 
     st.markdown("---")
     st.write("Exportar reportes financieros:")
-    excel_bio = generate_excel_report(orders, metrics)
-    st.download_button("Descargar Excel (reportes financieros)", data=excel_bio, file_name=f"reporte_financiero_{datetime.now().date()}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    if BACKEND_URL and SERVICE_TOKEN:
+        export_fmt = st.selectbox("Formato", list(EXPORT_MIME), key="export_fmt")
+        st.link_button("Descargar reporte financiero (historial completo)", backend_export_url(export_fmt))
+    elif st.button("Generar Excel", key="build_export"):
+        # Built only when requested (not on every rerun) and not kept in the session
+        st.download_button("Descargar reporte financiero", data=generate_excel_report(orders, metrics), file_name=f"reporte_financiero_{datetime.now().date()}.xlsx", mime=EXPORT_MIME["xlsx"])
 
     st.write("Exportar PDF diario:")
-    pdf_bio = generate_pdf_report(orders, metrics, filename=f"reporte_diario_{datetime.now().date()}.pdf")
-    st.download_button("Descargar PDF (reporte diario)", data=pdf_bio, file_name=f"reporte_diario_{datetime.now().date()}.pdf", mime="application/pdf")
+    today = local_today()
+    pdf_report_download(orders, today, today, daily=None if offline_mode else fetch_daily_series(supabase_client, None, series_window_start(today), data_version), key_prefix="admin_pdf")
 
     st.markdown("---")
     st.write("Monitor health del sistema:")
@@ -328,16 +1138,19 @@ else:
             st.session_state["modo_abuela_range"] = "month"
     st.markdown("</div>", unsafe_allow_html=True)
 
-    # Determine range
+    # Producer whose numbers are shown (series cached per producer)
+    producer_ids = sorted(per_producer["producer_id"].astype(str).tolist()) if "producer_id" in per_producer else []
+    selected = st.selectbox("Productor", ["Todos"] + producer_ids, key="abuela_producer")
+    abuela_producer = None if selected == "Todos" else selected
+
+    # Determine range: slice the cached daily series (no reload on range switch)
     rango = st.session_state.get("modo_abuela_range", "today")
-    # Simple aggregate for selected range (for demo mock only 'today' is supported)
-    if rango == "today":
-        ventas_count = len([o for o in orders if o.get("status")!="cancelled"])
-        ingresos = metrics['total']
-    else:
-        # naive approach: same numbers (would query with date ranges in real app)
-        ventas_count = len([o for o in orders if o.get("status")!="cancelled"])
-        ingresos = metrics['total']
+    today = local_today()
+    window_start = series_window_start(today)
+    daily = None if offline_mode else fetch_daily_series(supabase_client, abuela_producer, window_start, data_version)
+    if daily is None:
+        daily = daily_from_orders(orders, window_start, abuela_producer)
+    ventas_count, ingresos = range_totals(daily, range_start(rango, today), today)
 
     # Big simple cards
     st.markdown("<div style='display:flex;flex-direction:column;gap:12px;'>", unsafe_allow_html=True)
@@ -364,18 +1177,16 @@ else:
     st.markdown("---")
     st.markdown("<h3 style='color:#fff'>Ganancias proyectadas</h3>", unsafe_allow_html=True)
     # Simple projected earnings: linear projection based on today -> month
-    projected_days_left = 30 - datetime.now().day + 1
-    projected_month_total = metrics['total'] * (30 / max(1, datetime.now().day))
+    _, month_to_date = range_totals(daily, range_start("month", today), today)
+    projected_month_total = month_to_date * (30 / max(1, today.day))
     st.markdown(f"<div style='font-size:22px; font-weight:700'>Proyectado mes: ${projected_month_total:.2f}</div>", unsafe_allow_html=True)
 
     # Small simple chart using pandas & st.line_chart (will adapt for mobile)
     try:
-        # build a mock daily series for last 7 days using orders timestamps if available
-        df = pd.DataFrame(orders)
-        if "created_at" in df.columns:
-            df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce")
-            series = df.set_index("created_at").resample("D").sum()["amount"].fillna(0).last("30D")
-            st.line_chart(series)
+        # daily series for the last 30 days from the cached window
+        if not daily.empty:
+            days = pd.date_range(end=pd.Timestamp(today), periods=30)
+            st.line_chart(daily["amount"].reindex(days, fill_value=0))
         else:
             # fallback mock series
             import numpy as np
@@ -390,16 +1201,17 @@ else:
     # Quick actions: Export PDF daily / Refresh cache
     a1, a2 = st.columns([1,1])
     with a1:
-        pdf_bio = generate_pdf_report(orders, metrics)
-        st.download_button("Descargar PDF (reporte diario)", data=pdf_bio, file_name=f"reporte_diario_{datetime.now().date()}.pdf", mime="application/pdf")
+        pdf_report_download(orders, range_start(rango, today), today, abuela_producer, daily=daily, key_prefix="abuela_pdf")
     with a2:
         if st.button("Refrescar ahora"):
             # simple refresh: clear cache and rerun
             try:
-                fetch_data_from_supabase.clear()
-                st.experimental_rerun()
+                get_snapshot_store().expire()
+                fetch_dashboard_metrics.clear()
+                fetch_daily_series.clear()
+                st.rerun()
             except Exception:
-                st.experimental_rerun()
+                st.rerun()
 
     st.markdown("</div>", unsafe_allow_html=True)
     st.markdown("</div>", unsafe_allow_html=True)  # close hc
@@ -0,0 +1,110 @@
+import importlib.util
+from pathlib import Path
+
+# notifier-coalescer.py is deployed as notifier/coalescer.py: load it by path
+_spec = importlib.util.spec_from_file_location(
+    "notifier_coalescer", Path(__file__).resolve().parents[1] / "notifier-coalescer.py")
+coalescer_mod = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(coalescer_mod)
+
+AlertCoalescer = coalescer_mod.AlertCoalescer
+
+
+class Channels:
+    """Stand-in for notifier.emit_immediate/emit_digest with a switch per channel bucket."""
+
+    def __init__(self):
+        self.open = {"email": True, "sms": True}
+        self.immediate = []   # (channel, order_id)
+        self.digests = []     # (channel, [(order_id, count)])
+
+    def emit_immediate(self, alert):
+        sent = {ch for ch, ok in self.open.items() if ok}
+        self.immediate.extend((ch, alert["order_id"]) for ch in sorted(sent))
+        return sent
+
+    def emit_digest(self, channel, groups):
+        if channel == "sms":
+            groups = [g for g in groups if g.severity == "high"]
+            if not groups:
+                return []
+        if not self.open[channel]:
+            return groups
+        self.digests.append((channel, sorted((g.order_id, g.count) for g in groups)))
+        return []
+
+
+def alert(order_id, producer_id="p1"):
+    return {"order_id": order_id, "producer_id": producer_id, "reason": "phone", "score": 0.9}
+
+
+def make():
+    channels = Channels()
+    return channels, AlertCoalescer(channels.emit_immediate, channels.emit_digest, window=60)
+
+
+def test_burst_pages_once_and_digests_the_rest():
+    channels, coalescer = make()
+    assert coalescer.add(alert("o1"), "high") is True
+    assert coalescer.add(alert("o1"), "high") is False
+    assert coalescer.add(alert("o2"), "medium") is False
+    coalescer.flush()
+    assert channels.immediate == [("email", "o1"), ("sms", "o1")]
+    assert channels.digests == [("email", [("o1", 1), ("o2", 1)]), ("sms", [("o1", 1)])]
+    assert coalescer._pending == {}
+
+
+def test_empty_email_bucket_does_not_skip_the_sms_digest():
+    channels, coalescer = make()
+    coalescer.add(alert("o1"), "high")
+    coalescer.add(alert("o1"), "high")
+    channels.open["email"] = False
+    coalescer.flush()
+    assert channels.digests == [("sms", [("o1", 1)])]
+
+    # only the email is owed next window: the SMS is not sent twice
+    channels.open["email"] = True
+    coalescer.flush()
+    assert channels.digests[-1] == ("email", [("o1", 1)])
+    assert len(channels.digests) == 2
+    assert coalescer.stats["requeued"] == 1
+
+
+def test_rate_limited_page_is_not_marked_seen():
+    channels, coalescer = make()
+    channels.open.update(email=False, sms=False)
+    assert coalescer.add(alert("o1"), "high") is False
+    assert channels.immediate == []
+    assert coalescer._seen == {}
+
+    # next alert of the same group pages as soon as a bucket has room
+    channels.open.update(email=True, sms=True)
+    assert coalescer.add(alert("o1"), "high") is True
+    assert channels.immediate == [("email", "o1"), ("sms", "o1")]
+
+    # the rate-limited one still goes out in the digest
+    coalescer.flush()
+    assert channels.digests == [("email", [("o1", 1)]), ("sms", [("o1", 1)])]
+
+
+def test_partial_page_leaves_the_missing_channel_to_the_digest():
+    channels, coalescer = make()
+    channels.open["sms"] = False
+    assert coalescer.add(alert("o1"), "high") is True
+    assert channels.immediate == [("email", "o1")]
+    channels.open["sms"] = True
+    coalescer.flush()
+    assert channels.digests == [("sms", [("o1", 1)])]
+
+
+def test_requeued_groups_merge_with_new_alerts():
+    channels, coalescer = make()
+    coalescer.add(alert("o1"), "low")
+    channels.open["email"] = False
+    coalescer.flush()
+    assert channels.digests == []
+
+    coalescer.add(alert("o1"), "low")
+    channels.open["email"] = True
+    coalescer.flush()
+    assert channels.digests == [("email", [("o1", 2)])]
@@ -0,0 +1,249 @@
+import asyncio
+import importlib.util
+import json
+import socketserver
+import threading
+import urllib.request
+from email.message import EmailMessage
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# notifier-dispatcher.py is deployed as notifier/dispatcher.py: load it by path
+_spec = importlib.util.spec_from_file_location(
+    "notifier_dispatcher", Path(__file__).resolve().parents[1] / "notifier-dispatcher.py")
+dispatcher_mod = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(dispatcher_mod)
+
+DeadLetterStore = dispatcher_mod.DeadLetterStore
+NotificationDispatcher = dispatcher_mod.NotificationDispatcher
+PersistentSMTP = dispatcher_mod.PersistentSMTP
+
+
+# ---------- Local SMTP stand-in ----------
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self._reply("220 localhost stand-in")
+        in_data, lines = False, []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            if in_data:
+                if line == ".":
+                    in_data = False
+                    server.messages.append("\n".join(lines))
+                    self._reply("250 OK queued")
+                    if server.drop_after_each:
+                        return
+                else:
+                    lines.append(line[1:] if line.startswith("..") else line)
+                continue
+            verb = line.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self._reply("250-localhost\r\n250 8BITMIME")
+            elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "DATA":
+                in_data, lines = True, []
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Not implemented")
+
+    def _reply(self, text):
+        self.wfile.write((text + "\r\n").encode())
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.drop_after_each = False
+
+
+@pytest.fixture
+def smtp_server():
+    server = _SMTPServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# ---------- Local HTTP stand-in (SMS/webhook provider) ----------
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _HTTPHandler)
+        self.fail_first = 0
+        self.requests = []
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests.append(json.loads(body))
+        failing = len(self.server.requests) <= self.server.fail_first
+        self.send_response(503 if failing else 200)
+        self.end_headers()
+
+
+@pytest.fixture
+def http_server():
+    server = _HTTPServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def http_sender(server):
+    url = f"http://127.0.0.1:{server.server_address[1]}/messages"
+
+    def send(body, to_number):
+        req = urllib.request.Request(
+            url, data=json.dumps({"to": to_number, "body": body}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        urllib.request.urlopen(req, timeout=5).close()   # HTTPError (5xx) -> retry
+    return send
+
+
+def email(subject):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = "alerts@example.com"
+    msg["To"] = "ops@example.com"
+    msg.set_content("body")
+    return msg
+
+
+def make_dispatcher(tmp_path, **kwargs):
+    kwargs.setdefault("backoff", 0.01)
+    kwargs.setdefault("max_backoff", 0.05)
+    return NotificationDispatcher(dead_letters=DeadLetterStore(str(tmp_path / "dead.jsonl")), **kwargs)
+
+
+def dead_rows(tmp_path):
+    path = tmp_path / "dead.jsonl"
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+# ---------- SMTP ----------
+
+def test_smtp_session_is_reused_across_sends(smtp_server, tmp_path):
+    smtp = PersistentSMTP("127.0.0.1", smtp_server.server_address[1], starttls=False)
+
+    async def run():
+        d = make_dispatcher(tmp_path, workers=2)
+        d.register("email", lambda subject: smtp.send_message(email(subject)))
+        for i in range(5):
+            assert d.submit("email", f"alerta {i}")
+        await d.stop()
+        return d.stats
+
+    stats = asyncio.run(run())
+    smtp.close()
+    assert stats["sent"] == 5
+    assert len(smtp_server.messages) == 5
+    assert smtp_server.connections == 1
+
+
+def test_smtp_reconnects_when_server_drops_idle_session(smtp_server):
+    smtp_server.drop_after_each = True
+    smtp = PersistentSMTP("127.0.0.1", smtp_server.server_address[1], starttls=False)
+    smtp.send_message(email("uno"))
+    smtp.send_message(email("dos"))
+    smtp.close()
+    assert len(smtp_server.messages) == 2
+    assert smtp_server.connections == 2
+
+
+# ---------- Retries and dead letters ----------
+
+def test_failed_http_sends_are_retried_with_backoff(http_server, tmp_path):
+    http_server.fail_first = 2
+
+    async def run():
+        d = make_dispatcher(tmp_path, workers=1, max_attempts=5)
+        d.register("sms", http_sender(http_server))
+        d.submit("sms", "alerta", "+5491100000000")
+        for _ in range(200):
+            if d.stats["sent"]:
+                break
+            await asyncio.sleep(0.01)
+        await d.stop()
+        return d.stats
+
+    stats = asyncio.run(run())
+    assert stats["sent"] == 1
+    assert stats["retried"] == 2
+    assert len(http_server.requests) == 3
+    assert dead_rows(tmp_path) == []
+
+
+def test_backoff_grows_exponentially_and_is_capped(tmp_path):
+    d = make_dispatcher(tmp_path, backoff=1.0, max_backoff=4.0)
+    assert 0.5 <= d._delay(1) <= 1.0
+    assert 1.0 <= d._delay(2) <= 2.0
+    assert 2.0 <= d._delay(3) <= 4.0
+    assert 2.0 <= d._delay(10) <= 4.0
+
+
+def test_exhausted_jobs_land_in_dead_letter_store(http_server, tmp_path):
+    http_server.fail_first = 100
+
+    async def run():
+        d = make_dispatcher(tmp_path, workers=1, max_attempts=3)
+        d.register("sms", http_sender(http_server))
+        d.submit("sms", "alerta", "+5491100000000")
+        for _ in range(200):
+            if d.stats["dead"]:
+                break
+            await asyncio.sleep(0.01)
+        await d.stop()
+        return d.stats
+
+    stats = asyncio.run(run())
+    assert stats["dead"] == 1
+    assert len(http_server.requests) == 3
+    [row] = dead_rows(tmp_path)
+    assert row["reason"] == "max_attempts"
+    assert row["channel"] == "sms"
+    assert row["attempts"] == 3
+    assert "HTTPError" in row["last_error"]
+
+
+def test_full_queue_goes_to_dead_letters_without_blocking(tmp_path):
+    release = threading.Event()
+
+    async def run():
+        d = make_dispatcher(tmp_path, workers=1, maxsize=1)
+        d.register("email", lambda subject: release.wait(5))
+        results = [d.submit("email", f"alerta {i}") for i in range(3)]
+        release.set()
+        await d.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert results.count(False) >= 1
+    assert {row["reason"] for row in dead_rows(tmp_path)} == {"queue_full"}
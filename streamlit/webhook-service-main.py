@@ -1,11 +1,13 @@
 # webhook-service/main.py
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from datetime import datetime
 import os
 import asyncio
 from supabase import create_client
-from notifier.notifier import notify_bypass_if_needed
+from notifier.batcher import WriteBehindBatcher, supabase_insert
+from notifier.notifier import close_notifier, configure_audit_log, dispatcher, notify_bypass_if_needed, start_notifier
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
@@ -17,6 +19,22 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 
 sb = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# bypass_alerts rows are buffered and written with multi-row inserts
+alerts_batcher = WriteBehindBatcher(supabase_insert(sb, "bypass_alerts"), name="bypass_alerts")
+audit_batcher = configure_audit_log(sb)
+
+@app.on_event("startup")
+async def startup():
+    # notification workers (email/SMS off the event loop) and digest window
+    alerts_batcher.start()
+    start_notifier()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # drain queued notifications, flush buffered rows and close the SMTP session
+    await close_notifier()
+    await alerts_batcher.stop()
+
 class BypassEvent(BaseModel):
     order_id: int
     producer_id: str
@@ -28,11 +46,29 @@ class BypassEvent(BaseModel):
 async def bypass(event: BypassEvent, request: Request):
     payload = event.dict()
     payload["created_at"] = datetime.utcnow().isoformat()
-    # store in supabase table 'bypass_alerts'
-    try:
-        res = sb.table("bypass_alerts").insert(payload).execute()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # store in supabase table 'bypass_alerts' (write-behind; waits only if the buffer is full)
+    await alerts_batcher.add(payload)
     # async notify (don't block the webhook)
     asyncio.create_task(notify_bypass_if_needed(payload, sb))
-    return {"status": "received", "id": res.data if hasattr(res, "data") else res}
+    return {"status": "received", "queued": True}
+
+@app.get("/metrics/batchers")
+async def batcher_metrics():
+    # queue depth and flush latency of the write-behind batchers
+    return {"batchers": [alerts_batcher.metrics(), audit_batcher.metrics()]}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    # Prometheus text format: notifier queue depth plus batcher buffers and flushes
+    lines = [
+        "# TYPE notifier_queue_depth gauge",
+        f"notifier_queue_depth {dispatcher.depth()}",
+        "# TYPE batcher_queue_depth gauge",
+    ]
+    batchers = [alerts_batcher.metrics(), audit_batcher.metrics()]
+    for m in batchers:
+        lines.append(f'batcher_queue_depth{{batcher="{m["name"]}"}} {m["queue_depth"]}')
+    lines.append("# TYPE batcher_rows_total counter")
+    for m in batchers:
+        lines.append(f'batcher_rows_total{{batcher="{m["name"]}"}} {m["flushed_rows"]}')
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
@@ -0,0 +1,14 @@
+-- ============================================================================
+-- 012_orders_keyset_pagination.sql
+-- Índice para paginación por cursor (keyset) de /api/v1/orders
+-- ============================================================================
+-- La API ordena por (created_at DESC, id DESC) y pide la página siguiente con:
+--   WHERE created_at < X OR (created_at = X AND id < Y)
+-- idx_orders_created_at cubre el orden principal; este índice agrega el
+-- desempate por id para que cada página sea un recorrido acotado del índice.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_orders_created_at_id
+ON orders (created_at DESC, id DESC);
+
+COMMENT ON INDEX idx_orders_created_at_id IS 'Índice para paginación keyset de pedidos en orden (created_at DESC, id DESC). Optimiza listados y exportaciones por páginas.';
@@ -0,0 +1,102 @@
+-- ============================================================================
+-- 013_admin_dashboard_metrics.sql
+-- Métricas agregadas para el dashboard de administración
+-- ============================================================================
+-- Devuelve sólo agregados (totales, comisión, neto, conteos por productor y
+-- serie diaria) para que el dashboard no tenga que descargar la tabla
+-- orders completa y recalcular todo en pandas.
+-- Montos en centavos (convertir a pesos en el cliente).
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION get_admin_dashboard_metrics(
+    start_date_param TIMESTAMPTZ DEFAULT NULL,
+    end_date_param TIMESTAMPTZ DEFAULT NULL,
+    timezone_param TEXT DEFAULT 'America/Argentina/Buenos_Aires'
+)
+RETURNS JSONB AS $$
+DECLARE
+    start_date TIMESTAMPTZ := COALESCE(start_date_param, '-infinity'::TIMESTAMPTZ);
+    end_date TIMESTAMPTZ := COALESCE(end_date_param, NOW());
+    totals JSONB;
+    per_producer JSONB;
+    daily JSONB;
+    bypass_count INTEGER := 0;
+BEGIN
+    -- Sólo admins (o el service role, que no tiene auth.uid())
+    IF auth.uid() IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM profiles WHERE id = auth.uid() AND role = 'admin'
+    ) THEN
+        RAISE EXCEPTION 'Solo administradores pueden ver las métricas globales';
+    END IF;
+
+    -- Totales del período (los cancelados no suman ingresos)
+    SELECT jsonb_build_object(
+        'orders_count', COUNT(*),
+        'active_orders_count', COUNT(*) FILTER (WHERE status != 'cancelled'),
+        'cancelled_orders_count', COUNT(*) FILTER (WHERE status = 'cancelled'),
+        'total_cents', COALESCE(SUM(total_cents) FILTER (WHERE status != 'cancelled'), 0),
+        'commission_cents', COALESCE(SUM(commission_cents) FILTER (WHERE status != 'cancelled'), 0),
+        'net_cents', COALESCE(SUM(total_cents - commission_cents) FILTER (WHERE status != 'cancelled'), 0),
+        'producers_count', COUNT(DISTINCT producer_id)
+    ) INTO totals
+    FROM public.orders
+    WHERE created_at >= start_date
+      AND created_at <= end_date;
+
+    -- Métricas por productor
+    SELECT COALESCE(jsonb_agg(row_to_json(p) ORDER BY p.total_cents DESC), '[]'::jsonb) INTO per_producer
+    FROM (
+        SELECT
+            producer_id,
+            COUNT(*) AS orders_count,
+            COALESCE(SUM(total_cents) FILTER (WHERE status != 'cancelled'), 0) AS total_cents,
+            COALESCE(SUM(commission_cents) FILTER (WHERE status != 'cancelled'), 0) AS commission_cents
+        FROM public.orders
+        WHERE created_at >= start_date
+          AND created_at <= end_date
+        GROUP BY producer_id
+    ) p;
+
+    -- Serie diaria (día calendario en la zona horaria indicada)
+    SELECT COALESCE(jsonb_agg(row_to_json(d) ORDER BY d.day), '[]'::jsonb) INTO daily
+    FROM (
+        SELECT
+            (created_at AT TIME ZONE timezone_param)::DATE AS day,
+            COUNT(*) FILTER (WHERE status != 'cancelled') AS orders_count,
+            COALESCE(SUM(total_cents) FILTER (WHERE status != 'cancelled'), 0) AS total_cents,
+            COALESCE(SUM(commission_cents) FILTER (WHERE status != 'cancelled'), 0) AS commission_cents
+        FROM public.orders
+        WHERE created_at >= start_date
+          AND created_at <= end_date
+        GROUP BY 1
+    ) d;
+
+    -- bypass_alerts la crea el servicio de webhooks: contar sólo si existe
+    IF to_regclass('public.bypass_alerts') IS NOT NULL THEN
+        EXECUTE 'SELECT COUNT(*) FROM public.bypass_alerts WHERE created_at >= $1 AND created_at <= $2'
+        INTO bypass_count
+        USING start_date, end_date;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'success', true,
+        'start_date', start_date_param,
+        'end_date', end_date,
+        'totals', totals || jsonb_build_object('bypass_alerts_count', bypass_count),
+        'per_producer', per_producer,
+        'daily', daily
+    );
+
+EXCEPTION
+    WHEN OTHERS THEN
+        RETURN jsonb_build_object(
+            'success', false,
+            'error', SQLERRM
+        );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER STABLE;
+
+COMMENT ON FUNCTION get_admin_dashboard_metrics(TIMESTAMPTZ, TIMESTAMPTZ, TEXT) IS 'Retorna métricas agregadas del marketplace para el dashboard de administración: totales, comisión, neto, métricas por productor y serie diaria en un rango de fechas.';
+
+GRANT EXECUTE ON FUNCTION get_admin_dashboard_metrics(TIMESTAMPTZ, TIMESTAMPTZ, TEXT) TO authenticated;
+GRANT EXECUTE ON FUNCTION get_admin_dashboard_metrics(TIMESTAMPTZ, TIMESTAMPTZ, TEXT) TO service_role;
@@ -0,0 +1,636 @@
+-- ============================================================================
+-- 014_order_rollups.sql
+-- Agregados incrementales de pedidos (por hora y por día, por productor)
+-- ============================================================================
+-- Los dashboards (get_producer_dashboard, get_admin_dashboard_metrics)
+-- sumaban sobre todos los pedidos en cada llamada. Ahora leen de dos tablas
+-- de agregados mantenidas por trigger sobre orders:
+--
+--   order_rollups_hourly  (producer_id, bucket)  bucket = hora UTC
+--   order_rollups_daily   (producer_id, day)     day = día local (Argentina)
+--
+-- Por cada fila se guardan dos familias de métricas:
+--   * por fecha de creación: orders_count, cancelled_count y montos de los
+--     pedidos no cancelados (subtotal, comisión, total)
+--   * por fecha de pago: paid_orders_count, paid_subtotal_cents y
+--     paid_commission_cents de pedidos pagados (confirmed..delivered)
+--
+-- Los pagos de Mercado Pago actualizan orders (paid_at / status), así que el
+-- mismo trigger cubre los cambios de payments.
+--
+-- Reconstrucción / backfill:
+--   SELECT rebuild_order_rollups();                 -- todo el historial
+--   SELECT rebuild_order_rollups('2024-06-01');     -- desde un día
+-- ============================================================================
+
+-- Zona horaria de los días de order_rollups_daily.
+-- Argentina no tiene horario de verano: los días son 24 horas UTC completas.
+CREATE OR REPLACE FUNCTION order_rollup_timezone()
+RETURNS TEXT AS $$
+    SELECT 'America/Argentina/Buenos_Aires'::TEXT;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- ============================================================================
+-- 1. TABLAS
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.order_rollups_hourly (
+    producer_id UUID NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+    orders_count BIGINT NOT NULL DEFAULT 0,
+    cancelled_count BIGINT NOT NULL DEFAULT 0,
+    subtotal_cents BIGINT NOT NULL DEFAULT 0,
+    commission_cents BIGINT NOT NULL DEFAULT 0,
+    total_cents BIGINT NOT NULL DEFAULT 0,
+    paid_orders_count BIGINT NOT NULL DEFAULT 0,
+    paid_subtotal_cents BIGINT NOT NULL DEFAULT 0,
+    paid_commission_cents BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (producer_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS public.order_rollups_daily (
+    producer_id UUID NOT NULL,
+    day DATE NOT NULL,
+    orders_count BIGINT NOT NULL DEFAULT 0,
+    cancelled_count BIGINT NOT NULL DEFAULT 0,
+    subtotal_cents BIGINT NOT NULL DEFAULT 0,
+    commission_cents BIGINT NOT NULL DEFAULT 0,
+    total_cents BIGINT NOT NULL DEFAULT 0,
+    paid_orders_count BIGINT NOT NULL DEFAULT 0,
+    paid_subtotal_cents BIGINT NOT NULL DEFAULT 0,
+    paid_commission_cents BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (producer_id, day)
+);
+
+-- Rangos globales (dashboard admin) sin filtrar por productor
+CREATE INDEX IF NOT EXISTS idx_order_rollups_hourly_bucket ON public.order_rollups_hourly (bucket);
+CREATE INDEX IF NOT EXISTS idx_order_rollups_daily_day ON public.order_rollups_daily (day);
+
+COMMENT ON TABLE public.order_rollups_hourly IS 'Agregados de pedidos por productor y hora (UTC). Mantenida por trigger_maintain_order_rollups.';
+COMMENT ON TABLE public.order_rollups_daily IS 'Agregados de pedidos por productor y día local (order_rollup_timezone). Mantenida por trigger_maintain_order_rollups.';
+
+ALTER TABLE public.order_rollups_hourly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.order_rollups_daily ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "productores_view_own_rollups_hourly" ON public.order_rollups_hourly;
+CREATE POLICY "productores_view_own_rollups_hourly"
+    ON public.order_rollups_hourly FOR SELECT
+    USING (auth.uid() = producer_id OR is_admin());
+
+DROP POLICY IF EXISTS "productores_view_own_rollups_daily" ON public.order_rollups_daily;
+CREATE POLICY "productores_view_own_rollups_daily"
+    ON public.order_rollups_daily FOR SELECT
+    USING (auth.uid() = producer_id OR is_admin());
+
+-- ============================================================================
+-- 2. MANTENIMIENTO INCREMENTAL
+-- ============================================================================
+
+-- Suma un delta a la hora y al día que contienen bucket_ts_param
+CREATE OR REPLACE FUNCTION apply_order_rollup_delta(
+    producer_id_param UUID,
+    bucket_ts_param TIMESTAMPTZ,
+    orders_delta BIGINT,
+    cancelled_delta BIGINT,
+    subtotal_delta BIGINT,
+    commission_delta BIGINT,
+    total_delta BIGINT,
+    paid_orders_delta BIGINT,
+    paid_subtotal_delta BIGINT,
+    paid_commission_delta BIGINT
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO public.order_rollups_hourly AS r (
+        producer_id, bucket, orders_count, cancelled_count,
+        subtotal_cents, commission_cents, total_cents,
+        paid_orders_count, paid_subtotal_cents, paid_commission_cents
+    )
+    VALUES (
+        producer_id_param, date_trunc('hour', bucket_ts_param), orders_delta, cancelled_delta,
+        subtotal_delta, commission_delta, total_delta,
+        paid_orders_delta, paid_subtotal_delta, paid_commission_delta
+    )
+    ON CONFLICT (producer_id, bucket) DO UPDATE SET
+        orders_count = r.orders_count + EXCLUDED.orders_count,
+        cancelled_count = r.cancelled_count + EXCLUDED.cancelled_count,
+        subtotal_cents = r.subtotal_cents + EXCLUDED.subtotal_cents,
+        commission_cents = r.commission_cents + EXCLUDED.commission_cents,
+        total_cents = r.total_cents + EXCLUDED.total_cents,
+        paid_orders_count = r.paid_orders_count + EXCLUDED.paid_orders_count,
+        paid_subtotal_cents = r.paid_subtotal_cents + EXCLUDED.paid_subtotal_cents,
+        paid_commission_cents = r.paid_commission_cents + EXCLUDED.paid_commission_cents,
+        updated_at = NOW();
+
+    INSERT INTO public.order_rollups_daily AS r (
+        producer_id, day, orders_count, cancelled_count,
+        subtotal_cents, commission_cents, total_cents,
+        paid_orders_count, paid_subtotal_cents, paid_commission_cents
+    )
+    VALUES (
+        producer_id_param, (bucket_ts_param AT TIME ZONE order_rollup_timezone())::DATE, orders_delta, cancelled_delta,
+        subtotal_delta, commission_delta, total_delta,
+        paid_orders_delta, paid_subtotal_delta, paid_commission_delta
+    )
+    ON CONFLICT (producer_id, day) DO UPDATE SET
+        orders_count = r.orders_count + EXCLUDED.orders_count,
+        cancelled_count = r.cancelled_count + EXCLUDED.cancelled_count,
+        subtotal_cents = r.subtotal_cents + EXCLUDED.subtotal_cents,
+        commission_cents = r.commission_cents + EXCLUDED.commission_cents,
+        total_cents = r.total_cents + EXCLUDED.total_cents,
+        paid_orders_count = r.paid_orders_count + EXCLUDED.paid_orders_count,
+        paid_subtotal_cents = r.paid_subtotal_cents + EXCLUDED.paid_subtotal_cents,
+        paid_commission_cents = r.paid_commission_cents + EXCLUDED.paid_commission_cents,
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Aporte de un pedido a los agregados (sign_param = 1 suma, -1 resta)
+CREATE OR REPLACE FUNCTION apply_order_rollup(order_param public.orders, sign_param INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    is_cancelled BOOLEAN := order_param.status = 'cancelled';
+BEGIN
+    IF order_param.created_at IS NOT NULL THEN
+        PERFORM apply_order_rollup_delta(
+            order_param.producer_id,
+            order_param.created_at,
+            sign_param,
+            CASE WHEN is_cancelled THEN sign_param ELSE 0 END,
+            CASE WHEN is_cancelled THEN 0 ELSE sign_param * order_param.subtotal_cents END,
+            CASE WHEN is_cancelled THEN 0 ELSE sign_param * order_param.commission_cents END,
+            CASE WHEN is_cancelled THEN 0 ELSE sign_param * order_param.total_cents END,
+            0, 0, 0
+        );
+    END IF;
+
+    IF order_param.paid_at IS NOT NULL
+       AND order_param.status IN ('confirmed', 'preparing', 'ready', 'delivered') THEN
+        PERFORM apply_order_rollup_delta(
+            order_param.producer_id,
+            order_param.paid_at,
+            0, 0, 0, 0, 0,
+            sign_param,
+            sign_param * order_param.subtotal_cents,
+            sign_param * order_param.commission_cents
+        );
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION maintain_order_rollups()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Cambios que no afectan a los agregados (dirección, pickup_time, etc.)
+    IF TG_OP = 'UPDATE' AND (
+        OLD.producer_id, OLD.status, OLD.created_at, OLD.paid_at,
+        OLD.subtotal_cents, OLD.commission_cents, OLD.total_cents
+    ) IS NOT DISTINCT FROM (
+        NEW.producer_id, NEW.status, NEW.created_at, NEW.paid_at,
+        NEW.subtotal_cents, NEW.commission_cents, NEW.total_cents
+    ) THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_order_rollup(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_order_rollup(NEW, 1);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS trigger_maintain_order_rollups ON public.orders;
+CREATE TRIGGER trigger_maintain_order_rollups
+    AFTER INSERT OR UPDATE OR DELETE ON public.orders
+    FOR EACH ROW
+    EXECUTE FUNCTION maintain_order_rollups();
+
+COMMENT ON FUNCTION maintain_order_rollups() IS 'Trigger que mantiene order_rollups_hourly y order_rollups_daily aplicando el delta de cada INSERT/UPDATE/DELETE en orders.';
+
+-- ============================================================================
+-- 3. BACKFILL / RECONSTRUCCIÓN
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION rebuild_order_rollups(since_param TIMESTAMPTZ DEFAULT NULL)
+RETURNS JSONB AS $$
+DECLARE
+    tz TEXT := order_rollup_timezone();
+    since_day DATE;
+    since_ts TIMESTAMPTZ := '-infinity';
+    hourly_rows INTEGER;
+    daily_rows INTEGER;
+BEGIN
+    -- Se reconstruyen días locales completos a partir de since_param
+    IF since_param IS NOT NULL THEN
+        since_day := (since_param AT TIME ZONE tz)::DATE;
+        since_ts := since_day::TIMESTAMP AT TIME ZONE tz;
+    END IF;
+
+    -- Bloquea los triggers concurrentes hasta terminar: los pedidos que se
+    -- confirmen después aplican su delta sobre la reconstrucción.
+    LOCK TABLE public.order_rollups_hourly, public.order_rollups_daily IN EXCLUSIVE MODE;
+
+    DELETE FROM public.order_rollups_hourly WHERE bucket >= since_ts;
+    DELETE FROM public.order_rollups_daily WHERE since_day IS NULL OR day >= since_day;
+
+    INSERT INTO public.order_rollups_hourly (
+        producer_id, bucket, orders_count, cancelled_count,
+        subtotal_cents, commission_cents, total_cents,
+        paid_orders_count, paid_subtotal_cents, paid_commission_cents
+    )
+    SELECT
+        producer_id,
+        date_trunc('hour', ts),
+        SUM(orders_count), SUM(cancelled_count),
+        SUM(subtotal_cents), SUM(commission_cents), SUM(total_cents),
+        SUM(paid_orders_count), SUM(paid_subtotal_cents), SUM(paid_commission_cents)
+    FROM (
+        SELECT
+            producer_id,
+            created_at AS ts,
+            1 AS orders_count,
+            (status = 'cancelled')::INT AS cancelled_count,
+            CASE WHEN status = 'cancelled' THEN 0 ELSE subtotal_cents END AS subtotal_cents,
+            CASE WHEN status = 'cancelled' THEN 0 ELSE commission_cents END AS commission_cents,
+            CASE WHEN status = 'cancelled' THEN 0 ELSE total_cents END AS total_cents,
+            0 AS paid_orders_count,
+            0 AS paid_subtotal_cents,
+            0 AS paid_commission_cents
+        FROM public.orders
+        WHERE created_at >= since_ts
+        UNION ALL
+        SELECT
+            producer_id, paid_at, 0, 0, 0, 0, 0,
+            1, subtotal_cents, commission_cents
+        FROM public.orders
+        WHERE paid_at >= since_ts
+          AND status IN ('confirmed', 'preparing', 'ready', 'delivered')
+    ) contributions
+    GROUP BY 1, 2;
+    GET DIAGNOSTICS hourly_rows = ROW_COUNT;
+
+    -- Los días se derivan de las horas (la zona horaria tiene offset entero)
+    INSERT INTO public.order_rollups_daily (
+        producer_id, day, orders_count, cancelled_count,
+        subtotal_cents, commission_cents, total_cents,
+        paid_orders_count, paid_subtotal_cents, paid_commission_cents
+    )
+    SELECT
+        producer_id,
+        (bucket AT TIME ZONE tz)::DATE,
+        SUM(orders_count), SUM(cancelled_count),
+        SUM(subtotal_cents), SUM(commission_cents), SUM(total_cents),
+        SUM(paid_orders_count), SUM(paid_subtotal_cents), SUM(paid_commission_cents)
+    FROM public.order_rollups_hourly
+    WHERE bucket >= since_ts
+    GROUP BY 1, 2;
+    GET DIAGNOSTICS daily_rows = ROW_COUNT;
+
+    RETURN jsonb_build_object(
+        'success', true,
+        'since', since_day,
+        'hourly_rows', hourly_rows,
+        'daily_rows', daily_rows
+    );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+COMMENT ON FUNCTION rebuild_order_rollups(TIMESTAMPTZ) IS 'Reconstruye los agregados de pedidos desde since_param (días locales completos) o todo el historial si es NULL. Usar para el backfill inicial o para reparar desvíos.';
+
+-- ============================================================================
+-- 4. LECTURA POR RANGO
+-- ============================================================================
+
+-- Agregados de [start_param, end_param) con granularidad de hora: los días
+-- completos salen de order_rollups_daily y los bordes de order_rollups_hourly.
+-- Costo O(días + horas de borde) en lugar de O(pedidos).
+CREATE OR REPLACE FUNCTION order_rollups_between(
+    start_param TIMESTAMPTZ DEFAULT NULL,
+    end_param TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS TABLE (
+    producer_id UUID,
+    day DATE,
+    orders_count BIGINT,
+    cancelled_count BIGINT,
+    subtotal_cents BIGINT,
+    commission_cents BIGINT,
+    total_cents BIGINT,
+    paid_orders_count BIGINT,
+    paid_subtotal_cents BIGINT,
+    paid_commission_cents BIGINT
+) AS $$
+DECLARE
+    tz TEXT := order_rollup_timezone();
+    range_end TIMESTAMPTZ := COALESCE(end_param, NOW());
+    first_day DATE;
+    last_day DATE;
+    full_from TIMESTAMPTZ := '-infinity';
+    full_to TIMESTAMPTZ;
+BEGIN
+    -- Primer y último día local completamente dentro del rango
+    IF start_param IS NOT NULL THEN
+        first_day := (start_param AT TIME ZONE tz)::DATE;
+        IF (first_day::TIMESTAMP AT TIME ZONE tz) < start_param THEN
+            first_day := first_day + 1;
+        END IF;
+        full_from := first_day::TIMESTAMP AT TIME ZONE tz;
+    END IF;
+    last_day := (range_end AT TIME ZONE tz)::DATE - 1;
+    full_to := (last_day + 1)::TIMESTAMP AT TIME ZONE tz;
+
+    IF first_day IS NOT NULL AND first_day > last_day THEN
+        -- Rango menor a un día: sólo horas
+        full_from := NULL;
+        full_to := NULL;
+    END IF;
+
+    RETURN QUERY
+    SELECT
+        d.producer_id, d.day, d.orders_count, d.cancelled_count,
+        d.subtotal_cents, d.commission_cents, d.total_cents,
+        d.paid_orders_count, d.paid_subtotal_cents, d.paid_commission_cents
+    FROM public.order_rollups_daily d
+    WHERE full_to IS NOT NULL
+      AND (first_day IS NULL OR d.day >= first_day)
+      AND d.day <= last_day
+    UNION ALL
+    SELECT
+        h.producer_id, (h.bucket AT TIME ZONE tz)::DATE, h.orders_count, h.cancelled_count,
+        h.subtotal_cents, h.commission_cents, h.total_cents,
+        h.paid_orders_count, h.paid_subtotal_cents, h.paid_commission_cents
+    FROM public.order_rollups_hourly h
+    WHERE h.bucket >= COALESCE(date_trunc('hour', start_param), '-infinity'::TIMESTAMPTZ)
+      AND h.bucket < range_end
+      AND (full_to IS NULL OR h.bucket < full_from OR h.bucket >= full_to);
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON FUNCTION order_rollups_between(TIMESTAMPTZ, TIMESTAMPTZ) IS 'Agregados de pedidos por productor y día local en un rango, combinando días completos (order_rollups_daily) y horas de borde (order_rollups_hourly).';
+
+-- ============================================================================
+-- 5. DASHBOARDS SOBRE LOS AGREGADOS
+-- ============================================================================
+
+-- La serie diaria usa los días locales de los agregados: se reemplaza la
+-- firma con timezone_param de 013.
+DROP FUNCTION IF EXISTS get_admin_dashboard_metrics(TIMESTAMPTZ, TIMESTAMPTZ, TEXT);
+
+CREATE OR REPLACE FUNCTION get_admin_dashboard_metrics(
+    start_date_param TIMESTAMPTZ DEFAULT NULL,
+    end_date_param TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+    end_date TIMESTAMPTZ := COALESCE(end_date_param, NOW());
+    totals JSONB;
+    per_producer JSONB;
+    daily JSONB;
+    bypass_count INTEGER := 0;
+BEGIN
+    -- Sólo admins (o el service role, que no tiene auth.uid())
+    IF auth.uid() IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM profiles WHERE id = auth.uid() AND role = 'admin'
+    ) THEN
+        RAISE EXCEPTION 'Solo administradores pueden ver las métricas globales';
+    END IF;
+
+    -- Totales del período (los cancelados no suman ingresos); cada lectura
+    -- de order_rollups_between es O(días del rango)
+    SELECT jsonb_build_object(
+        'orders_count', COALESCE(SUM(orders_count), 0),
+        'active_orders_count', COALESCE(SUM(orders_count - cancelled_count), 0),
+        'cancelled_orders_count', COALESCE(SUM(cancelled_count), 0),
+        'total_cents', COALESCE(SUM(total_cents), 0),
+        'commission_cents', COALESCE(SUM(commission_cents), 0),
+        'net_cents', COALESCE(SUM(total_cents - commission_cents), 0),
+        'producers_count', COUNT(DISTINCT producer_id) FILTER (WHERE orders_count > 0)
+    ) INTO totals
+    FROM order_rollups_between(start_date_param, end_date);
+
+    -- Métricas por productor
+    SELECT COALESCE(jsonb_agg(row_to_json(p) ORDER BY p.total_cents DESC), '[]'::jsonb) INTO per_producer
+    FROM (
+        SELECT
+            producer_id,
+            SUM(orders_count) AS orders_count,
+            SUM(total_cents) AS total_cents,
+            SUM(commission_cents) AS commission_cents
+        FROM order_rollups_between(start_date_param, end_date)
+        GROUP BY producer_id
+        HAVING SUM(orders_count) > 0
+    ) p;
+
+    -- Serie diaria (día local)
+    SELECT COALESCE(jsonb_agg(row_to_json(d) ORDER BY d.day), '[]'::jsonb) INTO daily
+    FROM (
+        SELECT
+            day,
+            SUM(orders_count - cancelled_count) AS orders_count,
+            SUM(total_cents) AS total_cents,
+            SUM(commission_cents) AS commission_cents
+        FROM order_rollups_between(start_date_param, end_date)
+        GROUP BY day
+        HAVING SUM(orders_count) > 0
+    ) d;
+
+    -- bypass_alerts la crea el servicio de webhooks: contar sólo si existe
+    IF to_regclass('public.bypass_alerts') IS NOT NULL THEN
+        EXECUTE 'SELECT COUNT(*) FROM public.bypass_alerts WHERE created_at >= $1 AND created_at <= $2'
+        INTO bypass_count
+        USING COALESCE(start_date_param, '-infinity'::TIMESTAMPTZ), end_date;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'success', true,
+        'start_date', start_date_param,
+        'end_date', end_date,
+        'totals', totals || jsonb_build_object('bypass_alerts_count', bypass_count),
+        'per_producer', per_producer,
+        'daily', daily
+    );
+
+EXCEPTION
+    WHEN OTHERS THEN
+        RETURN jsonb_build_object(
+            'success', false,
+            'error', SQLERRM
+        );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER STABLE;
+
+COMMENT ON FUNCTION get_admin_dashboard_metrics(TIMESTAMPTZ, TIMESTAMPTZ) IS 'Retorna métricas agregadas del marketplace para el dashboard de administración: totales, comisión, neto, métricas por productor y serie diaria en un rango de fechas (leídas de order_rollups_*).';
+
+-- Dashboard de productores: mismas métricas que en 004, pero pedidos e
+-- ingresos de hoy/semana salen de order_rollups_daily.
+CREATE OR REPLACE FUNCTION get_producer_dashboard(
+    producer_id_param UUID DEFAULT auth.uid(),
+    date_range_param TEXT DEFAULT 'today'
+)
+RETURNS JSONB AS $$
+DECLARE
+    tz TEXT := order_rollup_timezone();
+    today DATE := (NOW() AT TIME ZONE tz)::DATE;
+    week_start DATE := date_trunc('week', today)::DATE;
+    start_date TIMESTAMPTZ;
+    end_date TIMESTAMPTZ;
+    orders_today INTEGER;
+    orders_week INTEGER;
+    revenue_today_cents INTEGER;
+    revenue_week_cents INTEGER;
+    net_revenue_today_cents INTEGER;
+    net_revenue_week_cents INTEGER;
+    avg_rating DECIMAL;
+    total_orders INTEGER;
+    top_dishes JSONB;
+    recent_orders JSONB;
+    result JSONB;
+BEGIN
+    -- Validar que el usuario es el productor
+    IF producer_id_param != auth.uid() THEN
+        IF NOT EXISTS (SELECT 1 FROM profiles WHERE id = auth.uid() AND role = 'admin') THEN
+            RAISE EXCEPTION 'Solo puedes ver tu propio dashboard';
+        END IF;
+    END IF;
+
+    -- Calcular fechas según date_range (días locales)
+    CASE date_range_param
+        WHEN 'week' THEN
+            start_date := week_start::TIMESTAMP AT TIME ZONE tz;
+        WHEN 'month' THEN
+            start_date := date_trunc('month', today)::TIMESTAMP AT TIME ZONE tz;
+        ELSE
+            start_date := today::TIMESTAMP AT TIME ZONE tz;
+    END CASE;
+    end_date := NOW();
+
+    -- Pedidos e ingresos de hoy y de la semana (O(días) sobre los agregados)
+    SELECT
+        COALESCE(SUM(orders_count) FILTER (WHERE day = today), 0),
+        COALESCE(SUM(orders_count), 0),
+        COALESCE(SUM(paid_subtotal_cents) FILTER (WHERE day = today), 0),
+        COALESCE(SUM(paid_subtotal_cents), 0),
+        COALESCE(SUM(paid_subtotal_cents - paid_commission_cents) FILTER (WHERE day = today), 0),
+        COALESCE(SUM(paid_subtotal_cents - paid_commission_cents), 0)
+    INTO
+        orders_today, orders_week,
+        revenue_today_cents, revenue_week_cents,
+        net_revenue_today_cents, net_revenue_week_cents
+    FROM public.order_rollups_daily
+    WHERE producer_id = producer_id_param
+      AND day >= week_start
+      AND day <= today;
+
+    -- Rating promedio
+    SELECT rating INTO avg_rating
+    FROM public.producers
+    WHERE id = producer_id_param;
+
+    -- Total de pedidos
+    SELECT total_orders INTO total_orders
+    FROM public.producers
+    WHERE id = producer_id_param;
+
+    -- Top 5 platos más vendidos
+    SELECT jsonb_agg(
+        jsonb_build_object(
+            'dish_id', dish_id,
+            'dish_name', dish_name,
+            'total_quantity', total_quantity,
+            'revenue_cents', revenue_cents
+        ) ORDER BY total_quantity DESC
+    ) INTO top_dishes
+    FROM (
+        SELECT
+            d.id AS dish_id,
+            d.name AS dish_name,
+            SUM(oi.quantity) AS total_quantity,
+            SUM(oi.quantity * oi.price_cents) AS revenue_cents
+        FROM order_items oi
+        INNER JOIN dishes d ON oi.dish_id = d.id
+        INNER JOIN orders o ON oi.order_id = o.id
+        WHERE o.producer_id = producer_id_param
+          AND o.paid_at >= start_date
+          AND o.paid_at <= end_date
+          AND o.status IN ('confirmed', 'preparing', 'ready', 'delivered')
+        GROUP BY d.id, d.name
+        ORDER BY total_quantity DESC
+        LIMIT 5
+    ) top_dishes_subquery;
+
+    -- Pedidos recientes (últimos 10)
+    SELECT jsonb_agg(
+        jsonb_build_object(
+            'id', id,
+            'client_id', client_id,
+            'status', status,
+            'total_cents', total_cents,
+            'created_at', created_at,
+            'paid_at', paid_at
+        ) ORDER BY created_at DESC
+    ) INTO recent_orders
+    FROM (
+        SELECT
+            id,
+            client_id,
+            status,
+            total_cents,
+            created_at,
+            paid_at
+        FROM public.orders
+        WHERE producer_id = producer_id_param
+        ORDER BY created_at DESC
+        LIMIT 10
+    ) recent_orders_subquery;
+
+    -- Construir respuesta
+    result := jsonb_build_object(
+        'success', true,
+        'producer_id', producer_id_param,
+        'date_range', date_range_param,
+        'stats', jsonb_build_object(
+            'orders_today', orders_today,
+            'orders_week', orders_week,
+            'total_orders', total_orders,
+            'revenue_today_cents', revenue_today_cents,
+            'revenue_week_cents', revenue_week_cents,
+            'net_revenue_today_cents', net_revenue_today_cents,
+            'net_revenue_week_cents', net_revenue_week_cents,
+            'avg_rating', avg_rating
+        ),
+        'top_dishes', COALESCE(top_dishes, '[]'::jsonb),
+        'recent_orders', COALESCE(recent_orders, '[]'::jsonb)
+    );
+
+    RETURN result;
+
+EXCEPTION
+    WHEN OTHERS THEN
+        RETURN jsonb_build_object(
+            'success', false,
+            'error', SQLERRM
+        );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- ============================================================================
+-- 6. GRANTS
+-- ============================================================================
+
+GRANT SELECT ON public.order_rollups_hourly TO authenticated;
+GRANT SELECT ON public.order_rollups_daily TO authenticated;
+GRANT EXECUTE ON FUNCTION get_admin_dashboard_metrics(TIMESTAMPTZ, TIMESTAMPTZ) TO authenticated;
+GRANT EXECUTE ON FUNCTION get_admin_dashboard_metrics(TIMESTAMPTZ, TIMESTAMPTZ) TO service_role;
+
+-- Sólo el service role reconstruye
+REVOKE EXECUTE ON FUNCTION rebuild_order_rollups(TIMESTAMPTZ) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION rebuild_order_rollups(TIMESTAMPTZ) TO service_role;
+
+-- Backfill inicial
+SELECT rebuild_order_rollups();
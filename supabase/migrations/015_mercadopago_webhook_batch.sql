@@ -0,0 +1,37 @@
+-- ============================================================================
+-- 015_mercadopago_webhook_batch.sql
+-- Aplicación de webhooks de Mercado Pago en lote
+-- ============================================================================
+-- El backend encola los webhooks localmente y los aplica en micro-lotes:
+-- una llamada RPC por lote en lugar de una por evento. Cada pago se procesa
+-- con process_mercadopago_webhook (que tiene su propio bloque EXCEPTION, así
+-- que un pago inválido no aborta el resto del lote).
+-- Devuelve un array con el resultado de cada pago, en el mismo orden.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION process_mercadopago_webhooks(
+    payments_data JSONB
+)
+RETURNS JSONB AS $$
+DECLARE
+    payment_item JSONB;
+    results JSONB := '[]'::jsonb;
+BEGIN
+    IF jsonb_typeof(payments_data) != 'array' THEN
+        RAISE EXCEPTION 'payments_data debe ser un array de pagos';
+    END IF;
+
+    FOR payment_item IN SELECT value FROM jsonb_array_elements(payments_data) WITH ORDINALITY ORDER BY ordinality
+    LOOP
+        results := results || jsonb_build_array(process_mercadopago_webhook(payment_item));
+    END LOOP;
+
+    RETURN results;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+COMMENT ON FUNCTION process_mercadopago_webhooks(JSONB) IS 'Procesa un lote de pagos de Mercado Pago (array JSONB) con process_mercadopago_webhook y devuelve el resultado de cada uno en el mismo orden.';
+
+-- Solo service role puede procesar webhooks de Mercado Pago
+REVOKE EXECUTE ON FUNCTION process_mercadopago_webhooks(JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION process_mercadopago_webhooks(JSONB) TO service_role;
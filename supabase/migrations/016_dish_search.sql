@@ -0,0 +1,107 @@
+-- ============================================================================
+-- 016_dish_search.sql
+-- Búsqueda difusa de platos (trigramas, sin acentos, con ranking)
+-- ============================================================================
+-- pg_trgm ya se habilita en 005. Se agrega unaccent y una columna generada
+-- con nombre + categoría + descripción normalizados (minúsculas, sin
+-- acentos), indexada con GIN gin_trgm_ops. search_dishes busca por
+-- similitud de palabras (operador <%, que usa el índice) y ordena dando más
+-- peso al nombre y a los nombres que empiezan con el texto buscado.
+-- ============================================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() es STABLE; las columnas generadas e índices necesitan IMMUTABLE
+CREATE OR REPLACE FUNCTION immutable_unaccent(value TEXT)
+RETURNS TEXT AS $$
+    SELECT unaccent('unaccent'::regdictionary, value)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+SET search_path = public, extensions;
+
+COMMENT ON FUNCTION immutable_unaccent(TEXT) IS 'unaccent con diccionario fijo, marcada IMMUTABLE para usarla en columnas generadas e índices.';
+
+ALTER TABLE public.dishes
+    ADD COLUMN IF NOT EXISTS search_name TEXT
+    GENERATED ALWAYS AS (lower(immutable_unaccent(name))) STORED;
+
+ALTER TABLE public.dishes
+    ADD COLUMN IF NOT EXISTS search_text TEXT
+    GENERATED ALWAYS AS (
+        lower(immutable_unaccent(
+            name || ' ' || COALESCE(category, '') || ' ' || COALESCE(description, '')
+        ))
+    ) STORED;
+
+COMMENT ON COLUMN public.dishes.search_text IS 'Nombre, categoría y descripción en minúsculas y sin acentos. Indexada con trigramas para search_dishes.';
+
+CREATE INDEX IF NOT EXISTS idx_dishes_search_text_trgm
+ON dishes USING gin (search_text gin_trgm_ops)
+WHERE is_available = true;
+
+COMMENT ON INDEX idx_dishes_search_text_trgm IS 'Índice GIN con trigramas para la búsqueda difusa de platos disponibles (search_dishes).';
+
+-- Autocompletado incremental: platos modificados desde un watermark
+CREATE INDEX IF NOT EXISTS idx_dishes_updated_at
+ON dishes (updated_at);
+
+COMMENT ON INDEX idx_dishes_updated_at IS 'Índice para leer los platos modificados desde un watermark (índice de autocompletado en la API).';
+
+-- ----------------------------------------------------------------------------
+-- search_dishes - Búsqueda con ranking
+-- ----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION search_dishes(
+    query_param TEXT,
+    limit_param INTEGER DEFAULT 20,
+    offset_param INTEGER DEFAULT 0,
+    category_param TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    producer_id UUID,
+    business_name TEXT,
+    name TEXT,
+    description TEXT,
+    category TEXT,
+    price_cents INTEGER,
+    image_url TEXT,
+    rank REAL
+) AS $$
+DECLARE
+    q TEXT := lower(immutable_unaccent(btrim(query_param)));
+BEGIN
+    IF q IS NULL OR q = '' THEN
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT
+        d.id,
+        d.producer_id,
+        p.business_name,
+        d.name,
+        d.description,
+        d.category,
+        d.price_cents,
+        d.image_url,
+        (
+            2 * word_similarity(q, d.search_name)
+            + word_similarity(q, d.search_text)
+            + CASE WHEN starts_with(d.search_name, q) THEN 1 ELSE 0 END
+        )::REAL
+    FROM public.dishes d
+    JOIN public.producers p ON p.id = d.producer_id
+    WHERE d.is_available = true
+      AND p.is_active = true
+      AND q <% d.search_text
+      AND (category_param IS NULL OR d.category = category_param)
+    ORDER BY 9 DESC, d.name
+    LIMIT LEAST(GREATEST(limit_param, 1), 100)
+    OFFSET GREATEST(offset_param, 0);
+END;
+$$ LANGUAGE plpgsql STABLE
+SET pg_trgm.word_similarity_threshold = 0.3;
+
+COMMENT ON FUNCTION search_dishes(TEXT, INTEGER, INTEGER, TEXT) IS 'Búsqueda difusa de platos disponibles por nombre, categoría y descripción (sin acentos), ordenada por relevancia.';
+
+GRANT EXECUTE ON FUNCTION search_dishes(TEXT, INTEGER, INTEGER, TEXT) TO anon, authenticated, service_role;
@@ -0,0 +1,35 @@
+-- ============================================================================
+-- 017_delivery_zones_geojson.sql
+-- Polígonos de zonas de entrega para el índice en memoria de la API
+-- ============================================================================
+-- La API carga los polígonos una vez (y los recarga cada tanto) para
+-- resolver punto -> zona sin llamar a get_zone_for_point / ST_Within en
+-- cada request. PostgREST devuelve GEOMETRY como EWKB; esta función los
+-- entrega en GeoJSON, junto con el rectángulo envolvente.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION get_delivery_zones_geojson()
+RETURNS TABLE (
+    id INTEGER,
+    name TEXT,
+    polygon JSONB,
+    bbox JSONB,
+    updated_at TIMESTAMPTZ
+) AS $$
+    SELECT
+        dz.id,
+        dz.name,
+        ST_AsGeoJSON(dz.polygon)::JSONB,
+        jsonb_build_array(
+            ST_YMin(dz.polygon), ST_XMin(dz.polygon),
+            ST_YMax(dz.polygon), ST_XMax(dz.polygon)
+        ),
+        dz.updated_at
+    FROM public.delivery_zones dz
+    WHERE dz.is_active = true
+    ORDER BY dz.id;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION get_delivery_zones_geojson() IS 'Zonas de entrega activas con su polígono en GeoJSON y rectángulo envolvente [min_lat, min_lng, max_lat, max_lng]. Usada por el índice de zonas en memoria de la API.';
+
+GRANT EXECUTE ON FUNCTION get_delivery_zones_geojson() TO service_role;
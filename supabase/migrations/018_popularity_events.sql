@@ -0,0 +1,55 @@
+-- ============================================================================
+-- 018_popularity_events.sql
+-- Feed incremental de ítems pagados para el ranking de popularidad
+-- ============================================================================
+-- La API mantiene en memoria contadores con decaimiento por plato, zona y
+-- franja horaria. En lugar de recalcular sobre order_items, lee sólo los
+-- pedidos pagados después de su watermark (paid_at, order_id), en páginas
+-- de pedidos completos (todos los ítems de un pedido vienen juntos).
+--
+-- Uso:
+--   SELECT * FROM popularity_events_since(NULL, NULL, 500);          -- desde el inicio
+--   SELECT * FROM popularity_events_since('2024-06-01', '<uuid>', 500);
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_orders_paid_at_id
+ON orders (paid_at, id)
+WHERE paid_at IS NOT NULL;
+
+COMMENT ON INDEX idx_orders_paid_at_id IS 'Índice para leer pedidos pagados en orden (paid_at, id) desde un watermark. Usado por popularity_events_since.';
+
+CREATE OR REPLACE FUNCTION popularity_events_since(
+    since_paid_at_param TIMESTAMPTZ DEFAULT NULL,
+    since_order_id_param UUID DEFAULT NULL,
+    limit_param INTEGER DEFAULT 500
+)
+RETURNS TABLE (
+    order_id UUID,
+    paid_at TIMESTAMPTZ,
+    dish_id UUID,
+    quantity INTEGER,
+    zone_id INTEGER
+) AS $$
+    WITH paid AS (
+        SELECT o.id, o.paid_at, o.producer_id
+        FROM public.orders o
+        WHERE o.paid_at IS NOT NULL
+          AND o.status != 'cancelled'
+          AND (
+              since_paid_at_param IS NULL
+              OR (o.paid_at, o.id) > (since_paid_at_param, COALESCE(since_order_id_param, '00000000-0000-0000-0000-000000000000'::UUID))
+          )
+        ORDER BY o.paid_at, o.id
+        LIMIT LEAST(GREATEST(limit_param, 1), 5000)
+    )
+    SELECT paid.id, paid.paid_at, oi.dish_id, oi.quantity, p.delivery_zone_id
+    FROM paid
+    JOIN public.order_items oi ON oi.order_id = paid.id
+    JOIN public.producers p ON p.id = paid.producer_id
+    ORDER BY paid.paid_at, paid.id;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+COMMENT ON FUNCTION popularity_events_since(TIMESTAMPTZ, UUID, INTEGER) IS 'Ítems de pedidos pagados después del watermark (paid_at, order_id), con la zona del productor. Hasta limit_param pedidos completos por llamada.';
+
+REVOKE EXECUTE ON FUNCTION popularity_events_since(TIMESTAMPTZ, UUID, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION popularity_events_since(TIMESTAMPTZ, UUID, INTEGER) TO service_role;
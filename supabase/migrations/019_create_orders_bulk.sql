@@ -0,0 +1,139 @@
+-- ============================================================================
+-- 019_create_orders_bulk.sql
+-- Alta de muchos pedidos (con sus ítems) en una sola transacción
+-- ============================================================================
+-- La API valida y cotiza los carritos (una sola consulta IN a dishes,
+-- montos en centavos enteros) y envía todos los pedidos ya cotizados en
+-- una llamada. Esta función:
+--   * vuelve a validar clientes, productores y platos en forma set-based
+--     (sin un SELECT por ítem como create_order),
+--   * bloquea los platos (FOR SHARE) y verifica que el precio cotizado sea
+--     el vigente y que el subtotal cierre con los ítems,
+--   * inserta pedidos e ítems con dos INSERT ... SELECT.
+-- Si algo no valida, no se crea ningún pedido.
+--
+-- Formato de orders_param (ids de pedido generados por la API):
+--   [{"id", "client_id", "producer_id", "delivery_address", "pickup_time",
+--     "subtotal_cents", "commission_cents", "total_cents",
+--     "items": [{"dish_id", "quantity", "price_cents"}]}]
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION create_orders_bulk(orders_param JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    bad_id TEXT;
+    result JSONB;
+BEGIN
+    IF jsonb_typeof(orders_param) != 'array' OR jsonb_array_length(orders_param) = 0 THEN
+        RAISE EXCEPTION 'orders_param debe ser un array con al menos un pedido';
+    END IF;
+
+    CREATE TEMP TABLE bulk_orders ON COMMIT DROP AS
+    SELECT
+        (o->>'id')::UUID AS id,
+        (o->>'client_id')::UUID AS client_id,
+        (o->>'producer_id')::UUID AS producer_id,
+        o->>'delivery_address' AS delivery_address,
+        COALESCE((o->>'pickup_time')::TIMESTAMPTZ, NOW() + INTERVAL '2 hours') AS pickup_time,
+        (o->>'subtotal_cents')::INTEGER AS subtotal_cents,
+        (o->>'commission_cents')::INTEGER AS commission_cents,
+        (o->>'total_cents')::INTEGER AS total_cents
+    FROM jsonb_array_elements(orders_param) AS o;
+
+    CREATE TEMP TABLE bulk_items ON COMMIT DROP AS
+    SELECT
+        (o->>'id')::UUID AS order_id,
+        (o->>'producer_id')::UUID AS producer_id,
+        (i->>'dish_id')::UUID AS dish_id,
+        (i->>'quantity')::INTEGER AS quantity,
+        (i->>'price_cents')::INTEGER AS price_cents
+    FROM jsonb_array_elements(orders_param) AS o,
+         jsonb_array_elements(o->'items') AS i;
+
+    -- Clientes válidos
+    SELECT b.client_id::TEXT INTO bad_id
+    FROM bulk_orders b
+    LEFT JOIN public.profiles pf ON pf.id = b.client_id AND pf.role = 'cliente'
+    WHERE pf.id IS NULL
+    LIMIT 1;
+    IF bad_id IS NOT NULL THEN
+        RAISE EXCEPTION 'El usuario % no es un cliente válido', bad_id;
+    END IF;
+
+    -- Productores activos
+    SELECT b.producer_id::TEXT INTO bad_id
+    FROM bulk_orders b
+    LEFT JOIN public.producers p ON p.id = b.producer_id AND p.is_active = true
+    WHERE p.id IS NULL
+    LIMIT 1;
+    IF bad_id IS NOT NULL THEN
+        RAISE EXCEPTION 'El productor % no existe o no está activo', bad_id;
+    END IF;
+
+    -- Pedidos sin ítems, horarios pasados o subtotales que no cierran
+    SELECT b.id::TEXT INTO bad_id
+    FROM bulk_orders b
+    LEFT JOIN (
+        SELECT order_id, SUM(quantity * price_cents) AS subtotal_cents
+        FROM bulk_items
+        GROUP BY order_id
+    ) s ON s.order_id = b.id
+    WHERE s.order_id IS NULL
+       OR s.subtotal_cents != b.subtotal_cents
+       OR b.total_cents != b.subtotal_cents + b.commission_cents
+       OR b.pickup_time <= NOW()
+    LIMIT 1;
+    IF bad_id IS NOT NULL THEN
+        RAISE EXCEPTION 'El pedido % es inválido (sin ítems, montos inconsistentes u horario pasado)', bad_id;
+    END IF;
+
+    -- Platos: disponibles, del productor del pedido y al precio cotizado
+    PERFORM 1
+    FROM public.dishes d
+    WHERE d.id IN (SELECT dish_id FROM bulk_items)
+    FOR SHARE;
+
+    SELECT bi.dish_id::TEXT INTO bad_id
+    FROM bulk_items bi
+    LEFT JOIN public.dishes d
+        ON d.id = bi.dish_id
+       AND d.producer_id = bi.producer_id
+       AND d.is_available = true
+       AND d.price_cents = bi.price_cents
+    WHERE d.id IS NULL OR bi.quantity <= 0
+    LIMIT 1;
+    IF bad_id IS NOT NULL THEN
+        RAISE EXCEPTION 'El plato % no está disponible, no pertenece al productor o cambió de precio', bad_id;
+    END IF;
+
+    INSERT INTO public.orders (
+        id, client_id, producer_id, status, delivery_address, pickup_time,
+        subtotal_cents, commission_cents, total_cents
+    )
+    SELECT
+        id, client_id, producer_id, 'pending', delivery_address, pickup_time,
+        subtotal_cents, commission_cents, total_cents
+    FROM bulk_orders;
+
+    INSERT INTO public.order_items (order_id, dish_id, quantity, price_cents)
+    SELECT order_id, dish_id, quantity, price_cents
+    FROM bulk_items;
+
+    SELECT jsonb_agg(jsonb_build_object(
+        'id', o.id,
+        'status', o.status,
+        'pickup_time', o.pickup_time,
+        'created_at', o.created_at
+    ))
+    INTO result
+    FROM public.orders o
+    WHERE o.id IN (SELECT id FROM bulk_orders);
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+COMMENT ON FUNCTION create_orders_bulk(JSONB) IS 'Crea varios pedidos ya cotizados (con sus ítems) en una transacción, validando clientes, productores, disponibilidad y precios vigentes en forma set-based.';
+
+REVOKE EXECUTE ON FUNCTION create_orders_bulk(JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION create_orders_bulk(JSONB) TO service_role;
@@ -0,0 +1,79 @@
+-- ============================================================================
+-- 020_scheduled_address_reveal.sql
+-- Revelado de direcciones programado a T-30 min del retiro
+-- ============================================================================
+-- auto_reveal_address_30min_before sólo corre en un UPDATE de orders: si el
+-- estado cambia antes de la ventana de 30 minutos, la dirección se revela
+-- tarde (cuando el cliente llama a reveal_producer_contact) o nunca.
+--
+-- La API mantiene en memoria los retiros próximos (upcoming_address_reveals)
+-- en un heap ordenado por hora de revelado y, al llegar T-30 min, marca
+-- address_revealed_at en lotes con reveal_addresses_batch. El trigger se
+-- mantiene como respaldo.
+--
+-- Uso:
+--   SELECT * FROM upcoming_address_reveals(180);
+--   SELECT * FROM reveal_addresses_batch(ARRAY['<uuid>', '<uuid>']::UUID[]);
+-- ============================================================================
+
+-- idx_orders_paid_pickup_time empieza por paid_at: para el rango de
+-- pickup_time conviene un índice parcial propio
+CREATE INDEX IF NOT EXISTS idx_orders_upcoming_pickup
+ON orders (pickup_time)
+WHERE paid_at IS NOT NULL AND status IN ('confirmed', 'preparing', 'ready');
+
+COMMENT ON INDEX idx_orders_upcoming_pickup IS 'Índice para leer los retiros próximos de pedidos pagados y activos. Usado por upcoming_address_reveals.';
+
+CREATE OR REPLACE FUNCTION upcoming_address_reveals(horizon_minutes_param INTEGER DEFAULT 180)
+RETURNS TABLE (
+    order_id UUID,
+    client_id UUID,
+    status TEXT,
+    pickup_time TIMESTAMPTZ,
+    address_revealed_at TIMESTAMPTZ
+) AS $$
+    SELECT o.id, o.client_id, o.status::TEXT, o.pickup_time, o.address_revealed_at
+    FROM public.orders o
+    WHERE o.paid_at IS NOT NULL
+      AND o.status IN ('confirmed', 'preparing', 'ready')
+      AND o.pickup_time > NOW()
+      AND o.pickup_time <= NOW() + make_interval(mins => LEAST(GREATEST(horizon_minutes_param, 30), 1440))
+    ORDER BY o.pickup_time;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+COMMENT ON FUNCTION upcoming_address_reveals(INTEGER) IS 'Pedidos pagados con retiro dentro de los próximos horizon_minutes_param minutos (entre 30 y 1440), para programar el revelado de dirección. Usa idx_orders_upcoming_pickup.';
+
+CREATE OR REPLACE FUNCTION reveal_addresses_batch(order_ids_param UUID[])
+RETURNS TABLE (
+    order_id UUID,
+    address_revealed_at TIMESTAMPTZ
+) AS $$
+    -- Mismas condiciones que reveal_producer_contact: pagado, estado activo
+    -- y dentro de la ventana de 30 minutos antes del retiro
+    WITH revealed AS (
+        UPDATE public.orders o
+        SET address_revealed_at = NOW()
+        WHERE o.id = ANY(order_ids_param)
+          AND o.address_revealed_at IS NULL
+          AND o.paid_at IS NOT NULL
+          AND o.status IN ('confirmed', 'preparing', 'ready')
+          AND o.pickup_time >= NOW()
+          AND o.pickup_time - NOW() <= INTERVAL '30 minutes'
+        RETURNING o.id, o.address_revealed_at
+    )
+    SELECT id, address_revealed_at FROM revealed
+    UNION ALL
+    -- Los ya revelados antes (p. ej. por reveal_producer_contact) también se
+    -- devuelven, para que la API no los reintente
+    SELECT o.id, o.address_revealed_at
+    FROM public.orders o
+    WHERE o.id = ANY(order_ids_param)
+      AND o.address_revealed_at IS NOT NULL;
+$$ LANGUAGE sql VOLATILE SECURITY DEFINER;
+
+COMMENT ON FUNCTION reveal_addresses_batch(UUID[]) IS 'Marca address_revealed_at en los pedidos indicados que ya están en la ventana de 30 minutos. Devuelve los pedidos revelados, en esta llamada o antes.';
+
+REVOKE EXECUTE ON FUNCTION upcoming_address_reveals(INTEGER) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION reveal_addresses_batch(UUID[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION upcoming_address_reveals(INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION reveal_addresses_batch(UUID[]) TO service_role;
@@ -0,0 +1,95 @@
+-- ============================================================================
+-- 021_user_admin.sql
+-- Administración de usuarios: listado paginado y bloqueo masivo
+-- ============================================================================
+-- El dashboard listaba todos los usuarios y actualizaba uno por clic. Ahora:
+--   * admin_list_users filtra y busca en la base (nombre o email) y pagina
+--     por cursor (created_at DESC, id DESC), igual que /api/v1/orders;
+--   * admin_set_users_active bloquea o activa muchos ids en un UPDATE.
+-- El bloqueo también marca auth.users.banned_until, así el usuario no
+-- puede iniciar sesión ni refrescar su token.
+--
+-- Uso:
+--   SELECT * FROM admin_list_users('maria', NULL, NULL, NULL, NULL, 50);
+--   SELECT * FROM admin_set_users_active(ARRAY['<uuid>']::UUID[], false);
+-- ============================================================================
+
+ALTER TABLE public.profiles
+    ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT true,
+    ADD COLUMN IF NOT EXISTS blocked_at TIMESTAMPTZ;
+
+COMMENT ON COLUMN public.profiles.is_active IS 'Falso si un administrador bloqueó al usuario.';
+COMMENT ON COLUMN public.profiles.blocked_at IS 'Cuándo se bloqueó al usuario (NULL si está activo).';
+
+CREATE INDEX IF NOT EXISTS idx_profiles_created_at_id
+ON profiles (created_at DESC, id DESC);
+
+COMMENT ON INDEX idx_profiles_created_at_id IS 'Índice para paginación keyset de usuarios en orden (created_at DESC, id DESC).';
+
+-- Búsqueda por nombre con pg_trgm (habilitado en 005)
+CREATE INDEX IF NOT EXISTS idx_profiles_full_name_trgm
+ON profiles USING GIN (full_name gin_trgm_ops);
+
+COMMENT ON INDEX idx_profiles_full_name_trgm IS 'Índice trigram para buscar usuarios por nombre (ILIKE). Usado por admin_list_users.';
+
+CREATE OR REPLACE FUNCTION admin_list_users(
+    search_param TEXT DEFAULT NULL,
+    role_param TEXT DEFAULT NULL,
+    active_param BOOLEAN DEFAULT NULL,
+    cursor_created_at_param TIMESTAMPTZ DEFAULT NULL,
+    cursor_id_param UUID DEFAULT NULL,
+    limit_param INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+    id UUID,
+    email TEXT,
+    full_name TEXT,
+    role TEXT,
+    is_active BOOLEAN,
+    blocked_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ
+) AS $$
+    SELECT p.id, u.email::TEXT, p.full_name, p.role::TEXT, p.is_active, p.blocked_at, p.created_at
+    FROM public.profiles p
+    JOIN auth.users u ON u.id = p.id
+    WHERE (role_param IS NULL OR p.role::TEXT = role_param)
+      AND (active_param IS NULL OR p.is_active = active_param)
+      AND (
+          search_param IS NULL OR search_param = ''
+          OR p.full_name ILIKE '%' || search_param || '%'
+          OR u.email ILIKE '%' || search_param || '%'
+      )
+      AND (
+          cursor_created_at_param IS NULL
+          OR (p.created_at, p.id) < (cursor_created_at_param, cursor_id_param)
+      )
+    ORDER BY p.created_at DESC, p.id DESC
+    LIMIT LEAST(GREATEST(limit_param, 1), 500);
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+COMMENT ON FUNCTION admin_list_users(TEXT, TEXT, BOOLEAN, TIMESTAMPTZ, UUID, INTEGER) IS 'Página de usuarios (perfil + email) con búsqueda y filtros, en orden (created_at DESC, id DESC) desde el cursor. Hasta 500 filas por llamada.';
+
+CREATE OR REPLACE FUNCTION admin_set_users_active(user_ids_param UUID[], active_param BOOLEAN)
+RETURNS TABLE (id UUID, is_active BOOLEAN) AS $$
+BEGIN
+    -- Sólo los que cambian de estado (no se toca updated_at del resto)
+    RETURN QUERY
+    UPDATE public.profiles p
+    SET is_active = active_param,
+        blocked_at = CASE WHEN active_param THEN NULL ELSE NOW() END
+    WHERE p.id = ANY(user_ids_param)
+      AND p.is_active IS DISTINCT FROM active_param
+    RETURNING p.id, p.is_active;
+
+    UPDATE auth.users u
+    SET banned_until = CASE WHEN active_param THEN NULL ELSE 'infinity'::TIMESTAMPTZ END
+    WHERE u.id = ANY(user_ids_param);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+COMMENT ON FUNCTION admin_set_users_active(UUID[], BOOLEAN) IS 'Bloquea (false) o activa (true) muchos usuarios en un UPDATE. Devuelve los que cambiaron de estado.';
+
+REVOKE EXECUTE ON FUNCTION admin_list_users(TEXT, TEXT, BOOLEAN, TIMESTAMPTZ, UUID, INTEGER) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION admin_set_users_active(UUID[], BOOLEAN) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION admin_list_users(TEXT, TEXT, BOOLEAN, TIMESTAMPTZ, UUID, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION admin_set_users_active(UUID[], BOOLEAN) TO service_role;
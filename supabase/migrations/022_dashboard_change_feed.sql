@@ -0,0 +1,82 @@
+-- ============================================================================
+-- 022_dashboard_change_feed.sql
+-- Feed de cambios para los dashboards (pedidos y alertas de bypass)
+-- ============================================================================
+-- El dashboard recargaba la página cada 2 minutos y volvía a leer todas las
+-- tablas. Ahora la API lee sólo lo que cambió desde su watermark y lo
+-- reenvía por SSE (/api/v1/changes/stream):
+--   * pedidos en orden (updated_at, id), con el trigger update_orders_updated_at;
+--   * alertas de bypass en orden (created_at, id). bypass_alerts la crea el
+--     servicio de webhooks, así que se consulta sólo si existe.
+-- Sin watermark no devuelve filas, sólo `now` para empezar desde ahí.
+--
+-- Uso:
+--   SELECT dashboard_changes_since(NULL, NULL, NULL, NULL, 500);
+--   SELECT dashboard_changes_since('2024-06-01 12:00', '<uuid>', '2024-06-01 12:00', '<id>', 500);
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_orders_updated_at_id
+ON orders (updated_at, id);
+
+COMMENT ON INDEX idx_orders_updated_at_id IS 'Índice para leer pedidos modificados en orden (updated_at, id) desde un watermark. Usado por dashboard_changes_since.';
+
+DO $$
+BEGIN
+    IF to_regclass('public.bypass_alerts') IS NOT NULL THEN
+        EXECUTE 'CREATE INDEX IF NOT EXISTS idx_bypass_alerts_created_at ON public.bypass_alerts (created_at)';
+    END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION dashboard_changes_since(
+    orders_since_param TIMESTAMPTZ DEFAULT NULL,
+    orders_since_id_param UUID DEFAULT NULL,
+    alerts_since_param TIMESTAMPTZ DEFAULT NULL,
+    alerts_since_id_param TEXT DEFAULT NULL,
+    limit_param INTEGER DEFAULT 500
+)
+RETURNS JSONB AS $$
+DECLARE
+    page_size INTEGER := LEAST(GREATEST(limit_param, 1), 5000);
+    changed_orders JSONB := '[]'::JSONB;
+    new_alerts JSONB := '[]'::JSONB;
+BEGIN
+    IF orders_since_param IS NOT NULL THEN
+        SELECT COALESCE(jsonb_agg(to_jsonb(c) ORDER BY c.updated_at, c.id), '[]'::JSONB)
+        INTO changed_orders
+        FROM (
+            SELECT o.id, o.producer_id, o.client_id, o.status::TEXT AS status,
+                   o.total_cents, o.commission_cents, o.created_at, o.paid_at, o.updated_at
+            FROM public.orders o
+            WHERE (o.updated_at, o.id) > (orders_since_param, COALESCE(orders_since_id_param, '00000000-0000-0000-0000-000000000000'::UUID))
+            ORDER BY o.updated_at, o.id
+            LIMIT page_size
+        ) c;
+    END IF;
+
+    IF alerts_since_param IS NOT NULL AND to_regclass('public.bypass_alerts') IS NOT NULL THEN
+        -- el tipo de id depende del servicio de webhooks: se compara como texto
+        EXECUTE
+            'SELECT COALESCE(jsonb_agg(to_jsonb(b) ORDER BY b.created_at, b.id::TEXT), ''[]''::JSONB)
+             FROM (
+                 SELECT * FROM public.bypass_alerts a
+                 WHERE (a.created_at, a.id::TEXT) > ($1, COALESCE($2, ''''))
+                 ORDER BY a.created_at, a.id::TEXT
+                 LIMIT $3
+             ) b'
+        INTO new_alerts
+        USING alerts_since_param, alerts_since_id_param, page_size;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'orders', changed_orders,
+        'bypass_alerts', new_alerts,
+        'now', NOW()
+    );
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER;
+
+COMMENT ON FUNCTION dashboard_changes_since(TIMESTAMPTZ, UUID, TIMESTAMPTZ, TEXT, INTEGER) IS 'Pedidos modificados y alertas de bypass nuevas después de cada watermark, hasta limit_param filas de cada tipo. Usa idx_orders_updated_at_id.';
+
+REVOKE EXECUTE ON FUNCTION dashboard_changes_since(TIMESTAMPTZ, UUID, TIMESTAMPTZ, TEXT, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION dashboard_changes_since(TIMESTAMPTZ, UUID, TIMESTAMPTZ, TEXT, INTEGER) TO service_role;
@@ -0,0 +1,67 @@
+-- ============================================================================
+-- 023_popularity_events_by_item.sql
+-- Feed de popularidad paginado por ítem (paid_at, order_id, item_id)
+-- ============================================================================
+-- popularity_events_since (018) limitaba pedidos pero devolvía un ítem por
+-- fila: con el tope de filas de PostgREST (max-rows) un pedido podía quedar
+-- cortado y la API avanzaba el watermark al último pedido leído, perdiendo
+-- el resto de sus ítems. Ahora el límite es de ítems y el watermark incluye
+-- el id del ítem, así que una página puede terminar en medio de un pedido y
+-- la siguiente sigue desde ahí.
+--
+-- Un watermark sin item_id (snapshots anteriores) significa que el pedido se
+-- aplicó completo.
+--
+-- Uso:
+--   SELECT * FROM popularity_events_since(NULL, NULL, NULL, 500);                -- desde el inicio
+--   SELECT * FROM popularity_events_since('2024-06-01', '<uuid>', '<uuid>', 500);
+-- ============================================================================
+
+DROP FUNCTION IF EXISTS popularity_events_since(TIMESTAMPTZ, UUID, INTEGER);
+
+CREATE OR REPLACE FUNCTION popularity_events_since(
+    since_paid_at_param TIMESTAMPTZ DEFAULT NULL,
+    since_order_id_param UUID DEFAULT NULL,
+    since_item_id_param UUID DEFAULT NULL,
+    limit_param INTEGER DEFAULT 500
+)
+RETURNS TABLE (
+    order_id UUID,
+    item_id UUID,
+    paid_at TIMESTAMPTZ,
+    dish_id UUID,
+    quantity INTEGER,
+    zone_id INTEGER
+) AS $$
+    WITH wm AS (
+        SELECT
+            since_paid_at_param AS paid_at,
+            COALESCE(since_order_id_param, '00000000-0000-0000-0000-000000000000'::UUID) AS order_id,
+            COALESCE(since_item_id_param, 'ffffffff-ffff-ffff-ffff-ffffffffffff'::UUID) AS item_id,
+            LEAST(GREATEST(limit_param, 1), 1000) AS lim
+    ),
+    -- cada pedido tiene al menos un ítem: alcanza con `lim` pedidos desde el
+    -- watermark (incluido el que quedó a medias)
+    paid AS (
+        SELECT o.id, o.paid_at, o.producer_id
+        FROM public.orders o, wm c
+        WHERE o.paid_at IS NOT NULL
+          AND o.status != 'cancelled'
+          AND (c.paid_at IS NULL OR (o.paid_at, o.id) >= (c.paid_at, c.order_id))
+        ORDER BY o.paid_at, o.id
+        LIMIT (SELECT lim FROM wm)
+    )
+    SELECT paid.id, oi.id, paid.paid_at, oi.dish_id, oi.quantity, p.delivery_zone_id
+    FROM paid
+    CROSS JOIN wm c
+    JOIN public.order_items oi ON oi.order_id = paid.id
+    JOIN public.producers p ON p.id = paid.producer_id
+    WHERE c.paid_at IS NULL OR (paid.paid_at, paid.id, oi.id) > (c.paid_at, c.order_id, c.item_id)
+    ORDER BY paid.paid_at, paid.id, oi.id
+    LIMIT (SELECT lim FROM wm);
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+COMMENT ON FUNCTION popularity_events_since(TIMESTAMPTZ, UUID, UUID, INTEGER) IS 'Ítems de pedidos pagados después del watermark (paid_at, order_id, item_id), con la zona del productor. Hasta limit_param ítems (máx. 1000) por llamada.';
+
+REVOKE EXECUTE ON FUNCTION popularity_events_since(TIMESTAMPTZ, UUID, UUID, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION popularity_events_since(TIMESTAMPTZ, UUID, UUID, INTEGER) TO service_role;
@@ -0,0 +1,77 @@
+-- ============================================================================
+-- 024_address_reveal_window_param.sql
+-- Ventana de revelado configurable y dueños de los retiros próximos
+-- ============================================================================
+-- reveal_addresses_batch (020) tenía fija la ventana de 30 minutos, mientras
+-- que la API la toma de ADDRESS_REVEAL_WINDOW_MINUTES: con otro valor la API
+-- pedía revelar pedidos que la base rechazaba (o al revés). Ahora la ventana
+-- es un parámetro.
+--
+-- upcoming_address_reveals devuelve además el productor del pedido, para
+-- que la API valide quién consulta el estado del revelado sin ir a la base.
+--
+-- Uso:
+--   SELECT * FROM upcoming_address_reveals(180);
+--   SELECT * FROM reveal_addresses_batch(ARRAY['<uuid>', '<uuid>']::UUID[], 30);
+-- ============================================================================
+
+DROP FUNCTION IF EXISTS upcoming_address_reveals(INTEGER);
+DROP FUNCTION IF EXISTS reveal_addresses_batch(UUID[]);
+
+CREATE OR REPLACE FUNCTION upcoming_address_reveals(horizon_minutes_param INTEGER DEFAULT 180)
+RETURNS TABLE (
+    order_id UUID,
+    client_id UUID,
+    producer_id UUID,
+    status TEXT,
+    pickup_time TIMESTAMPTZ,
+    address_revealed_at TIMESTAMPTZ
+) AS $$
+    SELECT o.id, o.client_id, o.producer_id, o.status::TEXT, o.pickup_time, o.address_revealed_at
+    FROM public.orders o
+    WHERE o.paid_at IS NOT NULL
+      AND o.status IN ('confirmed', 'preparing', 'ready')
+      AND o.pickup_time > NOW()
+      AND o.pickup_time <= NOW() + make_interval(mins => LEAST(GREATEST(horizon_minutes_param, 30), 1440))
+    ORDER BY o.pickup_time;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+COMMENT ON FUNCTION upcoming_address_reveals(INTEGER) IS 'Pedidos pagados con retiro dentro de los próximos horizon_minutes_param minutos (entre 30 y 1440), con cliente y productor, para programar el revelado de dirección. Usa idx_orders_upcoming_pickup.';
+
+CREATE OR REPLACE FUNCTION reveal_addresses_batch(
+    order_ids_param UUID[],
+    window_minutes_param INTEGER DEFAULT 30
+)
+RETURNS TABLE (
+    order_id UUID,
+    address_revealed_at TIMESTAMPTZ
+) AS $$
+    -- Mismas condiciones que reveal_producer_contact: pagado, estado activo
+    -- y dentro de la ventana antes del retiro
+    WITH revealed AS (
+        UPDATE public.orders o
+        SET address_revealed_at = NOW()
+        WHERE o.id = ANY(order_ids_param)
+          AND o.address_revealed_at IS NULL
+          AND o.paid_at IS NOT NULL
+          AND o.status IN ('confirmed', 'preparing', 'ready')
+          AND o.pickup_time >= NOW()
+          AND o.pickup_time - NOW() <= make_interval(mins => LEAST(GREATEST(window_minutes_param, 1), 1440))
+        RETURNING o.id, o.address_revealed_at
+    )
+    SELECT id, address_revealed_at FROM revealed
+    UNION ALL
+    -- Los ya revelados antes (p. ej. por reveal_producer_contact) también se
+    -- devuelven, para que la API no los reintente
+    SELECT o.id, o.address_revealed_at
+    FROM public.orders o
+    WHERE o.id = ANY(order_ids_param)
+      AND o.address_revealed_at IS NOT NULL;
+$$ LANGUAGE sql VOLATILE SECURITY DEFINER;
+
+COMMENT ON FUNCTION reveal_addresses_batch(UUID[], INTEGER) IS 'Marca address_revealed_at en los pedidos indicados que ya están en la ventana de window_minutes_param minutos (entre 1 y 1440). Devuelve los pedidos revelados, en esta llamada o antes.';
+
+REVOKE EXECUTE ON FUNCTION upcoming_address_reveals(INTEGER) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION reveal_addresses_batch(UUID[], INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION upcoming_address_reveals(INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION reveal_addresses_batch(UUID[], INTEGER) TO service_role;